@@ -1,49 +1,161 @@
 # app.py
-from flask import Flask, jsonify, request
+import asyncio
+import functools
+import hmac
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
 from flask_cors import CORS
 from config import Config
-from models.database import initialize_firebase
+from models.database import init_storage, init_user_cache
+from models.firestore_exec import init_firestore_executor, FirestoreSaturatedError, FirestoreTimeoutError
 from routes.users import users_bp
 from routes.api import api_bp  # <-- added: register extra API routes (e.g., recent destinations)
-import requests
+from routes.realtime import init_realtime, socketio
+from services.weather import (
+    init_weather, get_forecast, project_current, project_forecast, WeatherAPIError, WeatherUnavailableError
+)
+from services.route_weather import init_route_weather, routes_weather, prefetch_points
+from services.route_scoring import score_routes
+from services.directions import (
+    init_directions, get_routes, DirectionsError, DirectionsUnavailableError, TRAVEL_MODES
+)
+from services.http_client import init_upstreams, close_upstreams
+from services.auth_tokens import init_token_cache
+from services import firebase_app
+from services.log import init_logging, get_logger, stop_logging, stats as log_stats
+from services.tracing import init_tracing, recent_traces, get_trace
+from services import aio, metrics, polyline, tracing
+
+main_bp = Blueprint('main', __name__)
+log = get_logger(__name__)
+
+
+def create_app(config=Config) -> Flask:
+    """
+    Build the Flask app and set up every service it uses
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)  # Enable CORS for React frontend
+    Nothing here opens a connection: Firebase, the Firestore client, the
+    shared I/O loop and upstream connection pools are created on first use
+    in each process, so the app can be built once in a pre-fork server's
+    master and shared by its workers (see wsgi.py and gunicorn.conf.py).
 
-# Initialize Firebase Admin SDK
-initialize_firebase()
+    Args:
+        config: Config class or object (see config.Config)
 
-# Register blueprints
-app.register_blueprint(users_bp)
-app.register_blueprint(api_bp, url_prefix="/api")  # <-- added
+    Returns:
+        The Flask app
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    # Structured logging, written off the request thread (see Config.LOG_*)
+    init_logging(app.config)
+
+    CORS(app)  # Enable CORS for React frontend
+    aio.install(app)  # Async views run on one shared event loop, so pooled async clients are reused
+    metrics.install(app)  # Per-route latency, status and response size histograms (see /metrics)
+
+    # Per-request traces with spans around auth, Firestore, upstream calls and JSON encoding (see Config.TRACE_*)
+    init_tracing(app.config)
+    tracing.install(app)
+
+    # Firebase Admin SDK (ID token verification, and Firestore unless STORAGE_BACKEND says otherwise) is
+    # imported and initialized on first use in each worker, unless preloading is asked for (see Config.STARTUP_PRELOAD)
+    if app.config['STARTUP_PRELOAD']:
+        try:
+            firebase_app.preload()
+        except Exception as e:
+            if app.config['STORAGE_BACKEND'] == 'firestore':
+                raise
+            # Local storage runs without credentials; authenticated routes answer 401 until they are set up
+            log.warning('firebase.not_initialized', error=repr(e))
+
+    # Document storage behind the user and recents routes (see Config.STORAGE_*)
+    init_storage(app.config)
+
+    # Bounded Firestore access: concurrency, queue and deadline limits (see Config.FIRESTORE_*)
+    firestore_executor = init_firestore_executor(app.config)
+
+    # Shared pooled clients for WeatherAPI and Google Directions (see Config.UPSTREAMS)
+    init_upstreams(app.config)
+
+    caches = {
+        # Weather forecasts, snapped to grid cells (see Config.WEATHER_GRID_DEGREES)
+        'weather': init_weather(app.config),
+        # Directions routes (see Config.ROUTE_CACHE_*)
+        'routes': init_directions(app.config),
+        # User profiles in front of storage (see Config.USER_CACHE_*)
+        'users': init_user_cache(app.config),
+        # Verified Firebase ID tokens, until they expire (see Config.AUTH_*)
+        'auth_tokens': init_token_cache(app.config),
+    }
+    init_route_weather(app.config)
+    app.extensions['sunpath'] = {'caches': caches, 'firestore_executor': firestore_executor}
+
+    # Cache, Firestore executor and logging counters, exported with every /metrics scrape
+    metrics.register_collector('caches', metrics.stats_collector(
+        'sunpath_cache', {name: cache.stats for name, cache in caches.items()},
+        label='cache', gauges=('entries', 'bytes')
+    ))
+    metrics.register_collector('firestore', metrics.stats_collector(
+        'sunpath_firestore', {None: firestore_executor.stats}, gauges=('in_flight', 'queued')
+    ))
+    metrics.register_collector('logging', metrics.stats_collector(
+        'sunpath_log_records', {None: log_stats}, gauges=('queued',)
+    ))
+
+    # Register blueprints
+    app.register_blueprint(main_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(api_bp, url_prefix="/api")  # <-- added
+
+    # Socket.IO push of favorites/recents changes (see routes/realtime.py)
+    init_realtime(app)
+
+    return app
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """
+    Release this process's resources before it exits (e.g. a worker being drained)
+
+    Closes the upstream connection pools and writes out queued log records
+    and traces. Requests still in flight should have finished first.
+
+    Args:
+        timeout: Seconds to wait for the connection pools to close
+    """
+    try:
+        aio.run(close_upstreams(), timeout)
+    except Exception as e:
+        log.warning('shutdown.close_upstreams_failed', error=repr(e))
+    tracing.close()
+    stop_logging()
 
-def build_weather_api_call(lat_lon, type="current", days=1):
-    url = f"{app.config['WEATHER_API_BASE_URL']}{type}.json?key={app.config['WEATHER_API_KEY']}&q={lat_lon}"
-    if type == "forecast":
-        url += f"&days={days}"
-    return url
 
 # Routes
-@app.route('/')
+@main_bp.route('/')
 def home():
     return jsonify({"message": "Flask API is running!"})
 
-@app.route('/api/get_user_pos_current_weather', methods=['GET'])
-def get_user_pos_current_weather():
+@main_bp.route('/api/get_user_pos_current_weather', methods=['GET'])
+async def get_user_pos_current_weather():
     lat_lon = request.args.get('lat_lon')
 
     if not lat_lon:
         return jsonify({"error": "User coordinates not provided"}), 400
 
-    weather_api_call = build_weather_api_call(lat_lon, 'current')
-    response = requests.get(weather_api_call)
-    data = response.json()
+    # Derived from the shared forecast.json call (its "current" block)
+    try:
+        forecast, stale = await get_forecast(lat_lon)
+    except WeatherAPIError as e:
+        return jsonify({"data": e.payload})
+    except WeatherUnavailableError as e:
+        return jsonify({"error": "Weather service unavailable", "details": str(e)}), 503
 
-    return jsonify({"data": data})
+    return jsonify({"data": project_current(forecast), "stale": stale})
 
-@app.route('/api/get_user_pos_forecast_weather', methods=['GET'])
-def get_user_pos_forecast_weather():
+@main_bp.route('/api/get_user_pos_forecast_weather', methods=['GET'])
+async def get_user_pos_forecast_weather():
     lat_lon = request.args.get('lat_lon')
 
     if not lat_lon:
@@ -51,64 +163,100 @@ def get_user_pos_forecast_weather():
 
     hours = int(request.args.get('hours', 3))  # Default to 3 hours
 
-    # Request 2 days to ensure we have enough hourly data
-    weather_api_call = build_weather_api_call(lat_lon, 'forecast', days=2)
-    response = requests.get(weather_api_call)
-    data = response.json()
-
-    # Print full response to console
-    print("=" * 80)
-    print("FULL WEATHER API RESPONSE:")
-    print(data)
-    print("=" * 80)
-
-    # Extract next N hours from current time
-    if 'location' in data and 'forecast' in data:
-        current_time = data['location']['localtime_epoch']
-
-        # Get all hourly forecasts from all forecast days
-        all_hours = []
-        for day in data['forecast']['forecastday']:
-            all_hours.extend(day['hour'])
-
-        # Filter to only future hours and limit to requested number
-        future_hours = [
-            hour for hour in all_hours
-            if hour['time_epoch'] >= current_time
-        ][:hours]
-
-        # Format as forecast_hour_1, forecast_hour_2, etc. - temps, conditions, and wind
-        forecast_dict = {}
-        for i, hour in enumerate(future_hours, start=1):
-            forecast_dict[f'forecast_hour_{i}'] = {
-                'time': hour.get('time'),
-                'temp_c': hour.get('temp_c'),
-                'temp_f': hour.get('temp_f'),
-                'is_day': hour.get('is_day'),
-                'condition': hour.get('condition'),
-                'wind_mph': hour.get('wind_mph'),
-                'wind_kph': hour.get('wind_kph'),
-                'wind_degree': hour.get('wind_degree'),
-                'wind_dir': hour.get('wind_dir')
-            }
-
-        # Return modified data with numbered hours (no current weather)
-        return jsonify({
-            "data": {
-                "location": data.get('location'),
-                "forecast": forecast_dict
-            }
-        })
+    try:
+        forecast, stale = await get_forecast(lat_lon)
+    except WeatherAPIError as e:
+        return jsonify({"data": e.payload})
+    except WeatherUnavailableError as e:
+        return jsonify({"error": "Weather service unavailable", "details": str(e)}), 503
+
+    # Return next N hours from current time with numbered hours (no current weather)
+    return jsonify({
+        "data": {
+            "location": forecast.location,
+            "forecast": project_forecast(forecast, hours)
+        },
+        "stale": stale
+    })
+
+@main_bp.route('/api/get_user_pos_weather', methods=['GET'])
+async def get_user_pos_weather():
+    """
+    Current conditions and the next N hours of forecast in one response
+    Query params: lat_lon, hours (default 3)
+    Backed by a single WeatherAPI forecast.json call
+    """
+    lat_lon = request.args.get('lat_lon')
 
-    # Fallback to original response if structure is unexpected
-    return jsonify({"data": data})
+    if not lat_lon:
+        return jsonify({"error": "User coordinates not provided"}), 400
+
+    hours = int(request.args.get('hours', 3))  # Default to 3 hours
 
-@app.route('/api/generate_route', methods=['POST'])
-def generate_route():
+    try:
+        forecast, stale = await get_forecast(lat_lon)
+    except WeatherAPIError as e:
+        return jsonify({"data": e.payload})
+    except WeatherUnavailableError as e:
+        return jsonify({"error": "Weather service unavailable", "details": str(e)}), 503
+
+    return jsonify({
+        "data": {
+            "location": forecast.location,
+            "current": forecast.current,
+            "forecast": project_forecast(forecast, hours)
+        },
+        "stale": stale
+    })
+
+def _route_summary(route):
+    """Fields of a Directions API route returned to the client"""
+    return {
+        "overview_polyline": route['overview_polyline']['points'],
+        "summary": route.get('summary'),
+        "bounds": route.get('bounds'),
+        "distance": route['legs'][0].get('distance'),
+        "duration": route['legs'][0].get('duration'),
+        "start_location": route['legs'][0]['start_location'],
+        "end_location": route['legs'][-1]['end_location'],
+        "start_address": route['legs'][0].get('start_address'),
+        "end_address": route['legs'][-1].get('end_address')
+    }
+
+def _apply_geometry_options(summary, zoom, tolerance_m, include_coordinates):
+    """Simplify a route summary's polyline for a zoom level / tolerance and optionally add coordinates"""
+    coords = polyline.decode_array(summary["overview_polyline"])
+
+    if (zoom is not None or tolerance_m is not None) and len(coords):
+        if tolerance_m is None:
+            tolerance_m = polyline.tolerance_for_zoom(zoom, float(coords[:, 0].mean()))
+        simplified = polyline.simplify(coords, tolerance_m)
+        summary["overview_polyline"] = polyline.encode_array(simplified)
+        summary["simplification"] = {
+            "tolerance_m": round(tolerance_m, 2),
+            "points_before": len(coords),
+            "points_after": len(simplified)
+        }
+        coords = simplified
+
+    if include_coordinates:
+        summary["coordinates"] = coords.tolist()
+
+@main_bp.route('/api/generate_route', methods=['POST'])
+async def generate_route():
     """
     Generate a route from origin to destination using Google Directions API
-    Request body: { origin_lat, origin_lon, destination_lat, destination_lon }
+    Request body: { origin_lat, origin_lon, destination_lat, destination_lon,
+                    include_weather (optional), weather_spacing_m (optional),
+                    zoom or tolerance_m (optional), include_coordinates (optional),
+                    mode (optional: driving, walking, bicycling, transit) }
     Returns decoded polyline coordinates ready for map display
+    With zoom (map zoom level) or tolerance_m, polylines are simplified to the
+    detail visible at that zoom; include_coordinates adds them as [lat, lng] pairs
+    Up to MAX_ROUTE_ALTERNATIVES alternatives are returned in "routes"; with
+    include_weather, each carries per-segment weather and a weather score
+    (see Config.WEATHER_WEIGHTS), "routes" is ranked best first and "route"
+    is the best-scoring alternative
     """
     data = request.get_json()
 
@@ -119,59 +267,179 @@ def generate_route():
     origin_lon = data.get('origin_lon')
     destination_lat = data.get('destination_lat')
     destination_lon = data.get('destination_lon')
+    include_weather = bool(data.get('include_weather', False))
+    weather_spacing_m = data.get('weather_spacing_m')
+    include_coordinates = bool(data.get('include_coordinates', False))
+    zoom = data.get('zoom')
+    tolerance_m = data.get('tolerance_m')
+    mode = data.get('mode', 'driving')
 
     # Validate all parameters are provided
     if not all([origin_lat, origin_lon, destination_lat, destination_lon]):
         return jsonify({"error": "Missing required parameters: origin_lat, origin_lon, destination_lat, destination_lon"}), 400
 
+    if weather_spacing_m is not None:
+        try:
+            weather_spacing_m = float(weather_spacing_m)
+        except (TypeError, ValueError):
+            return jsonify({"error": "weather_spacing_m must be a number"}), 400
+        if weather_spacing_m < 500:
+            return jsonify({"error": "weather_spacing_m must be at least 500"}), 400
+
+    try:
+        zoom = float(zoom) if zoom is not None else None
+        tolerance_m = float(tolerance_m) if tolerance_m is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "zoom and tolerance_m must be numbers"}), 400
+    if zoom is not None and not 0 <= zoom <= 22:
+        return jsonify({"error": "zoom must be between 0 and 22"}), 400
+
+    if mode not in TRAVEL_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(TRAVEL_MODES)}"}), 400
+
     try:
-        # Build Google Directions API request
-        origin_str = f"{origin_lat},{origin_lon}"
-        dest_str = f"{destination_lat},{destination_lon}"
-        url = (
-            "https://maps.googleapis.com/maps/api/directions/json"
-            f"?origin={origin_str}&destination={dest_str}&key={app.config['GOOGLE_MAPS_API_KEY']}"
-        )
-
-        # Call Google Directions API
-        response = requests.get(url)
-        data = response.json()
-
-        if data.get('status') == 'OK' and data.get('routes'):
-            route = data['routes'][0]
-
-            # Return route data with decoded polyline
-            return jsonify({
-                "status": "success",
-                "route": {
-                    "overview_polyline": route['overview_polyline']['points'],
-                    "bounds": route.get('bounds'),
-                    "distance": route['legs'][0].get('distance'),
-                    "duration": route['legs'][0].get('duration'),
-                    "start_location": route['legs'][0]['start_location'],
-                    "end_location": route['legs'][0]['end_location'],
-                    "start_address": route['legs'][0].get('start_address'),
-                    "end_address": route['legs'][0].get('end_address')
-                }
-            }), 200
+        # Google Directions API, cached on rounded endpoints + travel mode (see Config.ROUTE_CACHE_*)
+        directions = get_routes(origin_lat, origin_lon, destination_lat, destination_lon, mode)
+        if include_weather:
+            # The endpoint cells are needed whichever route comes back; fetch them while Directions answers
+            routes, _ = await asyncio.gather(
+                directions,
+                prefetch_points([(origin_lat, origin_lon), (destination_lat, destination_lon)])
+            )
         else:
-            return jsonify({
-                "error": "Route not found",
-                "status": data.get('status'),
-                "message": data.get('error_message', 'Could not calculate route')
-            }), 404
+            routes = await directions
+        route_data = [_route_summary(route) for route in routes]
+
+        # Polyline decoding, simplification and scoring are CPU-bound: they run in worker threads,
+        # so the shared I/O loop keeps serving other requests meanwhile
+        if include_coordinates or zoom is not None or tolerance_m is not None:
+            await aio.to_thread(lambda: [
+                _apply_geometry_options(summary, zoom, tolerance_m, include_coordinates) for summary in route_data
+            ])
+
+        if include_weather:
+            # One deduplicated weather fan-out for every alternative, then score them together
+            route_points = await aio.to_thread(lambda: [
+                (polyline.decode(route['overview_polyline']['points']),
+                 sum((leg.get('duration') or {}).get('value', 0) for leg in route['legs']))
+                for route in routes
+            ])
+            weathers = await routes_weather(route_points, spacing_m=weather_spacing_m)
+            scores = await aio.to_thread(score_routes, weathers, current_app.config['WEATHER_WEIGHTS'])
+            for summary, weather, score in zip(route_data, weathers, scores):
+                summary["weather"] = weather
+                summary["weather_score"] = score["score"]
+                summary["weather_factors"] = score["factors"]
+            # Routes without any weather data rank after every scored route
+            route_data.sort(key=lambda summary: (summary["weather_score"] is not None, summary["weather_score"] or 0.0),
+                            reverse=True)
+
+        # Return route data with decoded polyline
+        return jsonify({
+            "status": "success",
+            "route": route_data[0],
+            "routes": route_data
+        }), 200
+
+    except DirectionsError as e:
+        return jsonify({
+            "error": "Route not found",
+            "status": e.status,
+            "message": e.message
+        }), 404
+
+    except DirectionsUnavailableError as e:
+        return jsonify({"error": "Directions service unavailable", "details": str(e)}), 503
 
     except Exception as e:
         return jsonify({"error": "Failed to generate route", "details": str(e)}), 500
 
-@app.route('/api/data', methods=['POST'])
+def require_admin_token(f):
+    """
+    Restrict an operational endpoint to callers sending Authorization: Bearer <ADMIN_TOKEN>
+    Without ADMIN_TOKEN set the endpoint does not exist (404), so it is never public by default
+    """
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = current_app.config['ADMIN_TOKEN']
+        if not token:
+            return jsonify({"error": "Not found"}), 404
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+@main_bp.route('/api/cache/stats', methods=['GET'])
+@require_admin_token
+def cache_stats():
+    """Hit/miss/eviction counters for the weather, route, user profile and ID token caches"""
+    caches = current_app.extensions['sunpath']['caches']
+    return jsonify({name: cache.stats() for name, cache in caches.items()})
+
+@main_bp.route('/api/firestore/stats', methods=['GET'])
+@require_admin_token
+def firestore_stats():
+    """In-flight, queued, timed-out and rejected Firestore operations"""
+    return jsonify(current_app.extensions['sunpath']['firestore_executor'].stats())
+
+@main_bp.route('/api/traces', methods=['GET'])
+@require_admin_token
+def list_traces():
+    """
+    Recently kept traces (slow or sampled requests), newest first
+    Query params: min_ms (default 0), limit (default 50)
+    """
+    try:
+        min_ms = float(request.args.get('min_ms', 0))
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"error": "min_ms and limit must be numbers"}), 400
+    return jsonify({"traces": recent_traces(min_ms, limit)})
+
+@main_bp.route('/api/traces/<trace_id>', methods=['GET'])
+@require_admin_token
+def show_trace(trace_id):
+    """One kept trace by the ID from a response's X-Trace-Id header"""
+    trace = get_trace(trace_id)
+    if trace is None:
+        return jsonify({"error": "Trace not found (not kept, or no longer buffered)"}), 404
+    return jsonify(trace)
+
+@main_bp.route('/metrics', methods=['GET'])
+@require_admin_token
+def prometheus_metrics():
+    """
+    Latency histograms, error counts and payload sizes per route and upstream,
+    plus cache and Firestore counters, in the Prometheus text format
+    Counts are per process: with several workers, scrape each of them
+    """
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@main_bp.route('/api/data', methods=['POST'])
 def post_data():
     data = request.get_json()
     return jsonify({"received": data, "status": "success"}), 201
 
-@app.errorhandler(404)
+@main_bp.app_errorhandler(FirestoreSaturatedError)
+def firestore_saturated(error):
+    """Too many Firestore operations queued in this process: reject fast, ask the client to back off"""
+    response = jsonify({"error": "Service is overloaded, try again shortly"})
+    response.headers['Retry-After'] = str(current_app.config['FIRESTORE_RETRY_AFTER'])
+    return response, 503
+
+@main_bp.app_errorhandler(FirestoreTimeoutError)
+def firestore_timed_out(error):
+    """A Firestore operation missed its deadline (FIRESTORE_TIMEOUT)"""
+    response = jsonify({"error": "Storage did not respond in time, try again shortly"})
+    response.headers['Retry-After'] = str(current_app.config['FIRESTORE_RETRY_AFTER'])
+    return response, 504
+
+@main_bp.app_errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Not found"}), 404
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server; in production run gunicorn -c gunicorn.conf.py wsgi:app
+    socketio.run(create_app(), debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,3 @@
+# backend/benchmarks/__init__.py
+# Performance tooling: CPU microbenchmarks of the request hot paths (python -m benchmarks)
+# and the shared fixture payloads they run on.
@@ -0,0 +1,4 @@
+import sys
+from .microbench import main
+
+sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Realistic payloads for benchmarks and load tests
+
+Shapes follow what the backend really sees: WeatherAPI forecast.json
+responses (2 days x 24 hours, every hourly field WeatherAPI sends), Google
+Directions responses with full step lists, and user profiles as stored in
+Firestore. Everything is generated deterministically (seeded), so results
+are comparable between runs.
+"""
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from services import polyline
+
+TALLAHASSEE = (30.4383, -84.2807)
+JACKSONVILLE = (30.3322, -81.6557)
+
+_CONDITIONS = [
+    {"text": "Sunny", "icon": "//cdn.weatherapi.com/weather/64x64/day/113.png", "code": 1000},
+    {"text": "Partly cloudy", "icon": "//cdn.weatherapi.com/weather/64x64/day/116.png", "code": 1003},
+    {"text": "Overcast", "icon": "//cdn.weatherapi.com/weather/64x64/day/122.png", "code": 1009},
+    {"text": "Patchy rain nearby", "icon": "//cdn.weatherapi.com/weather/64x64/day/176.png", "code": 1063},
+    {"text": "Moderate rain", "icon": "//cdn.weatherapi.com/weather/64x64/day/302.png", "code": 1189},
+    {"text": "Clear", "icon": "//cdn.weatherapi.com/weather/64x64/night/113.png", "code": 1000},
+]
+_WIND_DIRS = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+
+
+def _weather_fields(rng: random.Random, hour: int) -> Dict[str, Any]:
+    temp_c = round(18 + 8 * rng.random() + (6 if 10 <= hour <= 17 else 0), 1)
+    wind_kph = round(rng.uniform(2, 35), 1)
+    condition = _CONDITIONS[rng.randrange(len(_CONDITIONS))]
+    return {
+        "temp_c": temp_c,
+        "temp_f": round(temp_c * 9 / 5 + 32, 1),
+        "is_day": int(7 <= hour < 20),
+        "condition": dict(condition),
+        "wind_mph": round(wind_kph / 1.609, 1),
+        "wind_kph": wind_kph,
+        "wind_degree": rng.randrange(360),
+        "wind_dir": rng.choice(_WIND_DIRS),
+        "pressure_mb": round(rng.uniform(1005, 1022), 1),
+        "pressure_in": round(rng.uniform(29.7, 30.2), 2),
+        "precip_mm": round(rng.choice([0, 0, 0, 0.1, 0.6, 2.4]), 2),
+        "precip_in": 0.0,
+        "humidity": rng.randrange(40, 100),
+        "cloud": rng.randrange(0, 100),
+        "feelslike_c": round(temp_c + rng.uniform(-2, 3), 1),
+        "feelslike_f": round(temp_c * 9 / 5 + 33, 1),
+        "vis_km": rng.choice([10.0, 10.0, 10.0, 6.0, 2.0]),
+        "vis_miles": 6.0,
+        "uv": round(rng.uniform(0, 9), 1),
+        "gust_mph": round(wind_kph / 1.2, 1),
+        "gust_kph": round(wind_kph * 1.4, 1),
+    }
+
+
+def forecast_payload(lat: float = TALLAHASSEE[0], lon: float = TALLAHASSEE[1], days: int = 2,
+                     now: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """A forecast.json response: location, current and `days` days of hourly forecasts"""
+    rng = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    start = now - now % 86400
+
+    forecast_days = []
+    for day in range(days):
+        hours = []
+        for hour in range(24):
+            epoch = start + day * 86400 + hour * 3600
+            hours.append(dict(
+                time_epoch=epoch,
+                time=time.strftime("%Y-%m-%d %H:%M", time.gmtime(epoch)),
+                windchill_c=20.1, windchill_f=68.2, heatindex_c=24.5, heatindex_f=76.1,
+                dewpoint_c=14.2, dewpoint_f=57.6, will_it_rain=0, chance_of_rain=rng.randrange(100),
+                will_it_snow=0, chance_of_snow=0,
+                **_weather_fields(rng, hour)
+            ))
+        forecast_days.append({
+            "date": time.strftime("%Y-%m-%d", time.gmtime(start + day * 86400)),
+            "date_epoch": start + day * 86400,
+            "day": {"maxtemp_c": 31.2, "mintemp_c": 19.8, "avgtemp_c": 25.1, "maxwind_kph": 24.1,
+                    "totalprecip_mm": 3.1, "avghumidity": 71, "daily_chance_of_rain": 80,
+                    "condition": dict(_CONDITIONS[3]), "uv": 7.0},
+            "astro": {"sunrise": "07:12 AM", "sunset": "08:21 PM", "moonrise": "10:05 PM",
+                      "moonset": "09:14 AM", "moon_phase": "Waning Gibbous", "moon_illumination": 82},
+            "hour": hours
+        })
+
+    return {
+        "location": {"name": "Tallahassee", "region": "Florida", "country": "United States of America",
+                     "lat": lat, "lon": lon, "tz_id": "America/New_York",
+                     "localtime_epoch": now, "localtime": time.strftime("%Y-%m-%d %H:%M", time.gmtime(now))},
+        "current": dict(last_updated_epoch=now - 600,
+                        last_updated=time.strftime("%Y-%m-%d %H:%M", time.gmtime(now - 600)),
+                        **_weather_fields(rng, time.gmtime(now).tm_hour)),
+        "forecast": {"forecastday": forecast_days}
+    }
+
+
+def route_points(origin: Tuple[float, float] = TALLAHASSEE, destination: Tuple[float, float] = JACKSONVILLE,
+                 count: int = 600, wiggle: float = 0.02, seed: int = 0) -> List[Tuple[float, float]]:
+    """A plausible road-like polyline between two points (straight line plus a smooth detour)"""
+    rng = random.Random(seed)
+    phase = rng.uniform(0, 6.28)
+    points = []
+    for i in range(count + 1):
+        t = i / count
+        bend = wiggle * (1 - (2 * t - 1) ** 2) * (1 + 0.3 * ((i * 7919 + int(phase * 100)) % 13) / 13)
+        points.append((
+            round(origin[0] + (destination[0] - origin[0]) * t + bend, 5),
+            round(origin[1] + (destination[1] - origin[1]) * t, 5)
+        ))
+    return points
+
+
+def directions_payload(origin: Tuple[float, float] = TALLAHASSEE, destination: Tuple[float, float] = JACKSONVILLE,
+                       routes: int = 3, points: int = 600, steps: int = 30) -> Dict[str, Any]:
+    """A Directions API response with `routes` alternatives of `points` polyline points and `steps` steps each"""
+    result = []
+    for r in range(routes):
+        path = route_points(origin, destination, points, wiggle=0.02 * (r + 1), seed=r)
+        distance = 262000 + 7000 * r
+        duration = 9300 + 540 * r
+        per_step = len(path) // steps
+        step_list = []
+        for s in range(steps):
+            chunk = path[s * per_step:(s + 1) * per_step + 1]
+            step_list.append({
+                "distance": {"text": f"{distance // steps / 1000:.1f} km", "value": distance // steps},
+                "duration": {"text": f"{duration // steps // 60} mins", "value": duration // steps},
+                "start_location": {"lat": chunk[0][0], "lng": chunk[0][1]},
+                "end_location": {"lat": chunk[-1][0], "lng": chunk[-1][1]},
+                "html_instructions": f"Continue onto <b>I-10 E</b> toward exit {s + 1}",
+                "polyline": {"points": polyline.encode(chunk)},
+                "travel_mode": "DRIVING",
+                "maneuver": "keep-left" if s % 3 else "merge"
+            })
+        result.append({
+            "bounds": {"northeast": {"lat": max(p[0] for p in path), "lng": max(p[1] for p in path)},
+                       "southwest": {"lat": min(p[0] for p in path), "lng": min(p[1] for p in path)}},
+            "copyrights": "Map data ©2025 Google",
+            "legs": [{
+                "distance": {"text": f"{distance / 1000:.0f} km", "value": distance},
+                "duration": {"text": f"{duration // 3600} hours {duration % 3600 // 60} mins", "value": duration},
+                "start_address": "Tallahassee, FL, USA",
+                "end_address": "Jacksonville, FL, USA",
+                "start_location": {"lat": origin[0], "lng": origin[1]},
+                "end_location": {"lat": destination[0], "lng": destination[1]},
+                "steps": step_list,
+                "traffic_speed_entry": [],
+                "via_waypoint": []
+            }],
+            "overview_polyline": {"points": polyline.encode(path)},
+            "summary": ["I-10 E", "US-90 E", "I-10 E and US-301 N"][r % 3],
+            "warnings": [],
+            "waypoint_order": []
+        })
+    return {"geocoded_waypoints": [{"geocoder_status": "OK", "place_id": "x", "types": ["locality"]}] * 2,
+            "routes": result, "status": "OK"}
+
+
+def user_profile(uid: str = "user-0", favorites: int = 10, recents: int = 10, seed: int = 0) -> Dict[str, Any]:
+    """A stored user document with Home, Work and `favorites` more saved addresses, and `recents` recents"""
+    rng = random.Random(seed)
+
+    def address(label: Optional[str]) -> Dict[str, Any]:
+        return {
+            "address": f"{rng.randrange(1, 9999)} {rng.choice(['Main', 'Tennessee', 'Monroe', 'Ocala'])} St, "
+                       f"Tallahassee, FL 32301, USA",
+            "latitude": round(TALLAHASSEE[0] + rng.uniform(-0.2, 0.2), 6),
+            "longitude": round(TALLAHASSEE[1] + rng.uniform(-0.2, 0.2), 6),
+            "label": label
+        }
+
+    now = "2025-10-01T12:00:00.000000"
+    favorite_addresses = [address("Home"), address("Work")]
+    favorite_addresses += [address(f"Place {i}") for i in range(favorites)]
+    recent_addresses = [dict(address(f"Recent {i}"), timestamp=now) for i in range(recents)]
+    return {
+        "uid": uid,
+        "email": f"{uid}@example.com",
+        "created_at": now,
+        "updated_at": now,
+        "favorite_addresses": favorite_addresses,
+        "recent_addresses": recent_addresses
+    }
+
+
+def recent_destinations(count: int = 10, seed: int = 0) -> List[Dict[str, Any]]:
+    """The recent_destinations list /api/recents stores"""
+    rng = random.Random(seed)
+    return [{
+        "label": f"Destination {i}",
+        "address": f"{i} Example Rd",
+        "lat": round(TALLAHASSEE[0] + rng.uniform(-0.5, 0.5), 6),
+        "lng": round(TALLAHASSEE[1] + rng.uniform(-0.5, 0.5), 6),
+        "place_id": f"ChIJ{rng.getrandbits(64):016x}" if i % 2 else None,
+        "last_used": 1759320000.0 - i * 3600
+    } for i in range(count)]
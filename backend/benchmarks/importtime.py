@@ -0,0 +1,151 @@
+"""
+Import-time profile of the backend's cold start
+
+Runs `python -X importtime` in a fresh interpreter that imports application,
+builds the app with create_app() and answers one /api/health request, then
+reports the time to each step, the slowest modules by cumulative import
+time, the time per top-level package, and which heavy SDKs were loaded by
+then. The fastest of --repeat runs is reported, so a cold disk cache on the
+first run does not skew it.
+
+Usage (from backend/):
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --top 40
+    python -m benchmarks.importtime --preload          # with STARTUP_PRELOAD, as a deploy would
+    python -m benchmarks.importtime --json > startup.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules worth knowing about when they are loaded at startup: name -> what pulls them in
+HEAVY_MODULES = {
+    'firebase_admin': 'Firebase Admin SDK (token verification)',
+    'google.cloud.firestore': 'Firestore client',
+    'grpc': 'gRPC (Firestore transport, google.api_core.exceptions)',
+    'google.protobuf': 'protobuf (Firestore messages)',
+    'google.auth': 'Google auth (credentials, certificate fetches)',
+    'numpy': 'numpy (route scoring, polylines)',
+    'httpx': 'httpx (upstream clients)',
+    'flask_socketio': 'Flask-SocketIO (realtime)',
+}
+
+# Runs in the child: time each step, then list which heavy modules are loaded
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import application
+imported = time.perf_counter()
+app = application.create_app()
+created = time.perf_counter()
+status = app.test_client().get('/api/health').status_code
+answered = time.perf_counter()
+print('IMPORTTIME_RESULT ' + json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_health_ms': (answered - created) * 1000,
+    'health_status': status,
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+''' % (list(HEAVY_MODULES),)
+
+# "import time:       607 |     158313 |   flask"
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Modules from -X importtime output: name, self_us, cumulative_us and nesting depth"""
+    modules = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                'name': name,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': (len(indent) - 1) // 2,
+            })
+    return modules
+
+
+def profile_once(preload: bool) -> Dict[str, Any]:
+    """One cold start in a fresh interpreter"""
+    env = dict(os.environ, LOG_LEVEL='WARNING', STARTUP_PRELOAD='true' if preload else 'false')
+    # Local storage unless set, so --preload runs without Firebase credentials
+    env.setdefault('STORAGE_BACKEND', 'sqlite')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    result = next(
+        (line.split(' ', 1)[1] for line in proc.stdout.splitlines() if line.startswith('IMPORTTIME_RESULT ')), None
+    )
+    if proc.returncode != 0 or result is None:
+        raise RuntimeError(f'startup failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}')
+
+    modules = parse_importtime(proc.stderr)
+    packages = defaultdict(int)
+    for module in modules:
+        packages[module['name'].split('.', 1)[0]] += module['self_us']
+    return dict(
+        json.loads(result),
+        total_import_ms=sum(module['self_us'] for module in modules) / 1000,
+        modules=modules,
+        packages=dict(packages),
+    )
+
+
+def report(profile: Dict[str, Any], top: int) -> None:
+    print(f"import application   {profile['import_ms']:8.1f} ms")
+    print(f"create_app()         {profile['create_app_ms']:8.1f} ms")
+    print(f"first /api/health    {profile['first_health_ms']:8.1f} ms  (status {profile['health_status']})")
+    print(f"all imports          {profile['total_import_ms']:8.1f} ms  ({len(profile['modules'])} modules)")
+
+    print(f"\nSlowest modules (cumulative, top {top})")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for module in sorted(profile['modules'], key=lambda m: m['cumulative_us'], reverse=True)[:top]:
+        print(f"{module['cumulative_us'] / 1000:14.1f} {module['self_us'] / 1000:9.1f}  "
+              f"{'  ' * module['depth']}{module['name']}")
+
+    print(f"\nBy top-level package (self time, top {top})")
+    for name, self_us in sorted(profile['packages'].items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{self_us / 1000:14.1f}  {name}")
+
+    print("\nHeavy modules loaded at startup")
+    for name, description in HEAVY_MODULES.items():
+        print(f"  {'yes' if name in profile['loaded'] else 'no ':3}  {name:24} {description}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.importtime',
+                                     description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top', type=int, default=25, help='modules and packages to list (default 25)')
+    parser.add_argument('--repeat', type=int, default=3, help='cold starts to run; the fastest is reported (default 3)')
+    parser.add_argument('--preload', action='store_true', help='profile with STARTUP_PRELOAD=true')
+    parser.add_argument('--json', action='store_true', help='print the full profile as JSON')
+    args = parser.parse_args(argv)
+
+    profiles = [profile_once(args.preload) for _ in range(max(args.repeat, 1))]
+    profile = min(profiles, key=lambda p: p['import_ms'] + p['create_app_ms'])
+    profile['runs_ms'] = [round(p['import_ms'] + p['create_app_ms'], 1) for p in profiles]
+
+    if args.json:
+        json.dump(profile, sys.stdout, indent=2)
+        print()
+    else:
+        report(profile, args.top)
+        print(f"\nStartup (import + create_app) over {len(profiles)} runs: "
+              f"{', '.join(f'{ms:.1f}' for ms in profile['runs_ms'])} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,486 @@
+"""
+End-to-end load test of the backend with stub upstreams
+
+Starts a local stub server that replays WeatherAPI and Google Directions
+responses and runs the app (application.create_app) on SQLite storage,
+each in its own process so neither competes with the load generator for
+the GIL. The app is built with a local stand-in for Firebase auth, and the
+load test drives it with virtual users that follow the mobile client's
+request mix:
+- favorites / recents polling every 5 seconds (with If-None-Match)
+- a weather refresh on open and then hourly
+- trips: a burst of route generations (with weather), then the destination
+  is saved as a recent and sometimes as a favorite
+
+Reports throughput, errors and p50/p95/p99 latency per endpoint, plus how
+many upstream calls the app made.
+
+The load generator, stubs and app each want a core of their own; on fewer
+cores the measured latencies include waiting for the CPU.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --users 200 --duration 60
+    python -m benchmarks.loadtest --users 500 --speedup 60   # an hour of client behaviour per minute
+    python -m benchmarks.loadtest --fixtures recorded/        # replay recorded forecast.json / directions.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import secrets
+import subprocess
+import sys
+import time
+import zlib
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import httpx
+from . import fixtures
+
+PROJECT_ID = 'sunpath-loadtest'
+KEY_ID = 'loadtest'
+
+
+# Upstream stubs
+
+class StubUpstreams:
+    """
+    WeatherAPI and Directions stand-ins on one local HTTP server
+
+    Responses are generated from benchmarks.fixtures for the requested
+    coordinates, or replayed from recorded files (forecast.json,
+    directions.json) when a fixtures directory is given. Every response is
+    delayed by `latency` seconds (+-50% jitter), like a real upstream.
+    GET /_calls returns how many requests each upstream received.
+    """
+
+    def __init__(self, latency: float = 0.1, fixtures_dir: Optional[str] = None):
+        self.latency = latency
+        self.calls = Counter()
+        self._recorded = {}
+        for name in ('forecast', 'directions'):
+            path = os.path.join(fixtures_dir, f'{name}.json') if fixtures_dir else None
+            if path and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self._recorded[name] = f.read()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._server.server_port
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    @functools.lru_cache(maxsize=4096)
+    def forecast_body(self, q: str) -> bytes:
+        if 'forecast' in self._recorded:
+            return self._recorded['forecast']
+        lat, lon = (float(part) for part in q.split(','))
+        return json.dumps(fixtures.forecast_payload(lat, lon, days=2, seed=zlib.crc32(q.encode()))).encode()
+
+    @functools.lru_cache(maxsize=4096)
+    def directions_body(self, origin: str, destination: str, alternatives: bool) -> bytes:
+        if 'directions' in self._recorded:
+            return self._recorded['directions']
+        payload = fixtures.directions_payload(
+            tuple(float(part) for part in origin.split(',')),
+            tuple(float(part) for part in destination.split(',')),
+            routes=3 if alternatives else 1
+        )
+        return json.dumps(payload).encode()
+
+    def _handler(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path == '/_calls':
+                    body = json.dumps(stubs.calls).encode()
+                elif url.path.endswith(('/forecast.json', '/current.json')) and 'q' in params:
+                    stubs.calls['weather'] += 1
+                    body = stubs.forecast_body(params['q'])
+                elif url.path.endswith('/directions/json') and 'origin' in params and 'destination' in params:
+                    stubs.calls['directions'] += 1
+                    body = stubs.directions_body(params['origin'], params['destination'],
+                                                 params.get('alternatives') == 'true')
+                else:
+                    self.send_error(404)
+                    return
+                if url.path != '/_calls':
+                    time.sleep(stubs.latency * random.uniform(0.5, 1.5))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# Firebase auth stand-in
+
+class LocalAuth:
+    """
+    Issues RS256 ID tokens shaped like Firebase's, signed with a throwaway key
+
+    The app side (install_local_auth) verifies them with the same signature
+    check Firebase tokens get, so authentication costs what it does in
+    production, minus the certificate download.
+    """
+
+    def __init__(self):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from google.auth import crypt
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption())
+        self.public_pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        self._signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+
+    def token(self, uid: str, lifetime: int = 3600) -> str:
+        from google.auth import jwt
+
+        now = int(time.time())
+        return jwt.encode(self._signer, {
+            'iss': f'https://securetoken.google.com/{PROJECT_ID}', 'aud': PROJECT_ID,
+            'sub': uid, 'auth_time': now, 'iat': now, 'exp': now + lifetime
+        }).decode()
+
+
+def install_local_auth(public_pem: str):
+    """Make the app verify LocalAuth tokens instead of Firebase ones (load tests only)"""
+    from google.auth import jwt
+    from services import auth_tokens
+
+    def verify(token: str) -> Dict[str, Any]:
+        claims = jwt.decode(token, certs={KEY_ID: public_pem}, audience=PROJECT_ID)
+        claims['uid'] = claims['sub']
+        return claims
+
+    auth_tokens._verify = verify
+
+
+def serve_stubs(args):
+    """Run the upstream stubs (the child process started by run_load_test); prints the port"""
+    stubs = StubUpstreams(args.latency, args.fixtures)
+    print(stubs.port, flush=True)
+    stubs.serve_forever()
+
+
+def serve(args):
+    """Run the app for a load test (the child process started by run_load_test)"""
+    from config import Config
+    from application import create_app
+    from werkzeug.serving import make_server
+
+    class LoadTestConfig(Config):
+        STORAGE_BACKEND = args.storage
+        WEATHER_API_BASE_URL = args.weather_url
+        DIRECTIONS_API_URL = args.directions_url
+        WEATHER_API_KEY = Config.WEATHER_API_KEY or 'loadtest'
+        GOOGLE_MAPS_API_KEY = Config.GOOGLE_MAPS_API_KEY or 'loadtest'
+        ADMIN_TOKEN = os.environ['LOADTEST_ADMIN_TOKEN']
+
+    app = create_app(LoadTestConfig)
+    install_local_auth(os.environ['LOADTEST_AUTH_PUBLIC_KEY'])
+    print(f'Serving on 127.0.0.1:{args.port}', flush=True)
+    make_server('127.0.0.1', args.port, app, threaded=True).serve_forever()
+
+
+# Client mix
+
+class Stats:
+    """Latency and status of every request, per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, status: Any, latency: float):
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+            result[endpoint] = {
+                'count': len(latencies),
+                'rps': len(latencies) / elapsed,
+                'errors': errors,
+                'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+                'p50_ms': _percentile(latencies, 50) * 1000,
+                'p95_ms': _percentile(latencies, 95) * 1000,
+                'p99_ms': _percentile(latencies, 99) * 1000,
+                'max_ms': latencies[-1] * 1000,
+            }
+        return result
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class VirtualUser:
+    """One signed-in app user following the client's request pattern"""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, auth: LocalAuth, stats: Stats,
+                 destinations: List[Tuple[float, float]], args):
+        self.rng = random.Random(index)
+        self.uid = f'loadtest-{index}'
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.destinations = destinations
+        self.headers = {'Authorization': f'Bearer {auth.token(self.uid)}'}
+        self.position = (round(fixtures.TALLAHASSEE[0] + self.rng.uniform(-0.15, 0.15), 5),
+                         round(fixtures.TALLAHASSEE[1] + self.rng.uniform(-0.15, 0.15), 5))
+        self.etags: Dict[str, str] = {}
+
+    async def request(self, method: str, endpoint: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(endpoint, 'error', time.perf_counter() - started)
+            return None
+        self.stats.record(endpoint, response.status_code, time.perf_counter() - started)
+        return response
+
+    async def poll(self, path: str, extra_headers: Optional[Dict[str, str]] = None):
+        headers = dict(extra_headers or self.headers)
+        if path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        response = await self.request('GET', f'GET {path}', path, headers=headers)
+        if response is not None and 'ETag' in response.headers:
+            self.etags[path] = response.headers['ETag']
+
+    async def poll_addresses(self):
+        await asyncio.gather(
+            self.poll('/api/users/favorites'),
+            self.poll('/api/users/recent'),
+            self.poll('/api/recents', {'X-User-Id': self.uid}),
+        )
+
+    async def refresh_weather(self):
+        lat_lon = f'{self.position[0]},{self.position[1]}'
+        await self.request('GET', 'GET /api/get_user_pos_weather', '/api/get_user_pos_weather',
+                           params={'lat_lon': lat_lon, 'hours': 12})
+
+    async def trip(self):
+        destination = self.rng.choice(self.destinations)
+        body = {
+            'origin_lat': self.position[0], 'origin_lon': self.position[1],
+            'destination_lat': destination[0], 'destination_lon': destination[1],
+            'include_weather': True, 'zoom': 12
+        }
+        # Re-routing, zooming, switching alternatives: a few generations per trip
+        for attempt in range(self.rng.randint(1, self.args.max_burst)):
+            if attempt:
+                await asyncio.sleep(self.rng.uniform(0.5, 2.0) / self.args.speedup)
+                body['zoom'] = self.rng.choice([10, 12, 14])
+            await self.request('POST', 'POST /api/generate_route', '/api/generate_route', json=body)
+
+        address = {'address': f'Destination {destination}', 'latitude': destination[0],
+                   'longitude': destination[1], 'label': 'Trip'}
+        await self.request('POST', 'POST /api/users/recent', '/api/users/recent', json=address, headers=self.headers)
+        await self.request('POST', 'POST /api/recents', '/api/recents', headers={'X-User-Id': self.uid}, json={
+            'label': 'Trip', 'address': address['address'], 'lat': destination[0], 'lng': destination[1]
+        })
+        if self.rng.random() < 0.1:
+            await self.request('POST', 'POST /api/users/favorites', '/api/users/favorites',
+                               json=dict(address, label=f'Saved {self.rng.randrange(1000)}'), headers=self.headers)
+
+    async def run(self, start_at: float, stop_at: float):
+        args = self.args
+        await asyncio.sleep(max(start_at - time.monotonic(), 0))
+        response = await self.request('POST', 'POST /api/users/create', '/api/users/create',
+                                      json={'email': f'{self.uid}@example.com'}, headers=self.headers)
+        if response is None:
+            return
+
+        now = time.monotonic()
+        next_poll = now + self.rng.uniform(0, args.poll_interval / args.speedup)
+        next_weather = now
+        trip_rate = args.trips_per_hour * args.speedup / 3600
+        next_trip = now + self.rng.expovariate(trip_rate) if trip_rate else math.inf
+
+        while True:
+            wake = min(next_poll, next_weather, next_trip)
+            if wake >= stop_at:
+                return
+            await asyncio.sleep(max(wake - time.monotonic(), 0))
+            now = time.monotonic()
+            if now >= next_weather:
+                next_weather = now + args.weather_interval / args.speedup
+                await self.refresh_weather()
+            if now >= next_poll:
+                next_poll = now + args.poll_interval / args.speedup
+                await self.poll_addresses()
+            if now >= next_trip:
+                await self.trip()
+                next_trip = time.monotonic() + self.rng.expovariate(trip_rate)
+
+
+async def drive(base_url: str, auth: LocalAuth, args) -> Tuple[Stats, float]:
+    stats = Stats()
+    rng = random.Random(0)
+    destinations = [(round(fixtures.TALLAHASSEE[0] + rng.uniform(-1.5, 1.5), 4),
+                     round(fixtures.TALLAHASSEE[1] + rng.uniform(-1.5, 1.5), 4))
+                    for _ in range(args.destinations)]
+
+    limits = httpx.Limits(max_connections=args.max_connections or args.users, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        users = [VirtualUser(i, client, auth, stats, destinations, args) for i in range(args.users)]
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(
+            user.run(started + args.ramp * i / args.users, stop_at) for i, user in enumerate(users)
+        ))
+        return stats, time.monotonic() - started
+
+
+def _wait_until_up(base_url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'App exited with status {process.returncode} during startup')
+        try:
+            if httpx.get(f'{base_url}/', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'App did not come up within {timeout:.0f}s')
+
+
+def run_load_test(args) -> Dict[str, Any]:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-m', 'benchmarks.loadtest']
+    processes = []
+    log = open(args.app_log, 'w') if args.app_log else subprocess.DEVNULL
+    try:
+        stub_args = ['stubs', '--latency', str(args.upstream_latency)]
+        stub_args += ['--fixtures', args.fixtures] if args.fixtures else []
+        stubs = subprocess.Popen(command + stub_args, cwd=backend_dir, stdout=subprocess.PIPE, text=True)
+        processes.append(stubs)
+        stub_url = f'http://127.0.0.1:{int(stubs.stdout.readline())}'
+
+        auth = LocalAuth()
+        base_url = f'http://127.0.0.1:{args.port}'
+        admin_token = secrets.token_urlsafe(32)  # For /api/cache/stats
+        processes.append(subprocess.Popen(
+            command + ['serve', '--port', str(args.port), '--storage', args.storage,
+                       '--weather-url', f'{stub_url}/v1/', '--directions-url', f'{stub_url}/maps/api/directions/json'],
+            cwd=backend_dir, env=dict(os.environ, LOADTEST_AUTH_PUBLIC_KEY=auth.public_pem, LOADTEST_ADMIN_TOKEN=admin_token),
+            stdout=log, stderr=subprocess.STDOUT
+        ))
+        _wait_until_up(base_url, processes[-1])
+
+        print(f'Driving {args.users} users for {args.duration:.0f}s (speedup x{args.speedup:g})...', file=sys.stderr)
+        stats, elapsed = asyncio.run(drive(base_url, auth, args))
+        cache_stats = httpx.get(f'{base_url}/api/cache/stats', timeout=10,
+                                headers={'Authorization': f'Bearer {admin_token}'}).json()
+        upstream_calls = httpx.get(f'{stub_url}/_calls', timeout=10).json()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(10)
+        if args.app_log:
+            log.close()
+
+    return {
+        'config': {key: value for key, value in vars(args).items() if key != 'command'},
+        'elapsed_s': elapsed,
+        'endpoints': stats.summary(elapsed),
+        'upstream_calls': upstream_calls,
+        'cache_stats': cache_stats,
+    }
+
+
+def report(result: Dict[str, Any], out=sys.stdout):
+    endpoints = result['endpoints']
+    print(f"{'endpoint':<34} {'count':>7} {'rps':>8} {'errors':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}", file=out)
+    for name, row in endpoints.items():
+        print(f"{name:<34} {row['count']:>7} {row['rps']:>8.1f} {row['errors']:>6} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}", file=out)
+    total = sum(row['count'] for row in endpoints.values())
+    print(f"{'total':<34} {total:>7} {total / result['elapsed_s']:>8.1f} "
+          f"{sum(row['errors'] for row in endpoints.values()):>6}", file=out)
+    print(f"upstream calls: {result['upstream_calls']}", file=out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest', description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='run the app for a load test (started automatically)')
+    serve_parser.add_argument('--port', type=int, required=True)
+    serve_parser.add_argument('--storage', default='sqlite')
+    serve_parser.add_argument('--weather-url', required=True)
+    serve_parser.add_argument('--directions-url', required=True)
+
+    stubs_parser = subparsers.add_parser('stubs', help='run the upstream stubs (started automatically)')
+    stubs_parser.add_argument('--latency', type=float, default=0.1)
+    stubs_parser.add_argument('--fixtures')
+
+    parser.add_argument('--users', type=int, default=100, help='virtual users (default 100)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load (default 60)')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds to start all users over (default 10)')
+    parser.add_argument('--speedup', type=float, default=1,
+                        help='divide every client interval by this, e.g. 60 plays an hour per minute')
+    parser.add_argument('--poll-interval', type=float, default=5, help='favorites/recents polling (default 5s)')
+    parser.add_argument('--weather-interval', type=float, default=3600, help='weather refresh (default 3600s)')
+    parser.add_argument('--trips-per-hour', type=float, default=4, help='route generation bursts per user-hour')
+    parser.add_argument('--max-burst', type=int, default=3, help='most route generations per trip (default 3)')
+    parser.add_argument('--destinations', type=int, default=50, help='distinct trip destinations (default 50)')
+    parser.add_argument('--max-connections', type=int, help='client connection limit (default: one per user)')
+    parser.add_argument('--timeout', type=float, default=30, help='client request timeout in seconds')
+    parser.add_argument('--upstream-latency', type=float, default=0.1, help='stub upstream delay (default 0.1s)')
+    parser.add_argument('--fixtures', metavar='DIR', help='recorded forecast.json / directions.json to replay')
+    parser.add_argument('--storage', default='sqlite', help='STORAGE_BACKEND for the app (default sqlite)')
+    parser.add_argument('--port', type=int, default=5055, help='port for the app (default 5055)')
+    parser.add_argument('--app-log', metavar='PATH', help="write the app's output here")
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args)
+        return 0
+    if args.command == 'stubs':
+        serve_stubs(args)
+        return 0
+
+    result = run_load_test(args)
+    report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
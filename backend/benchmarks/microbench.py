@@ -0,0 +1,339 @@
+"""
+CPU microbenchmarks for the code every request runs
+
+Each case times one hot-path call on fixture data (see benchmarks.fixtures)
+and measures the memory it allocates. Results are saved as JSON so runs can
+be compared; with a baseline, any case whose throughput dropped by more than
+the threshold fails the run.
+
+Usage (from backend/):
+    python -m benchmarks                      # run all, save to benchmarks/results/
+    python -m benchmarks -k user              # only cases whose name contains "user"
+    python -m benchmarks --compare latest     # compare with the previous saved run
+    python -m benchmarks --compare base.json --threshold 0.10
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+from models.user import Address, User, RecentDestination, upsert_recent_destination
+from services import metrics, polyline
+from services.forecast import parse_forecast
+from services.route_scoring import score_routes
+from services.route_weather import sample_route, _build_segments
+from services.weather import project_forecast, snap_lat_lon
+from . import fixtures
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+DEFAULT_THRESHOLD = 0.15  # Fail when a case loses more than 15% of its ops/sec
+
+# name -> factory returning the zero-argument function to time
+CASES: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    """Register a benchmark case: a factory that prepares fixtures and returns the call to time"""
+    def register(factory):
+        CASES[name] = factory
+        return factory
+    return register
+
+
+# Flask serializes responses with this provider (sorted keys, compact separators)
+_json = DefaultJSONProvider(Flask(__name__))
+_NOW = 1759320000  # Fixed clock so projections pick the same hours every run
+
+
+for _favorites in (10, 200):
+    @case(f'user.from_dict[{_favorites} favorites]')
+    def _user_from_dict(favorites=_favorites):
+        data = fixtures.user_profile(favorites=favorites)
+        return lambda: User.from_dict(data)
+
+    @case(f'user.to_dict[{_favorites} favorites]')
+    def _user_to_dict(favorites=_favorites):
+        user = User.from_dict(fixtures.user_profile(favorites=favorites))
+        return user.to_dict
+
+    @case(f'user.changed_fields[{_favorites} favorites]')
+    def _user_changed_fields(favorites=_favorites):
+        user = User.from_dict(fixtures.user_profile(favorites=favorites))
+        user.mark_clean()
+        user.favorite_addresses[-1].label = 'Renamed'
+        return user.changed_fields
+
+    @case(f'user.changed_fields[{_favorites} favorites, recents only]')
+    def _user_changed_recents(favorites=_favorites):
+        # The write path: stored state is the fetched dict, and only the touched field is compared
+        data = fixtures.user_profile(favorites=favorites)
+        user = User.from_dict(data)
+        user.mark_clean(stored=data)
+        user.recent_addresses = user.recent_addresses[1:]
+        return lambda: user.changed_fields(['recent_addresses'])
+
+
+@case('address.to_dict')
+def _address_to_dict():
+    address = Address.from_dict(fixtures.user_profile(favorites=0)['favorite_addresses'][0])
+    return address.to_dict
+
+
+@case('user.add_recent_address[10 recents]')
+def _add_recent_address():
+    user = User.from_dict(fixtures.user_profile(recents=10))
+    template = fixtures.user_profile(recents=10, seed=1)['recent_addresses'][3]
+
+    def add():
+        # Alternate between a new address and one already in the list (dedupe path)
+        user.add_recent_address(Address.from_dict(template))
+        user.add_recent_address(Address.from_dict(user.recent_addresses[5].to_dict()))
+    return add
+
+
+@case('upsert_recent_destination[10 recents]')
+def _upsert_recent_destination():
+    existing = fixtures.recent_destinations(10)
+    by_place = RecentDestination(label='x', address='y', lat=0.0, lng=0.0, place_id=existing[3]['place_id'])
+    by_coords = RecentDestination(label='x', address='y', lat=existing[4]['lat'], lng=existing[4]['lng'])
+
+    def upsert():
+        upsert_recent_destination(existing, by_place)
+        upsert_recent_destination(existing, by_coords)
+    return upsert
+
+
+@case('forecast.parse[2 days]')
+def _parse_forecast():
+    payload = fixtures.forecast_payload(days=2, now=_NOW)
+    return lambda: parse_forecast(payload)
+
+
+@case('forecast.project_and_serialize[12 hours]')
+def _project_forecast():
+    # What /api/get_user_pos_forecast_weather does per request on a cache hit
+    record = parse_forecast(fixtures.forecast_payload(days=2, now=_NOW))
+    return lambda: _json.dumps({'forecast': project_forecast(record, 12, now=_NOW + 1800)})
+
+
+@case('polyline.decode_array[600 points]')
+def _decode_polyline():
+    encoded = fixtures.directions_payload(routes=1)['routes'][0]['overview_polyline']['points']
+    return lambda: polyline.decode_array(encoded)
+
+
+def _route_weathers():
+    record = parse_forecast(fixtures.forecast_payload(days=2, now=_NOW))
+    routes = fixtures.directions_payload(routes=3)['routes']
+    weathers = []
+    for route in routes:
+        points = polyline.decode(route['overview_polyline']['points'])
+        samples, total_m = sample_route(points, Config.ROUTE_WEATHER_SPACING_M, Config.ROUTE_WEATHER_MAX_SAMPLES)
+        cells = [snap_lat_lon(f"{lat},{lon}", Config.WEATHER_GRID_DEGREES) for lat, lon, _ in samples]
+        weathers.append((samples, cells, total_m, route['legs'][0]['duration']['value']))
+    forecasts = {cell: (record, False) for _, cells, _, _ in weathers for cell in cells}
+    return routes, weathers, forecasts
+
+
+@case('route_weather.build_segments[3 routes]')
+def _build_route_segments():
+    _, weathers, forecasts = _route_weathers()
+    return lambda: [_build_segments(samples, cells, total_m, duration_s, _NOW, forecasts)
+                    for samples, cells, total_m, duration_s in weathers]
+
+
+@case('route_scoring.score_routes[3 routes]')
+def _score_routes():
+    _, weathers, forecasts = _route_weathers()
+    built = [_build_segments(*weather[:4], _NOW, forecasts) for weather in weathers]
+    return lambda: score_routes(built, Config.WEATHER_WEIGHTS)
+
+
+@case('metrics.observe_upstream')
+def _observe_upstream():
+    # Recorded for every weather / directions / Firestore / auth call
+    started = time.perf_counter()
+    return lambda: metrics.observe_upstream('weather', 'GET', started, size=18000)
+
+
+@case('generate_route.serialize[3 routes + weather]')
+def _serialize_routes():
+    # The /api/generate_route response body for three alternatives with weather
+    routes, weathers, forecasts = _route_weathers()
+    summaries = []
+    for route, weather in zip(routes, weathers):
+        leg = route['legs'][0]
+        summaries.append({
+            "overview_polyline": route['overview_polyline']['points'],
+            "summary": route['summary'],
+            "bounds": route['bounds'],
+            "distance": leg['distance'],
+            "duration": leg['duration'],
+            "start_location": leg['start_location'],
+            "end_location": leg['end_location'],
+            "start_address": leg['start_address'],
+            "end_address": leg['end_address'],
+            "weather": _build_segments(*weather[:4], _NOW, forecasts),
+            "weather_score": 0.8,
+            "weather_factors": {"temperature": 0.1, "precipitation": 0.2, "wind": 0.0, "visibility": 0.0}
+        })
+    body = {"status": "success", "route": summaries[0], "routes": summaries}
+    return lambda: _json.dumps(body)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Time fn and measure its allocations
+
+    The loop count is calibrated (timeit autorange, >= 0.2 s per run), then
+    `repeat` runs are timed; the median is reported so one noisy run does not
+    move the result. Allocations are measured on a separate warm call with
+    tracemalloc: peak = most memory held at once during the call, retained =
+    what was still allocated after it returned.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_op = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    median = statistics.median(per_op)
+
+    fn()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": 1 / median,
+        "us_per_op": median * 1e6,
+        "us_per_op_min": min(per_op) * 1e6,
+        "spread": (max(per_op) - min(per_op)) / median,
+        "alloc_peak_bytes": peak - baseline,
+        "alloc_retained_bytes": retained - baseline,
+    }
+
+
+def run(names: List[str], repeat: int) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        results[name] = measure(CASES[name](), repeat)
+        print(f"  {name:<50} {results[name]['ops_per_sec']:>12,.0f} ops/s", file=sys.stderr)
+    return {"meta": _metadata(repeat), "results": results}
+
+
+def _metadata(repeat: int) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(terse=True),
+        "repeat": repeat,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare two runs case by case
+
+    Returns:
+        Names of the cases whose ops/sec dropped by more than threshold
+        (a fraction, e.g. 0.15 for 15%)
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = result['ops_per_sec'] / before['ops_per_sec'] - 1
+        result['change'] = change
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def report(run_data: Dict[str, Any], regressions: List[str], out=sys.stdout):
+    print(f"{'case':<50} {'ops/s':>12} {'us/op':>10} {'peak KiB':>9} {'kept KiB':>9} {'vs base':>8}", file=out)
+    for name, result in run_data['results'].items():
+        change = f"{result['change']:+.1%}" if 'change' in result else '-'
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f"{name:<50} {result['ops_per_sec']:>12,.0f} {result['us_per_op']:>10.2f} "
+              f"{result['alloc_peak_bytes'] / 1024:>9.1f} {result['alloc_retained_bytes'] / 1024:>9.1f} "
+              f"{change:>8}{flag}", file=out)
+
+
+def _latest_result(exclude: Optional[str] = None) -> Optional[str]:
+    paths = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if path != exclude)
+    return paths[-1] if paths else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', dest='filter', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (default 5)')
+    parser.add_argument('--compare', metavar='PATH', help="baseline results file, or 'latest' for the previous run")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed ops/sec drop before failing, as a fraction (default 0.15)')
+    parser.add_argument('--save', metavar='PATH', help='where to save results (default benchmarks/results/<time>.json)')
+    parser.add_argument('--no-save', action='store_true', help="don't save results")
+    parser.add_argument('--list', action='store_true', help='list cases and exit')
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if not args.filter or args.filter in name]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+    if not names:
+        parser.error(f'no case matches {args.filter!r}')
+
+    baseline_path = _latest_result() if args.compare == 'latest' else args.compare
+    if args.compare and baseline_path is None:
+        parser.error('no saved results to compare with')
+
+    print(f"Running {len(names)} benchmarks...", file=sys.stderr)
+    run_data = run(names, args.repeat)
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(run_data, baseline, args.threshold)
+        run_data['meta']['baseline'] = {"path": baseline_path, "commit": baseline['meta'].get('commit'),
+                                        "threshold": args.threshold}
+    report(run_data, regressions)
+
+    if not args.no_save:
+        path = args.save or os.path.join(
+            RESULTS_DIR, time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()) + f"-{run_data['meta']['commit'] or 'local'}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(run_data, f, indent=2)
+        print(f"Saved results to {path}", file=sys.stderr)
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slowed down by more than {args.threshold:.0%} vs {baseline_path}",
+              file=sys.stderr)
+        return 1
+    return 0
@@ -15,19 +15,107 @@ class Config:
     FIREBASE_CREDENTIALS_PATH = os.environ.get('FIREBASE_CREDENTIALS_PATH')
     FIREBASE_DATABASE_URL = os.environ.get('FIREBASE_DATABASE_URL')
     
+    # Logging Configuration (see services/log.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    # Per-module overrides, e.g. "models.database=DEBUG,werkzeug=WARNING"
+    LOG_LEVELS = os.environ.get('LOG_LEVELS') or ''
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or 'json'  # 'json' (one object per line) or 'text'
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE') or 1.0)  # Fraction of DEBUG records kept
+    LOG_QUEUE_SIZE = 10000  # Records waiting to be written before new ones are dropped
+    LOG_MAX_FIELD_CHARS = 512  # Longer string fields are truncated
+    LOG_MAX_ITEMS = 20  # Longer lists / dicts in fields are truncated
+    
+    # Bearer token for the operational endpoints (/metrics, /api/traces); unset disables them
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    
+    # Request Tracing (see services/tracing.py)
+    TRACE_ENABLED = (os.environ.get('TRACE_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS') or 500)  # Requests at least this slow are always kept
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE') or 0.0)  # Fraction of faster requests kept
+    TRACE_BUFFER_SIZE = 200  # Kept traces served on /api/traces
+    TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH')  # Also append kept traces to this JSONL file
+    
+    # Storage Configuration: 'firestore', or 'sqlite' to run without Firebase credentials or network
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND') or 'firestore'
+    STORAGE_SQLITE_PATH = os.environ.get('STORAGE_SQLITE_PATH') or ':memory:'
+    
+    # Startup: import the Firebase / Firestore SDKs and read credentials when the app is built, instead of
+    # on the first request that needs them (see services/firebase_app.preload)
+    STARTUP_PRELOAD = (os.environ.get('STARTUP_PRELOAD') or 'false').lower() in ('1', 'true', 'yes')
+    
     # Redis Configuration
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Production Server (gunicorn -c gunicorn.conf.py wsgi:app)
+    SERVER_BIND = os.environ.get('SERVER_BIND') or '0.0.0.0:5000'
+    # One process per core, but only one unless Socket.IO has a message queue to reach the other workers' sockets
+    SERVER_WORKERS = int(
+        os.environ.get('SERVER_WORKERS') or (os.cpu_count() or 1 if os.environ.get('SOCKETIO_MESSAGE_QUEUE') else 1)
+    )
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS') or 16)  # Requests per worker at once (gthread workers)
+    SERVER_TIMEOUT = 30  # Seconds a worker may be silent before it is restarted
+    SERVER_GRACEFUL_TIMEOUT = 30  # Seconds in-flight requests get to finish on shutdown or reload
+    SERVER_KEEPALIVE = 5  # Seconds an idle client connection is kept open
+    
+    # Socket.IO Configuration (push of favorites/recents changes)
+    SOCKETIO_ASYNC_MODE = 'threading'
+    # Set (e.g. to REDIS_URL) when running several worker processes, so a change
+    # made in one process reaches sockets connected to the others (required when SERVER_WORKERS > 1)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CORS_ALLOWED_ORIGINS = '*'
+    
     # Weather API Configuration
     WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY')
-    WEATHER_API_BASE_URL = 'http://api.weatherapi.com/v1/'
+    WEATHER_API_BASE_URL = 'https://api.weatherapi.com/v1/'
     
     # Google Maps Configuration
     GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
+    DIRECTIONS_API_URL = 'https://maps.googleapis.com/maps/api/directions/json'
+
+    # Outbound HTTP clients, one pooled client per upstream (see services/http_client.py)
+    # Timeouts and deadline in seconds; deadline bounds the total time including retries
+    UPSTREAMS = {
+        'weather': {
+            'connect_timeout': 3.05, 'read_timeout': 5, 'deadline': 8,
+            'retries': 2, 'breaker_threshold': 5, 'breaker_reset': 30,
+            'max_connections': 50, 'http2': True
+        },
+        'directions': {
+            'connect_timeout': 3.05, 'read_timeout': 10, 'deadline': 15,
+            'retries': 1, 'breaker_threshold': 5, 'breaker_reset': 30,
+            'max_connections': 20, 'http2': True
+        }
+    }
     
     # App Configuration
     CACHE_TTL = 300  # 5 minutes for weather data
+    WEATHER_HARD_TTL = 1800  # Until this age, expired weather is served while refreshed in the background
+    WEATHER_MAX_STALE = 6 * 3600  # Oldest weather served (marked stale) while WeatherAPI is failing
+    WEATHER_GRID_DEGREES = 0.01  # Weather cache cell size (~1.1 km); nearby users share entries
+    WEATHER_CACHE_MAX_ENTRIES = 4096
+    WEATHER_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+    WEATHER_FORECAST_DAYS = 2  # forecast.json days; also provides current conditions
     ROUTE_CACHE_TTL = 600  # 10 minutes for route data
+    ROUTE_CACHE_PRECISION = 4  # Decimal places origin/destination are rounded to for caching (~11 m)
+    ROUTE_CACHE_MAX_ENTRIES = 2048
+    ROUTE_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 32 MB
+    USER_CACHE_TTL = 60  # Safety net for profile edits made outside the app (e.g. the console)
+    # Confirm a cached profile's update_time with a projected read before serving it, so profiles written
+    # by other worker processes are never served stale
+    USER_CACHE_VALIDATE = SERVER_WORKERS > 1
+    USER_CACHE_MAX_ENTRIES = 10000
+    AUTH_TOKEN_CACHE_TTL = 3600  # Upper bound on caching a verified ID token (tokens also expire at their exp)
+    AUTH_TOKEN_CACHE_MAX_ENTRIES = 10000
+    AUTH_CHECK_REVOKED = os.environ.get('AUTH_CHECK_REVOKED', '').lower() in ('1', 'true', 'yes')
+    AUTH_REVOCATION_RECHECK = 300  # With AUTH_CHECK_REVOKED, cached tokens are re-checked for revocation this often
+    AUTH_CERT_REFRESH_INTERVAL = 3600  # Re-download Google's signing certs in the background this often (0 disables)
+    FIRESTORE_MAX_CONCURRENCY = 64  # Firestore operations in flight per process
+    FIRESTORE_MAX_QUEUE = 256  # Operations allowed to wait for a slot before new ones are rejected
+    FIRESTORE_TIMEOUT = 10  # Deadline per operation in seconds, including time spent queued
+    FIRESTORE_RETRY_AFTER = 2  # Retry-After seconds sent with the 503 / 504 for saturated or timed-out Firestore
+    ROUTE_WEATHER_SPACING_M = 5000  # Distance between weather samples along a route
+    ROUTE_WEATHER_MAX_SAMPLES = 100  # Spacing widens on long routes to stay under this
+    ROUTE_WEATHER_MAX_CONCURRENCY = 8  # Concurrent WeatherAPI requests per route weather request
     MAX_ROUTE_ALTERNATIVES = 3
     
     # Weather Preference Weights
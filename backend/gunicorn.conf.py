@@ -0,0 +1,30 @@
+# backend/gunicorn.conf.py
+# Production server settings (see Config.SERVER_*): gunicorn -c gunicorn.conf.py wsgi:app
+from config import Config
+
+if Config.SERVER_WORKERS > 1 and not Config.SOCKETIO_MESSAGE_QUEUE:
+    # Pushes from one worker would never reach sockets held by the others, and connected clients stop polling
+    raise RuntimeError('SERVER_WORKERS > 1 requires SOCKETIO_MESSAGE_QUEUE (e.g. the REDIS_URL) to be set')
+
+bind = Config.SERVER_BIND
+# Real threads only: the shared asyncio loop thread (services/aio.py) and the grpc-aio Firestore
+# client do not run under gevent / eventlet monkey-patching
+worker_class = 'gthread'
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+keepalive = Config.SERVER_KEEPALIVE
+
+# Build the app once in the master and fork it: Firebase, Firestore, the I/O loop, connection
+# pools and background threads are all created lazily in each worker, after the fork
+preload_app = True
+
+# Logs go through the app's structured logger (see Config.LOG_*)
+accesslog = None
+
+
+def worker_exit(server, worker):
+    # After the graceful drain (SIGTERM: stop accepting, let in-flight requests finish)
+    from application import shutdown
+    shutdown()
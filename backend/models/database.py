@@ -1,70 +1,196 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import Optional, List
+from typing import Callable, Optional, List, Tuple
 from datetime import datetime
 from .user import User, Address
+from services.cache import TTLCache
+from services.firebase_app import initialize_firebase
+from services.log import get_logger
+from services import aio, tracing
+from .firestore_exec import FirestoreUnavailableError
+from .storage import Storage, FirestoreStorage, SQLiteStorage
+import asyncio
 import os
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
-import functools
+import random
+import weakref
 
-# Global Firestore client
+log = get_logger(__name__)
+
+# Global async Firestore client, created on first use on the shared I/O loop (in each process)
 db = None
+_db_pid: Optional[int] = None
 
-def initialize_firebase():
-    """
-    Initialize Firebase Admin SDK
-    Should be called once at application startup
-    """
-    global db
-    
-    if db is not None:
-        return db  # Already initialized
-    
-    try:
-        # Check if Firebase is already initialized
-        firebase_admin.get_app()
-    except ValueError:
-        # Not initialized, initialize it
-        cred_path = os.environ.get('FIREBASE_CREDENTIALS_PATH')
-        
-        if cred_path and os.path.exists(cred_path):
-            # Initialize with credentials file
-            cred = credentials.Certificate(cred_path)
-            firebase_admin.initialize_app(cred)
-        else:
-            # Initialize with default credentials (for deployed environments)
-            firebase_admin.initialize_app()
-    
-    # Create Firestore client
-    db = firestore.client()
-    print("[DB] Firestore client initialized successfully")
-    
-    return db
+# Document storage every operation below goes through, set up by init_storage()
+_storage: Optional[Storage] = None
 
+# Profile cache (uid -> (user dict, update_time)), set up by init_user_cache()
+_user_cache: Optional[TTLCache] = None
+# Check cached profiles against storage before serving them (when other processes also write them)
+_validate_cached = False
+
+# Callbacks run after a user's saved addresses change, see add_change_listener()
+_change_listeners = []
+
+# Fields touched by the address operations, so writes only compare those (see update_user)
+_FAVORITES = ['favorite_addresses']
+_RECENTS = ['recent_addresses']
+
+# Read-modify-write attempts before giving up on a contended profile
+MAX_WRITE_ATTEMPTS = 5
+
+# Per-user write locks, so writers in this process queue up instead of conflicting
+_write_locks = weakref.WeakValueDictionary()
+
+
+class UserWriteConflictError(Exception):
+    """Raised when a profile kept changing underneath a read-modify-write"""
 
 def get_firestore_client():
-    """Get Firestore client, initializing if necessary"""
-    global db
-    if db is None:
+    """
+    Get the async Firestore client, initializing if necessary
+
+    The client's gRPC channel belongs to the event loop it is first used on,
+    so this must only be called from coroutines running on the shared I/O loop
+    (services.aio), which is where every async view runs. A client inherited
+    through fork is never used: each worker creates its own, since gRPC
+    channels do not survive a fork.
+    """
+    global db, _db_pid
+    if db is None or _db_pid != os.getpid():
+        # Imported here, not at module level, so startup never loads Firestore and gRPC
+        from firebase_admin import firestore_async
         initialize_firebase()
+        db = firestore_async.client()
+        _db_pid = os.getpid()
+        log.info('firestore.client_ready', pid=_db_pid)
     return db
 
 
+def init_storage(config) -> Storage:
+    """
+    Create the document storage backend
+    Should be called once at application startup
+
+    Args:
+        config: Flask config mapping (STORAGE_BACKEND: 'firestore' or 'sqlite',
+            STORAGE_SQLITE_PATH)
+
+    Returns:
+        The Storage
+
+    Raises:
+        ValueError: If STORAGE_BACKEND is not a known backend
+    """
+    global _storage
+
+    backend = config['STORAGE_BACKEND']
+    if backend == 'firestore':
+        _storage = FirestoreStorage(get_firestore_client)
+    elif backend == 'sqlite':
+        _storage = SQLiteStorage(config['STORAGE_SQLITE_PATH'])
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend!r} (expected 'firestore' or 'sqlite')")
+    log.info('storage.init', backend=backend)
+    return _storage
+
+
+def get_storage() -> Storage:
+    """Get the document storage set up by init_storage()"""
+    return _storage
+
+
+def init_user_cache(config) -> TTLCache:
+    """
+    Create the in-process user profile cache
+    Should be called once at application startup
+
+    Args:
+        config: Flask config mapping (USER_CACHE_TTL, USER_CACHE_MAX_ENTRIES, USER_CACHE_VALIDATE)
+
+    Returns:
+        The user TTLCache
+    """
+    global _user_cache, _validate_cached
+
+    _user_cache = TTLCache(ttl=config['USER_CACHE_TTL'], max_entries=config['USER_CACHE_MAX_ENTRIES'])
+    _validate_cached = config['USER_CACHE_VALIDATE']
+    return _user_cache
+
+
+def apply_cached_write(uid: str, changes: dict, previous_update_time=None, update_time=None) -> None:
+    """
+    Keep the profile cache current after a write made without a User (e.g. the recents routes)
+
+    The cached profile is patched with the written fields when it is the
+    version the write was conditional on (previous_update_time); otherwise
+    it is dropped and read again on next use.
+    """
+    entry = _user_cache.get(uid)
+    if entry is not None and update_time is not None and entry[1] == previous_update_time:
+        _user_cache.set(uid, (dict(entry[0], **changes), update_time))
+    else:
+        _user_cache.invalidate(uid)
+
+
+def add_change_listener(listener):
+    """
+    Register a callback for changes to users' saved addresses
+
+    The callback is called as listener(uid, changes) in a worker thread, where
+    changes maps 'favorites' / 'recent' (lists of address dicts, with
+    'updated_at') or 'recents' (recent destinations) to their new values.
+    """
+    _change_listeners.append(listener)
+
+
+def publish_change(uid: str, changes: dict):
+    """Notify change listeners without blocking the caller (must run on the I/O loop)"""
+    loop = asyncio.get_running_loop()
+    for listener in _change_listeners:
+        loop.run_in_executor(None, listener, uid, changes)
+
+
+def user_write_lock(uid: str) -> asyncio.Lock:
+    """
+    Lock serializing read-modify-writes of one user's document within this process
+
+    Writes from other processes are still caught by update_time preconditions.
+    """
+    lock = _write_locks.get(uid)
+    if lock is None:
+        lock = _write_locks[uid] = asyncio.Lock()
+    return lock
+
+
+async def conflict_backoff(attempt: int):
+    """Short jittered sleep before retrying a write that lost a race"""
+    await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+
+def _address_changes(user: User, changes: dict) -> dict:
+    """Changed address lists in the shape change listeners expect"""
+    published = {'updated_at': user.updated_at}
+    if 'favorite_addresses' in changes:
+        published['favorites'] = changes['favorite_addresses']
+    if 'recent_addresses' in changes:
+        published['recent'] = changes['recent_addresses']
+    return published
+
+
 # User CRUD Operations
 
-def create_user(uid: str, email: str) -> User:
+async def create_user(uid: str, email: str) -> Optional[User]:
     """
-    Create a new user in Firestore with default favorite addresses
+    Create a new user with default favorite addresses
+
+    Uses a create precondition, so the existence check and the write are one
+    atomic operation.
     
     Args:
         uid: Firebase Auth UID
         email: User's email address
         
     Returns:
-        User object
+        User object, or None if a profile already exists for uid
     """
-    db = get_firestore_client()
-    
     now = datetime.utcnow().isoformat()
     
     # Create default favorite addresses with labels but no coordinates
@@ -82,75 +208,171 @@ def create_user(uid: str, email: str) -> User:
         recent_addresses=[]
     )
     
-    # Store in Firestore
-    db.collection('users').document(uid).set(user.to_dict())
+    # Store it, failing if the document already exists
+    from google.api_core.exceptions import Conflict
+    user_data = user.to_dict()
+    try:
+        update_time = await _storage.create('users', uid, user_data)
+    except Conflict:
+        return None
+    except Exception:
+        _user_cache.invalidate(uid)
+        raise
+    user.mark_clean(update_time, user_data)
+    _user_cache.set(uid, (user_data, update_time))
     
     return user
 
 
-def get_user(uid: str) -> Optional[User]:
+async def get_user(uid: str) -> Optional[User]:
     """
-    Get a user from Firestore by UID
+    Get a user by UID, from the profile cache when possible
+
+    Misses read the document from storage; concurrent misses for the same
+    user share one read. Every write below keeps the cache current, and
+    entries expire after USER_CACHE_TTL in case the document is edited
+    elsewhere (the console). When several processes serve requests
+    (USER_CACHE_VALIDATE), a cached profile is only used after a projected
+    read confirms its update_time. Missing profiles are never cached, since
+    a signup may be completing in another request.
     
     Args:
         uid: Firebase Auth UID
         
     Returns:
-        User object or None if not found
+        User object (with its stored state recorded for update_user) or None if not found
     """
-    print(f"[DB] get_user called for uid: {uid}")
-    db = get_firestore_client()
-    print(f"[DB] Firestore client obtained")
-    
-    doc_ref = db.collection('users').document(uid)
-    print(f"[DB] Getting document from Firestore...")
-    
+    with tracing.span('users.get_user'):
+        entry = await _cached_user_data(uid)
+        if entry is None:
+            return None
+        # Cached dicts are shared, so every caller gets its own User to mutate.
+        # Built in a worker thread: large profiles take milliseconds, which would stall the I/O loop
+        user_data, update_time = entry
+        user = await aio.to_thread(User.from_dict, user_data)
+        user.mark_clean(update_time, user_data)
+        return user
+
+
+async def _cached_user_data(uid: str) -> Optional[tuple]:
+    """(data, update_time) of a user from the cache or storage, or None if not found"""
+    if _validate_cached:
+        entry = _user_cache.get(uid)
+        if entry is not None:
+            doc = await _storage.get('users', uid, fields=['updated_at'])
+            if doc.exists and doc.update_time == entry[1]:
+                return entry
+            _user_cache.invalidate(uid)
+
+    entry = await _user_cache.get_or_load(uid, lambda: _fetch_user_data(uid))
+    if entry is None:
+        _user_cache.invalidate(uid)
+    return entry
+
+
+async def _fetch_user_data(uid: str) -> Optional[tuple]:
+    """Read a user document from storage: (data, update_time), or None if not found"""
     try:
-        # Add timeout to prevent hanging
-        executor = ThreadPoolExecutor(max_workers=1)
-        future = executor.submit(lambda: doc_ref.get())
-        doc = future.result(timeout=10)  # 10 second timeout
-        print(f"[DB] Document retrieved. Exists: {doc.exists}")
-        
-        if doc.exists:
-            user_data = doc.to_dict()
-            print(f"[DB] User data: {user_data}")
-            return User.from_dict(user_data)
-        return None
-    except TimeoutError:
-        print(f"[DB] ERROR: Timeout waiting for Firestore response")
-        raise Exception("Firestore operation timed out")
+        # On Firestore, bounded by the executor's deadline (Config.FIRESTORE_TIMEOUT)
+        doc = await _storage.get('users', uid)
+    except FirestoreUnavailableError as e:
+        # Expected under overload (timed out or rejected); answered with 503 / 504
+        log.warning('users.get_unavailable', uid=uid, error=type(e).__name__)
+        raise
     except Exception as e:
-        print(f"[DB] ERROR: Exception in get_user: {str(e)}")
+        log.error('users.get_failed', uid=uid, error=repr(e))
         raise
+    log.debug('users.get', uid=uid, exists=doc.exists)
 
+    if doc.exists:
+        return doc.to_dict(), doc.update_time
+    return None
 
-def update_user(user: User) -> User:
+
+async def update_user(user: User, fields: Optional[List[str]] = None) -> User:
     """
-    Update a user in Firestore
+    Write a user's changes to storage
+
+    Only the top-level fields that differ from the stored state (see
+    User.changed_fields) are sent, as a field-masked update; if nothing
+    changed, no write is made. When the user was read from storage, the
+    write is conditional on the document's update_time being unchanged.
     
     Args:
-        user: User object with updated data
+        user: User object (from get_user) with updated data
+        fields: Top-level fields the change can have touched, if known;
+            only these are compared with the stored document
         
     Returns:
         Updated User object
+        
+    Raises:
+        FailedPrecondition: If the document changed since user was read
     """
-    print(f"[DB] update_user called for uid: {user.uid}")
-    db = get_firestore_client()
+    changes = user.changed_fields(fields)
+    if not changes:
+        log.debug('users.update_skipped', uid=user.uid)
+        return user
     
     user.updated_at = datetime.utcnow().isoformat()
-    print(f"[DB] Updated timestamp: {user.updated_at}")
+    changes['updated_at'] = user.updated_at
     
-    print(f"[DB] Updating document in Firestore...")
-    db.collection('users').document(user.uid).update(user.to_dict())
-    print(f"[DB] Document updated successfully")
+    log.debug('users.update', uid=user.uid, fields=sorted(changes))
+    try:
+        with tracing.span('users.update_user', fields=len(changes)):
+            update_time = await _storage.update('users', user.uid, changes, last_update_time=user.update_time)
+    except Exception:
+        # Stale, or the write may or may not have been applied; read it back next time
+        _user_cache.invalidate(user.uid)
+        raise
+    # The cached document is the previous one with the written fields replaced; no full re-serialization
+    _user_cache.set(user.uid, (user.mark_written(changes, update_time), update_time))
+    publish_change(user.uid, _address_changes(user, changes))
     
     return user
 
 
-def delete_user(uid: str) -> bool:
+async def _mutate_user(uid: str, mutate: Callable[[User], object],
+                       fields: Optional[List[str]] = None) -> Tuple[Optional[User], object]:
     """
-    Delete a user from Firestore
+    Optimistic read-modify-write of a user profile
+
+    Reads the user (cached if possible), applies mutate(user) and writes only
+    the changed fields, conditional on the document not having changed since
+    the read. Writers in this process take turns (user_write_lock); if a
+    writer elsewhere got there first, the profile is re-read from storage
+    and mutate is applied again, up to MAX_WRITE_ATTEMPTS times.
+
+    Args:
+        uid: Firebase Auth UID
+        mutate: Function applying the change to a User; its return value is passed back
+        fields: Top-level fields mutate can change, if known (see update_user)
+
+    Returns:
+        (user, mutate's return value), or (None, None) if the user was not found
+
+    Raises:
+        UserWriteConflictError: If every attempt lost a race with another writer
+    """
+    from google.api_core.exceptions import FailedPrecondition
+
+    async with user_write_lock(uid):
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            user = await get_user(uid)
+            if user is None:
+                return None, None
+            outcome = mutate(user)
+            try:
+                return await update_user(user, fields), outcome
+            except FailedPrecondition:
+                log.info('users.write_conflict', uid=uid, attempt=attempt + 1)
+                await conflict_backoff(attempt)
+    raise UserWriteConflictError(f"Profile {uid} kept changing, gave up after {MAX_WRITE_ATTEMPTS} attempts")
+
+
+async def delete_user(uid: str) -> bool:
+    """
+    Delete a user from storage
     
     Args:
         uid: Firebase Auth UID
@@ -158,19 +380,19 @@ def delete_user(uid: str) -> bool:
     Returns:
         True if deleted, False if not found
     """
-    db = get_firestore_client()
-    
-    doc_ref = db.collection('users').document(uid)
-    
-    if doc_ref.get().exists:
-        doc_ref.delete()
-        return True
-    return False
+    try:
+        doc = await _storage.get('users', uid, fields=['updated_at'])
+        if doc.exists:
+            await _storage.delete('users', uid)
+            return True
+        return False
+    finally:
+        _user_cache.invalidate(uid)
 
 
-def user_exists(uid: str) -> bool:
+async def user_exists(uid: str) -> bool:
     """
-    Check if a user exists in Firestore
+    Check if a user exists in storage
     
     Args:
         uid: Firebase Auth UID
@@ -178,32 +400,46 @@ def user_exists(uid: str) -> bool:
     Returns:
         True if user exists, False otherwise
     """
-    print(f"[DB] user_exists called for uid: {uid}")
-    db = get_firestore_client()
-    print(f"[DB] Firestore client obtained")
-    
-    doc_ref = db.collection('users').document(uid)
-    print(f"[DB] Getting document to check existence...")
-    
     try:
-        # Add timeout to prevent hanging
-        executor = ThreadPoolExecutor(max_workers=1)
-        future = executor.submit(lambda: doc_ref.get())
-        doc = future.result(timeout=10)  # 10 second timeout
-        exists = doc.exists
-        print(f"[DB] Document exists: {exists}")
-        return exists
-    except TimeoutError:
-        print(f"[DB] ERROR: Timeout waiting for Firestore response")
-        raise Exception("Firestore operation timed out")
+        # On Firestore, bounded by the executor's deadline (Config.FIRESTORE_TIMEOUT)
+        doc = await _storage.get('users', uid, fields=['updated_at'])
+    except FirestoreUnavailableError as e:
+        log.warning('users.exists_unavailable', uid=uid, error=type(e).__name__)
+        raise
     except Exception as e:
-        print(f"[DB] ERROR: Exception in user_exists: {str(e)}")
+        log.error('users.exists_failed', uid=uid, error=repr(e))
         raise
+    log.debug('users.exists', uid=uid, exists=doc.exists)
+    return doc.exists
+
+
+async def get_user_version(uid: str) -> Optional[str]:
+    """
+    Get only a user's updated_at timestamp, for cheap change checks (ETags)
+
+    Answered from the profile cache when the user is cached (unless cached
+    profiles must be validated, see get_user); otherwise uses a field
+    projection, so the address lists are not transferred or deserialized.
+
+    Args:
+        uid: Firebase Auth UID
+
+    Returns:
+        updated_at ISO timestamp or None if user not found
+    """
+    entry = _user_cache.get(uid) if not _validate_cached else None
+    if entry is not None:
+        return entry[0].get('updated_at')
+
+    doc = await _storage.get('users', uid, fields=['updated_at'])
+    if not doc.exists:
+        return None
+    return (doc.to_dict() or {}).get('updated_at')
 
 
 # Address Operations
 
-def add_favorite_address(uid: str, address: Address) -> Optional[User]:
+async def add_favorite_address(uid: str, address: Address) -> Optional[User]:
     """
     Add a favorite address for a user
     
@@ -214,28 +450,13 @@ def add_favorite_address(uid: str, address: Address) -> Optional[User]:
     Returns:
         Updated User object or None if user not found
     """
-    print(f"[DB] add_favorite_address called for uid: {uid}")
-    print(f"[DB] Address: {address}")
-    
-    print(f"[DB] Getting user...")
-    user = get_user(uid)
-    print(f"[DB] Got user: {user}")
-    
-    if user is None:
-        print(f"[DB] User is None, returning None")
-        return None
-    
-    print(f"[DB] Adding address to user's favorites...")
-    user.add_favorite_address(address)
-    print(f"[DB] Address added. User now has {len(user.favorite_addresses)} favorites")
-    
-    print(f"[DB] Updating user in Firestore...")
-    result = update_user(user)
-    print(f"[DB] User updated successfully")
-    return result
+    user, _ = await _mutate_user(uid, lambda user: user.add_favorite_address(address), _FAVORITES)
+    log.debug('users.add_favorite', uid=uid, found=user is not None,
+              favorites=len(user.favorite_addresses) if user else None)
+    return user
 
 
-def update_favorite_address_by_label(uid: str, label: str, address: Address) -> Optional[User]:
+async def update_favorite_address_by_label(uid: str, label: str, address: Address) -> Optional[User]:
     """
     Update a favorite address by label (e.g. "Home", "Work")
     
@@ -247,15 +468,11 @@ def update_favorite_address_by_label(uid: str, label: str, address: Address) ->
     Returns:
         Updated User object or None if user not found
     """
-    user = get_user(uid)
-    if user is None:
-        return None
-    
-    user.update_favorite_by_label(label, address)
-    return update_user(user)
+    user, _ = await _mutate_user(uid, lambda user: user.update_favorite_by_label(label, address), _FAVORITES)
+    return user
 
 
-def remove_favorite_address(uid: str, label: str, latitude: Optional[float], longitude: Optional[float]) -> Optional[User]:
+async def remove_favorite_address(uid: str, label: str, latitude: Optional[float], longitude: Optional[float]) -> Optional[User]:
     """
     Remove a favorite address for a user by label and coordinates
     
@@ -268,15 +485,13 @@ def remove_favorite_address(uid: str, label: str, latitude: Optional[float], lon
     Returns:
         Updated User object or None if user not found
     """
-    user = get_user(uid)
-    if user is None:
-        return None
-    
-    user.remove_favorite_address(label, latitude, longitude)
-    return update_user(user)
+    user, _ = await _mutate_user(
+        uid, lambda user: user.remove_favorite_address(label, latitude, longitude), _FAVORITES
+    )
+    return user
 
 
-def clear_all_favorites(uid: str) -> Optional[User]:
+async def clear_all_favorites(uid: str) -> Optional[User]:
     """
     Clear all favorite addresses for a user
     
@@ -286,15 +501,11 @@ def clear_all_favorites(uid: str) -> Optional[User]:
     Returns:
         Updated User object or None if user not found
     """
-    user = get_user(uid)
-    if user is None:
-        return None
-    
-    user.clear_favorite_addresses()
-    return update_user(user)
+    user, _ = await _mutate_user(uid, lambda user: user.clear_favorite_addresses(), _FAVORITES)
+    return user
 
 
-def add_recent_address(uid: str, address: Address) -> Optional[User]:
+async def add_recent_address(uid: str, address: Address) -> Optional[User]:
     """
     Add a recent address for a user
     
@@ -305,15 +516,67 @@ def add_recent_address(uid: str, address: Address) -> Optional[User]:
     Returns:
         Updated User object or None if user not found
     """
-    user = get_user(uid)
-    if user is None:
-        return None
+    user, _ = await _mutate_user(uid, lambda user: user.add_recent_address(address), _RECENTS)
+    return user
+
+
+async def remove_recent_address(uid: str, label: str, latitude: Optional[float],
+                                longitude: Optional[float]) -> Tuple[Optional[User], bool]:
+    """
+    Remove a recent address for a user by label and coordinates
     
-    user.add_recent_address(address)
-    return update_user(user)
+    Args:
+        uid: Firebase Auth UID
+        label: Address label
+        latitude: Address latitude (optional)
+        longitude: Address longitude (optional)
+        
+    Returns:
+        (user, removed): updated User object (None if user not found) and
+        whether a matching address was found
+    """
+    user, removed = await _mutate_user(
+        uid, lambda user: user.remove_recent_address(label, latitude, longitude), _RECENTS
+    )
+    return user, bool(removed)
+
+
+async def clear_recent_addresses(uid: str) -> Optional[User]:
+    """
+    Clear all recent addresses for a user
+    
+    Args:
+        uid: Firebase Auth UID
+        
+    Returns:
+        Updated User object or None if user not found
+    """
+    user, _ = await _mutate_user(uid, lambda user: user.clear_recent_addresses(), _RECENTS)
+    return user
+
+
+async def apply_user_operations(uid: str, operations: List[Callable[[User], object]]) -> Tuple[Optional[User], List[object]]:
+    """
+    Apply several changes to a user profile with one read and at most one write
+    
+    The operations run in order against the same in-memory User, and the
+    combined change is written once (see _mutate_user). If the write loses a
+    race with another writer, all operations are re-applied to the fresh
+    profile, so they must not depend on state outside the User.
+    
+    Args:
+        uid: Firebase Auth UID
+        operations: Functions applying one change each to a User
+        
+    Returns:
+        (user, results): updated User object (None if user not found) and
+        each operation's return value, in order
+    """
+    user, results = await _mutate_user(uid, lambda user: [operation(user) for operation in operations])
+    return user, results or []
 
 
-def get_user_favorites(uid: str) -> Optional[List[Address]]:
+async def get_user_favorites(uid: str) -> Optional[List[Address]]:
     """
     Get all favorite addresses for a user
     
@@ -323,14 +586,14 @@ def get_user_favorites(uid: str) -> Optional[List[Address]]:
     Returns:
         List of Address objects or None if user not found
     """
-    user = get_user(uid)
+    user = await get_user(uid)
     if user is None:
         return None
     
     return user.favorite_addresses
 
 
-def get_user_recent(uid: str) -> Optional[List[Address]]:
+async def get_user_recent(uid: str) -> Optional[List[Address]]:
     """
     Get all recent addresses for a user
     
@@ -340,7 +603,7 @@ def get_user_recent(uid: str) -> Optional[List[Address]]:
     Returns:
         List of Address objects or None if user not found
     """
-    user = get_user(uid)
+    user = await get_user(uid)
     if user is None:
         return None
     
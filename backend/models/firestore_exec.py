@@ -0,0 +1,153 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from services import metrics, tracing
+
+# Module-level executor, set up once by init_firestore_executor()
+_executor: Optional['FirestoreExecutor'] = None
+
+
+class FirestoreUnavailableError(Exception):
+    """Base for the executor's fast failures; the app answers them with 503 / 504 and Retry-After"""
+
+
+class FirestoreTimeoutError(FirestoreUnavailableError):
+    """Raised when a Firestore operation did not finish within its deadline"""
+
+    def __init__(self, op: str):
+        super().__init__("Firestore operation timed out")
+        self.op = op
+
+
+class FirestoreSaturatedError(FirestoreUnavailableError):
+    """Raised without calling Firestore when too many operations are already waiting"""
+
+    def __init__(self, op: str):
+        super().__init__("Firestore is overloaded, try again later")
+        self.op = op
+
+
+class FirestoreExecutor:
+    """
+    Bounded gate that every Firestore call goes through
+
+    At most `max_concurrency` operations run at once and at most `max_queue`
+    more wait for a slot; beyond that, calls are rejected immediately instead
+    of piling up. Each operation has a deadline (`timeout` seconds by
+    default) that covers both the wait for a slot and the RPC itself; the
+    remaining budget is passed to the client as the native RPC deadline.
+
+    Must be used from the shared I/O loop (services.aio), like the async
+    Firestore client itself.
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_queue: int = 256, timeout: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._clock = clock
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._queued = 0
+        self._stats = dict.fromkeys(('started', 'succeeded', 'failed', 'timed_out', 'rejected'), 0)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Snapshot of the counters
+
+        in_flight / queued: operations running now / waiting for a slot
+        started, succeeded, failed: operations that got a slot and how they ended
+        timed_out: deadlines exceeded, while queued or in the RPC
+        rejected: turned away because the queue was full
+        """
+        return dict(self._stats, in_flight=self._in_flight, queued=self._queued)
+
+    async def run(self, op: str, call: Callable[[float], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Run one Firestore operation within the concurrency limit and its deadline
+
+        Args:
+            op: Operation name for errors and logs (e.g. "users.get")
+            call: Function taking the remaining deadline in seconds and returning
+                the Firestore awaitable, e.g. lambda t: doc_ref.get(timeout=t)
+            timeout: Deadline for this operation (defaults to the executor's)
+
+        Returns:
+            The operation's result
+
+        Raises:
+            FirestoreSaturatedError: If max_queue operations are already waiting
+            FirestoreTimeoutError: If the deadline passed while queued or in the RPC
+        """
+        from google.api_core.exceptions import DeadlineExceeded  # Loaded with the Firestore client anyway
+
+        budget = self.timeout if timeout is None else timeout
+        started = self._clock()
+        timer = time.perf_counter()  # Wall time for metrics; self._clock may be a test clock
+
+        if self._slots.locked():
+            if self._queued >= self.max_queue:
+                self._stats['rejected'] += 1
+                metrics.UPSTREAM_ERRORS.inc('firestore', op, FirestoreSaturatedError.__name__)
+                raise FirestoreSaturatedError(op)
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), budget)
+            except asyncio.TimeoutError:
+                self._stats['timed_out'] += 1
+                metrics.observe_upstream('firestore', op, timer, error=FirestoreTimeoutError(op))
+                raise FirestoreTimeoutError(op) from None
+            finally:
+                self._queued -= 1
+        else:
+            await self._slots.acquire()
+
+        self._in_flight += 1
+        self._stats['started'] += 1
+        try:
+            remaining = max(budget - (self._clock() - started), 0.001)
+            with tracing.span(f'firestore.{op}', queued_ms=round((time.perf_counter() - timer) * 1000, 3)):
+                # The RPC deadline normally fires first; wait_for also bounds retries and channel setup
+                result = await asyncio.wait_for(call(remaining), remaining + 0.5)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            self._stats['timed_out'] += 1
+            metrics.observe_upstream('firestore', op, timer, error=FirestoreTimeoutError(op))
+            raise FirestoreTimeoutError(op) from None
+        except Exception as e:
+            self._stats['failed'] += 1
+            metrics.observe_upstream('firestore', op, timer, error=e)
+            raise
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+        self._stats['succeeded'] += 1
+        metrics.observe_upstream('firestore', op, timer)
+        return result
+
+
+def init_firestore_executor(config) -> FirestoreExecutor:
+    """
+    Create the shared Firestore executor
+    Should be called once at application startup
+
+    Args:
+        config: Flask config mapping (FIRESTORE_MAX_CONCURRENCY, FIRESTORE_MAX_QUEUE, FIRESTORE_TIMEOUT)
+
+    Returns:
+        The FirestoreExecutor
+    """
+    global _executor
+
+    _executor = FirestoreExecutor(
+        max_concurrency=config['FIRESTORE_MAX_CONCURRENCY'],
+        max_queue=config['FIRESTORE_MAX_QUEUE'],
+        timeout=config['FIRESTORE_TIMEOUT'],
+    )
+    return _executor
+
+
+async def run(op: str, call: Callable[[float], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+    """Run a Firestore operation through the shared executor (see FirestoreExecutor.run)"""
+    return await _executor.run(op, call, timeout)
@@ -0,0 +1,271 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional
+from services import aio
+from . import firestore_exec
+
+
+@dataclass
+class DocumentSnapshot:
+    """A document as read from storage; data is None if it does not exist"""
+    data: Optional[Dict[str, Any]]
+    update_time: Optional[Any] = None
+
+    @property
+    def exists(self) -> bool:
+        return self.data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return self.data
+
+
+class Storage(ABC):
+    """
+    Document storage the models are written against
+
+    Documents are dicts addressed by (collection, doc_id). Every write
+    returns the document's new update_time, an opaque value that can be
+    passed back as a precondition. Failures use the google.api_core
+    exceptions Firestore raises, so callers handle every backend the same way:
+    - AlreadyExists (a Conflict) from create when the document exists
+    - NotFound from update when the document does not exist
+    - FailedPrecondition from update when last_update_time no longer matches
+    """
+
+    @abstractmethod
+    async def get(self, collection: str, doc_id: str, fields: Optional[Iterable[str]] = None) -> DocumentSnapshot:
+        """Read a document, or only the given top-level fields of it"""
+
+    @abstractmethod
+    async def create(self, collection: str, doc_id: str, data: Dict[str, Any]) -> Any:
+        """Create a document, failing if it already exists"""
+
+    @abstractmethod
+    async def update(self, collection: str, doc_id: str, changes: Dict[str, Any],
+                     last_update_time: Optional[Any] = None) -> Any:
+        """
+        Replace the given fields of an existing document
+
+        Keys may be dotted paths ("a.b") into nested maps. With
+        last_update_time, the write only happens if the document is unchanged
+        since it was read at that time.
+        """
+
+    @abstractmethod
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False) -> Any:
+        """Write a whole document, or deep-merge data into it (creating it if needed) with merge=True"""
+
+    @abstractmethod
+    async def delete(self, collection: str, doc_id: str) -> None:
+        """Delete a document; deleting a missing document is not an error"""
+
+
+class FirestoreStorage(Storage):
+    """
+    Storage on Cloud Firestore
+
+    Every call goes through the shared Firestore executor (concurrency limit
+    and deadline, see models.firestore_exec) under the name
+    "<collection>.<operation>".
+    """
+
+    def __init__(self, client_factory: Callable[[], Any]):
+        """
+        Args:
+            client_factory: Returns the async Firestore client (created lazily,
+                since it must be created on the shared I/O loop)
+        """
+        self._client_factory = client_factory
+
+    def _ref(self, collection: str, doc_id: str):
+        return self._client_factory().collection(collection).document(doc_id)
+
+    async def get(self, collection, doc_id, fields=None):
+        ref = self._ref(collection, doc_id)
+        field_paths = list(fields) if fields is not None else None
+        doc = await firestore_exec.run(
+            f'{collection}.get', lambda timeout: ref.get(field_paths=field_paths, timeout=timeout)
+        )
+        if not doc.exists:
+            return DocumentSnapshot(None)
+        return DocumentSnapshot(doc.to_dict() or {}, doc.update_time)
+
+    async def create(self, collection, doc_id, data):
+        ref = self._ref(collection, doc_id)
+        result = await firestore_exec.run(f'{collection}.create', lambda timeout: ref.create(data, timeout=timeout))
+        return result.update_time
+
+    async def update(self, collection, doc_id, changes, last_update_time=None):
+        ref = self._ref(collection, doc_id)
+        option = None
+        if last_update_time is not None:
+            option = self._client_factory().write_option(last_update_time=last_update_time)
+        result = await firestore_exec.run(
+            f'{collection}.update', lambda timeout: ref.update(changes, option=option, timeout=timeout)
+        )
+        return result.update_time
+
+    async def set(self, collection, doc_id, data, merge=False):
+        ref = self._ref(collection, doc_id)
+        result = await firestore_exec.run(
+            f'{collection}.set', lambda timeout: ref.set(data, merge=merge, timeout=timeout)
+        )
+        return result.update_time
+
+    async def delete(self, collection, doc_id):
+        ref = self._ref(collection, doc_id)
+        await firestore_exec.run(f'{collection}.delete', lambda timeout: ref.delete(timeout=timeout))
+
+
+class SQLiteStorage(Storage):
+    """
+    Local stand-in for Firestore on SQLite (in memory by default)
+
+    Needs no credentials or network, so the backend can be run, load-tested
+    and profiled offline. Documents are stored as JSON, so values must be
+    JSON types; Firestore sentinels (SERVER_TIMESTAMP, ArrayUnion, ...) are
+    not supported. update_times are UTC datetimes that increase with every
+    write, and preconditions are checked in the same transaction as the
+    write, so several processes can share one database file.
+
+    Statements run in a worker thread, never on the shared I/O loop: a
+    BEGIN IMMEDIATE on a file shared with other processes can wait for
+    their write lock, which would stall every request on the loop. The
+    connection is opened on first use in each process, since SQLite
+    connections must not be carried across a fork.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        Args:
+            path: SQLite database file, or ':memory:' for a private in-memory database
+        """
+        self.path = path
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self._last_time = datetime.min.replace(tzinfo=timezone.utc)
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Only called with self._lock held
+        if self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn_pid = os.getpid()
+            if self.path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                ' collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, update_time TEXT NOT NULL,'
+                ' PRIMARY KEY (collection, id))'
+            )
+        return self._conn
+
+    def _next_update_time(self, stored: Optional[str] = None) -> datetime:
+        # Strictly increasing, even within one clock tick, so preconditions always see a change
+        now = datetime.now(timezone.utc)
+        floor = max(self._last_time, datetime.fromisoformat(stored)) if stored else self._last_time
+        self._last_time = max(now, floor + timedelta(microseconds=1))
+        return self._last_time
+
+    def _read(self, collection, doc_id):
+        row = self._db.execute(
+            'SELECT data, update_time FROM documents WHERE collection = ? AND id = ?', (collection, doc_id)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    def _write(self, collection, doc_id, data, stored_time=None) -> datetime:
+        update_time = self._next_update_time(stored_time)
+        self._db.execute(
+            'INSERT OR REPLACE INTO documents (collection, id, data, update_time) VALUES (?, ?, ?, ?)',
+            (collection, doc_id, json.dumps(data), update_time.isoformat())
+        )
+        return update_time
+
+    def _transaction(self, work: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                result = work()
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            return result
+
+    async def get(self, collection, doc_id, fields=None):
+        def work():
+            with self._lock:
+                return self._read(collection, doc_id)
+        data, stored_time = await aio.to_thread(work)
+        if data is None:
+            return DocumentSnapshot(None)
+        if fields is not None:
+            data = {key: data[key] for key in fields if key in data}
+        return DocumentSnapshot(data, datetime.fromisoformat(stored_time))
+
+    async def create(self, collection, doc_id, data):
+        from google.api_core.exceptions import AlreadyExists
+
+        def work():
+            existing, _ = self._read(collection, doc_id)
+            if existing is not None:
+                raise AlreadyExists(f'Document already exists: {collection}/{doc_id}')
+            return self._write(collection, doc_id, data)
+        return await aio.to_thread(self._transaction, work)
+
+    async def update(self, collection, doc_id, changes, last_update_time=None):
+        from google.api_core.exceptions import FailedPrecondition, NotFound
+
+        def work():
+            data, stored_time = self._read(collection, doc_id)
+            if data is None:
+                raise NotFound(f'No document to update: {collection}/{doc_id}')
+            if last_update_time is not None and datetime.fromisoformat(stored_time) != last_update_time:
+                raise FailedPrecondition(f'Document changed since {last_update_time}: {collection}/{doc_id}')
+            for path, value in changes.items():
+                _set_path(data, path, copy.deepcopy(value))
+            return self._write(collection, doc_id, data, stored_time)
+        return await aio.to_thread(self._transaction, work)
+
+    async def set(self, collection, doc_id, data, merge=False):
+        def work():
+            existing, stored_time = self._read(collection, doc_id)
+            new_data = copy.deepcopy(data)
+            if merge and existing is not None:
+                new_data = _deep_merge(existing, new_data)
+            return self._write(collection, doc_id, new_data, stored_time)
+        return await aio.to_thread(self._transaction, work)
+
+    async def delete(self, collection, doc_id):
+        def work():
+            with self._lock:
+                self._db.execute('DELETE FROM documents WHERE collection = ? AND id = ?', (collection, doc_id))
+        await aio.to_thread(work)
+
+
+def _set_path(data: Dict[str, Any], path: str, value: Any) -> None:
+    """Set a dotted field path, creating (or replacing non-map) intermediate maps like Firestore"""
+    *parents, leaf = path.split('.')
+    for key in parents:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    data[leaf] = value
+
+
+def _deep_merge(base: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge changes into base like Firestore's set(merge=True): maps merge, everything else is replaced"""
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_merge(base[key], value)
+        else:
+            base[key] = value
+    return base
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any
 from datetime import datetime, timezone
 from dataclasses import dataclass, asdict, field
 
@@ -13,7 +13,8 @@ class Address:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for Firestore"""
-        return {k: v for k, v in asdict(self).items() if v is not None}
+        # Fields are all scalars, so the instance dict can be read directly (asdict deep-copies)
+        return {k: v for k, v in vars(self).items() if v is not None}
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Address':
@@ -21,6 +22,10 @@ class Address:
         return cls(**data)
 
 
+# Top-level fields of a user document (as produced by User.to_dict)
+USER_FIELDS = ('uid', 'email', 'created_at', 'updated_at', 'favorite_addresses', 'recent_addresses')
+
+
 @dataclass
 class User:
     """
@@ -35,6 +40,11 @@ class User:
     favorite_addresses: List[Address] = field(default_factory=list)
     recent_addresses: List[Address] = field(default_factory=list)
     
+    # Stored state, for partial writes: the document as last read/written and its
+    # Firestore update_time (used as a write precondition). Not part of to_dict().
+    update_time: Optional[Any] = field(default=None, repr=False, compare=False)
+    _stored: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    
     # Future fields can be added here:
     # display_name: Optional[str] = None
     # phone_number: Optional[str] = None
@@ -73,6 +83,56 @@ class User:
             recent_addresses=recent_addresses
         )
     
+    def mark_clean(self, update_time: Optional[Any] = None, stored: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record the current state as what is stored in Firestore
+
+        Pass the document dict this User was built from (as read from storage
+        or the cache) as `stored` to avoid serializing the profile again; it is
+        kept as-is, so it must not be mutated afterwards.
+        """
+        self._stored = stored if stored is not None else self.to_dict()
+        self.update_time = update_time
+
+    def mark_written(self, changes: Dict[str, Any], update_time: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Record a partial write of `changes` as the new stored state
+
+        Returns:
+            The stored document dict (the previous one with `changes` applied)
+        """
+        stored = dict(self._stored, **changes) if self._stored is not None else self.to_dict()
+        self.mark_clean(update_time, stored)
+        return stored
+
+    def _field_value(self, name: str) -> Any:
+        """One top-level field in its to_dict() form"""
+        value = getattr(self, name)
+        if name in ('favorite_addresses', 'recent_addresses'):
+            return [addr.to_dict() for addr in (value or [])]
+        return value
+    
+    def changed_fields(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Top-level fields that differ from the stored document
+        updated_at is ignored, so a mutation that changed nothing returns {}
+
+        Args:
+            fields: Only compare these fields (the ones a mutation can have
+                touched), so the rest of the profile is not serialized
+        """
+        if self._stored is None:
+            return self.to_dict()
+        names = fields if fields is not None else USER_FIELDS
+        changes = {}
+        for name in names:
+            if name == 'updated_at':
+                continue
+            value = self._field_value(name)
+            if self._stored.get(name) != value:
+                changes[name] = value
+        return changes
+    
     def update_favorite_by_label(self, label: str, address: Address) -> bool:
         """
         Update a favorite address by its label.
@@ -173,6 +233,21 @@ class User:
         
         self.updated_at = datetime.utcnow().isoformat()
     
+    def remove_recent_address(self, label: str, latitude: Optional[float], longitude: Optional[float]) -> bool:
+        """Remove an address from recents by label and coordinates"""
+        original_length = len(self.recent_addresses)
+        self.recent_addresses = [
+            addr for addr in self.recent_addresses
+            if not (addr.label == label and 
+                   addr.latitude == latitude and 
+                   addr.longitude == longitude)
+        ]
+        
+        if len(self.recent_addresses) < original_length:
+            self.updated_at = datetime.utcnow().isoformat()
+            return True
+        return False
+    
     def clear_recent_addresses(self) -> None:
         """Clear all recent addresses"""
         self.recent_addresses = []
@@ -1,10 +1,16 @@
 # backend/routes/api.py
+import json
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from firebase_admin import firestore
+from models.database import (
+    get_storage, publish_change, apply_cached_write, user_write_lock, conflict_backoff, MAX_WRITE_ATTEMPTS
+)
+from routes.conditional import make_etag, client_has, not_modified, with_etag
 
 api_bp = Blueprint("api", __name__)
 RECENTS_LIMIT = 10
+# Bumped on every recents write so polls can be answered from this field alone
+RECENTS_VERSION_FIELD = "recent_destinations_version"
 
 
 def _require_uid():
@@ -21,24 +27,40 @@ def health():
 
 
 @api_bp.route("/recents", methods=["GET"])
-def get_recents():
+async def get_recents():
     uid, err = _require_uid()
     if err:
         return err
-    db = firestore.client()
-    doc = db.collection("users").document(uid).get()
-    data = doc.to_dict() or {}
-    recents = data.get("recent_destinations", [])
     limit = request.args.get("limit", RECENTS_LIMIT, type=int)
-    return jsonify(recents[:limit])
+    storage = get_storage()
+
+    if request.if_none_match:
+        doc = await storage.get("users", uid, fields=[RECENTS_VERSION_FIELD])
+        version = (doc.to_dict() or {}).get(RECENTS_VERSION_FIELD)
+        etag = make_etag("recents", version, limit) if version is not None else None
+        if etag is not None and client_has(etag):
+            return not_modified(etag)
+
+    doc = await storage.get("users", uid, fields=["recent_destinations", RECENTS_VERSION_FIELD])
+    data = doc.to_dict() or {}
+    recents = data.get("recent_destinations", [])[:limit]
+    # Documents written before versioning fall back to a hash of the content
+    version = data.get(RECENTS_VERSION_FIELD) or make_etag(json.dumps(recents, sort_keys=True, default=str))
+    etag = make_etag("recents", version, limit)
+    if client_has(etag):
+        return not_modified(etag)
+    return with_etag(jsonify(recents), etag)
 
 
 @api_bp.route("/recents", methods=["POST"])
-def add_recent():
+async def add_recent():
     uid, err = _require_uid()
     if err:
         return err
 
+    # Not at module level: google.api_core pulls in gRPC, which /api/health and / never need
+    from google.api_core.exceptions import Conflict, FailedPrecondition
+
     body = request.get_json(silent=True) or {}
     required = ("label", "address", "lat", "lng")
     if any(k not in body for k in required):
@@ -59,25 +81,52 @@ def add_recent():
         "ts": datetime.utcnow().isoformat() + "Z",
     }
 
-    db = firestore.client()
-    user_ref = db.collection("users").document(uid)
-    doc = user_ref.get()
-    current = (doc.to_dict() or {}).get("recent_destinations", [])
-
     # de-dupe by place_id if present, otherwise by (label, lat, lng)
     def _key(x):
         return x.get("place_id") or (x.get("label"), x.get("lat"), x.get("lng"))
 
-    merged = [entry] + [r for r in current if _key(r) != _key(entry)]
-    user_ref.set({"recent_destinations": merged[:RECENTS_LIMIT]}, merge=True)
+    storage = get_storage()
+    # Read-modify-write conditional on the document not changing in between,
+    # so concurrent adds from two devices are retried instead of lost
+    async with user_write_lock(uid):
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            doc = await storage.get("users", uid, fields=["recent_destinations"])
+            current = (doc.to_dict() or {}).get("recent_destinations", [])
+            merged = [entry] + [r for r in current if _key(r) != _key(entry)]
+            update = {
+                "recent_destinations": merged[:RECENTS_LIMIT],
+                RECENTS_VERSION_FIELD: entry["ts"],
+            }
+            try:
+                if doc.exists:
+                    update_time = await storage.update("users", uid, update, last_update_time=doc.update_time)
+                    # The profile cache would otherwise keep the old update_time and fail the next profile write
+                    apply_cached_write(uid, update, doc.update_time, update_time)
+                else:
+                    await storage.create("users", uid, update)
+                    apply_cached_write(uid, update)
+                break
+            except (FailedPrecondition, Conflict):
+                await conflict_backoff(attempt)
+        else:
+            return jsonify({"error": "Recents changed concurrently, try again"}), 409
+
+    publish_change(uid, {"recents": merged[:RECENTS_LIMIT]})
     return jsonify({"ok": True, "count": len(merged[:RECENTS_LIMIT])})
 
 
 @api_bp.route("/recents", methods=["DELETE"])
-def clear_recents():
+async def clear_recents():
     uid, err = _require_uid()
     if err:
         return err
-    db = firestore.client()
-    db.collection("users").document(uid).set({"recent_destinations": []}, merge=True)
+    update = {
+        "recent_destinations": [],
+        RECENTS_VERSION_FIELD: datetime.utcnow().isoformat() + "Z",
+    }
+    try:
+        await get_storage().set("users", uid, update, merge=True)
+    finally:
+        apply_cached_write(uid, update)
+    publish_change(uid, {"recents": []})
     return jsonify({"ok": True})
@@ -0,0 +1,35 @@
+# backend/routes/conditional.py
+# ETag helpers for conditional GETs on endpoints the app polls (favorites, recents).
+import hashlib
+from flask import Response, request
+from werkzeug.http import quote_etag
+
+# Clients may keep the body but must revalidate it with If-None-Match on every poll
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Opaque ETag value derived from a resource name and its version (or content)"""
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+
+
+def etag_header(etag: str) -> str:
+    """The ETag as sent in the ETag header (quoted), for clients to echo in If-None-Match"""
+    return quote_etag(etag)
+
+
+def client_has(etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response for a representation the client already has"""
+    return with_etag(Response(status=304), etag)
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    """Attach the ETag and revalidation headers to a response"""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
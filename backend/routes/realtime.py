@@ -0,0 +1,81 @@
+# backend/routes/realtime.py
+# Socket.IO push channel: each signed-in client joins a room for its uid and is sent
+# its favorites / recents as soon as they change, instead of polling for them.
+from flask import request
+from flask_socketio import SocketIO, ConnectionRefusedError, join_room
+from models.database import add_change_listener
+from routes.conditional import make_etag, etag_header
+from services.auth_tokens import verify_token_sync
+
+socketio = SocketIO()
+
+
+def init_realtime(app) -> SocketIO:
+    """
+    Attach Socket.IO to the app and start pushing address changes
+    Should be called once at application startup, after the blueprints are registered
+
+    Args:
+        app: Flask app (SOCKETIO_* config)
+
+    Returns:
+        The SocketIO instance (use socketio.run(app) to serve it)
+    """
+    socketio.init_app(
+        app,
+        async_mode=app.config['SOCKETIO_ASYNC_MODE'],
+        message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'],
+        cors_allowed_origins=app.config['SOCKETIO_CORS_ALLOWED_ORIGINS']
+    )
+    add_change_listener(push_address_changes)
+    return socketio
+
+
+def user_room(uid: str) -> str:
+    return f"user:{uid}"
+
+
+@socketio.on('connect')
+def on_connect(auth_data=None):
+    """
+    Authenticate the socket with a Firebase ID token and join the user's room
+
+    The token is read from the Socket.IO auth payload ({ token }) or,
+    failing that, from an "Authorization: Bearer" header.
+    """
+    token = (auth_data or {}).get('token')
+    if not token:
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split('Bearer ')[1]
+    if not token:
+        raise ConnectionRefusedError('No token provided')
+
+    try:
+        decoded_token = verify_token_sync(token)
+    except Exception:
+        raise ConnectionRefusedError('Invalid token')
+
+    join_room(user_room(decoded_token['uid']))
+
+
+def push_address_changes(uid: str, changes: dict):
+    """
+    Emit changed address lists to every socket of a user
+
+    Events mirror the polling endpoints' bodies, so clients can handle both
+    the same way:
+    - favorites: { favorites: [...], etag } (GET /api/users/favorites)
+    - recent: { recent: [...], etag } (GET /api/users/recent)
+    - recents: { recents: [...] } (GET /api/recents)
+    The etag is the one the matching GET would return now.
+    """
+    room = user_room(uid)
+    for key in ('favorites', 'recent'):
+        if key in changes:
+            socketio.emit(key, {
+                key: changes[key],
+                'etag': etag_header(make_etag(key, changes['updated_at']))
+            }, to=room)
+    if 'recents' in changes:
+        socketio.emit('recents', {'recents': changes['recents']}, to=room)
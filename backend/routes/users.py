@@ -1,24 +1,30 @@
 from flask import Blueprint, request, jsonify
-from firebase_admin import auth
 from functools import wraps
-from datetime import datetime
 from models.database import (
-    create_user, get_user, update_user, delete_user, user_exists,
+    create_user, get_user, delete_user,
     add_favorite_address, remove_favorite_address, clear_all_favorites, add_recent_address,
-    get_user_favorites, get_user_recent, update_favorite_address_by_label
+    remove_recent_address, clear_recent_addresses, update_favorite_address_by_label, get_user_version,
+    apply_user_operations, UserWriteConflictError
 )
+# Not caught by the routes below: the app's error handlers answer them with 503 / 504 and Retry-After
+from models.firestore_exec import FirestoreUnavailableError
 from models.user import Address
+from routes.conditional import make_etag, etag_header, client_has, not_modified, with_etag
+from services.auth_tokens import verify_token
+from services.log import get_logger
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
+MAX_BATCH_OPERATIONS = 20
+log = get_logger(__name__)
 
 
 def verify_firebase_token(f):
     """
     Decorator to verify Firebase ID token from request headers
-    Adds 'uid' to kwargs if token is valid
+    Adds 'uid' to kwargs if token is valid. The decorated view must be async.
     """
     @wraps(f)
-    def decorated_function(*args, **kwargs):
+    async def decorated_function(*args, **kwargs):
         # Get token from Authorization header
         auth_header = request.headers.get('Authorization')
         
@@ -28,23 +34,45 @@ def verify_firebase_token(f):
         token = auth_header.split('Bearer ')[1]
         
         try:
-            # Verify the token
-            decoded_token = auth.verify_id_token(token)
+            # Verify the token (cached until it expires, see services.auth_tokens)
+            decoded_token = await verify_token(token)
             uid = decoded_token['uid']
             
             # Add uid to kwargs
             kwargs['uid'] = uid
-            return f(*args, **kwargs)
-            
         except Exception as e:
             return jsonify({'error': 'Invalid token', 'details': str(e)}), 401
+
+        return await f(*args, **kwargs)
     
     return decorated_function
 
 
+async def _conditional_addresses(uid, key, select):
+    """
+    Serve one of the user's address lists with an ETag
+
+    The ETag is derived from the user's updated_at, which every profile write
+    bumps. When the client sends If-None-Match, only updated_at is read first,
+    so an unchanged poll costs a projected read and an empty 304.
+    """
+    if request.if_none_match:
+        version = await get_user_version(uid)
+        etag = make_etag(key, version) if version is not None else None
+        if etag is not None and client_has(etag):
+            return not_modified(etag)
+
+    user = await get_user(uid)
+    if user is None:
+        return jsonify({'error': 'User not found'}), 404
+
+    response = jsonify({key: [addr.to_dict() for addr in select(user)]})
+    return with_etag(response, make_etag(key, user.updated_at)), 200
+
+
 @users_bp.route('/create', methods=['POST'])
 @verify_firebase_token
-def create_user_profile(uid):
+async def create_user_profile(uid):
     """
     Create a new user profile
     Expected to be called after Firebase Auth signup
@@ -52,107 +80,92 @@ def create_user_profile(uid):
     Request body: { "email": "user@example.com" }
     """
     data = request.get_json()
-    
-    # DEBUG: Print what we received
-    print("=" * 50)
-    print("CREATE USER PROFILE REQUEST")
-    print(f"UID: {uid}")
-    print(f"Request Body: {data}")
-    print(f"Request Headers: {dict(request.headers)}")
-    print("=" * 50)
+    log.debug('users.create_request', uid=uid, body=data)
     
     if not data or 'email' not in data:
-        print(f"ERROR: Email is missing. Data: {data}")
         return jsonify({'error': 'Email is required'}), 400
     
     try:
-        # Check if user already exists
-        print(f"Checking if user {uid} already exists...")
-        exists = user_exists(uid)
-        print(f"User exists: {exists}")
+        # Create user (fails atomically if the profile already exists)
+        user = await create_user(uid, data['email'])
         
-        if exists:
-            print(f"ERROR: User profile already exists for uid: {uid}")
+        if user is None:
             return jsonify({'error': 'User profile already exists'}), 409
         
-        # Create user
-        print(f"Creating user profile for {uid} with email {data['email']}")
-        user = create_user(uid, data['email'])
-        print(f"SUCCESS: User profile created for {uid}")
-        print(f"User data: {user.to_dict()}")
+        log.info('users.created', uid=uid)
         
         return jsonify({
             'message': 'User created successfully',
             'user': user.to_dict()
         }), 201
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
-        print(f"EXCEPTION in create_user_profile: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('users.create_failed', uid=uid)
         return jsonify({'error': 'Failed to create user', 'details': str(e)}), 500
 
 
 @users_bp.route('/profile', methods=['GET'])
 @verify_firebase_token
-def get_user_profile(uid):
+async def get_user_profile(uid):
     """
     Get user profile
     """
     try:
-        user = get_user(uid)
+        user = await get_user(uid)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({'user': user.to_dict()}), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to get user', 'details': str(e)}), 500
 
 
 @users_bp.route('/profile', methods=['DELETE'])
 @verify_firebase_token
-def delete_user_profile(uid):
+async def delete_user_profile(uid):
     """
     Delete user profile
     Note: This only deletes the Firestore profile, not the Firebase Auth account
     """
     try:
-        deleted = delete_user(uid)
+        deleted = await delete_user(uid)
         
         if not deleted:
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({'message': 'User deleted successfully'}), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to delete user', 'details': str(e)}), 500
 
 
 @users_bp.route('/favorites', methods=['GET'])
 @verify_firebase_token
-def get_favorites(uid): 
+async def get_favorites(uid): 
     """
     Get user's favorite addresses
+    Supports If-None-Match: returns 304 if favorites are unchanged since the client's ETag
     """
     try:
-        favorites = get_user_favorites(uid)
-        
-        if favorites is None:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify({
-            'favorites': [addr.to_dict() for addr in favorites]
-        }), 200
+        return await _conditional_addresses(uid, 'favorites', lambda user: user.favorite_addresses)
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to get favorites', 'details': str(e)}), 500
 
 
 @users_bp.route('/favorites', methods=['POST'])
 @verify_firebase_token
-def add_favorite(uid):
+async def add_favorite(uid):
     """
     Add a favorite address
     
@@ -165,17 +178,9 @@ def add_favorite(uid):
     }
     """
     data = request.get_json()
-    
-    # DEBUG: Print what we received
-    print("=" * 50)
-    print("ADD FAVORITE REQUEST")
-    print(f"UID: {uid}")
-    print(f"Request Body: {data}")
-    print(f"Request Headers: {dict(request.headers)}")
-    print("=" * 50)
+    log.debug('users.add_favorite_request', uid=uid, body=data)
     
     if not data or 'address' not in data or 'latitude' not in data or 'longitude' not in data:
-        print(f"ERROR: Missing required fields. Data: {data}")
         return jsonify({'error': 'Address, latitude, and longitude are required'}), 400
     
     try:
@@ -186,35 +191,26 @@ def add_favorite(uid):
             label=data.get('label')
         )
         
-        print(f"Address object created: {address}")
-        print(f"About to call add_favorite_address for uid: {uid}")
-        
-        user = add_favorite_address(uid, address)
-        
-        print(f"Returned from add_favorite_address. User: {user}")
+        user = await add_favorite_address(uid, address)
         
         if user is None:
-            print(f"ERROR: User not found for uid: {uid}")
             return jsonify({'error': 'User not found'}), 404
         
-        print(f"SUCCESS: Favorite added for user {uid}")
-        print(f"User favorites: {user.favorite_addresses}")
-        
         return jsonify({
             'message': 'Favorite added successfully',
             'favorites': [addr.to_dict() for addr in user.favorite_addresses]
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
-        print(f"EXCEPTION in add_favorite: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('users.add_favorite_failed', uid=uid)
         return jsonify({'error': 'Failed to add favorite', 'details': str(e)}), 500
 
 
 @users_bp.route('/favorites/home', methods=['POST'])
 @verify_firebase_token
-def update_home_favorite(uid):
+async def update_home_favorite(uid):
     """
     Update Home favorite address
     
@@ -238,7 +234,7 @@ def update_home_favorite(uid):
             label="Home"
         )
         
-        user = update_favorite_address_by_label(uid, "Home", address)
+        user = await update_favorite_address_by_label(uid, "Home", address)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
@@ -248,13 +244,15 @@ def update_home_favorite(uid):
             'favorites': [addr.to_dict() for addr in user.favorite_addresses]
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to update Home address', 'details': str(e)}), 500
 
 
 @users_bp.route('/favorites/work', methods=['POST'])
 @verify_firebase_token
-def update_work_favorite(uid):
+async def update_work_favorite(uid):
     """
     Update Work favorite address
     
@@ -278,7 +276,7 @@ def update_work_favorite(uid):
             label="Work"
         )
         
-        user = update_favorite_address_by_label(uid, "Work", address)
+        user = await update_favorite_address_by_label(uid, "Work", address)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
@@ -288,13 +286,15 @@ def update_work_favorite(uid):
             'favorites': [addr.to_dict() for addr in user.favorite_addresses]
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to update Work address', 'details': str(e)}), 500
 
 
 @users_bp.route('/favorites', methods=['DELETE'])
 @verify_firebase_token
-def remove_favorite(uid):
+async def remove_favorite(uid):
     """
     Remove a favorite address by name and coordinates
     
@@ -314,7 +314,7 @@ def remove_favorite(uid):
         latitude = data.get('latitude')
         longitude = data.get('longitude')
         
-        user = remove_favorite_address(uid, data['label'], latitude, longitude)
+        user = await remove_favorite_address(uid, data['label'], latitude, longitude)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
@@ -324,20 +324,22 @@ def remove_favorite(uid):
             'favorites': [addr.to_dict() for addr in user.favorite_addresses]
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to remove favorite', 'details': str(e)}), 500
 
 
 @users_bp.route('/favorites/all', methods=['DELETE'])
 @verify_firebase_token
-def clear_favorites(uid):
+async def clear_favorites(uid):
     """
     Delete all favorite addresses for the user
     
     No request body required
     """
     try:
-        user = clear_all_favorites(uid)
+        user = await clear_all_favorites(uid)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
@@ -347,33 +349,31 @@ def clear_favorites(uid):
             'favorites': [addr.to_dict() for addr in user.favorite_addresses]
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to clear favorites', 'details': str(e)}), 500
 
 
 @users_bp.route('/recent', methods=['GET'])
 @verify_firebase_token
-def get_recent(uid):
+async def get_recent(uid):
     """
     Get user's recent addresses
+    Supports If-None-Match: returns 304 if recent addresses are unchanged since the client's ETag
     """
     try:
-        recent = get_user_recent(uid)
-        
-        if recent is None:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify({
-            'recent': [addr.to_dict() for addr in recent]
-        }), 200
+        return await _conditional_addresses(uid, 'recent', lambda user: user.recent_addresses)
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to get recent addresses', 'details': str(e)}), 500
 
 
 @users_bp.route('/recent', methods=['DELETE'])
 @verify_firebase_token
-def remove_recent(uid):
+async def remove_recent(uid):
     """
     Remove a specific recent address by label and coordinates
     
@@ -390,29 +390,12 @@ def remove_recent(uid):
         return jsonify({'error': 'Label is required'}), 400
     
     try:
-        from models.database import get_user, update_user
-        
-        user = get_user(uid)
+        user, removed = await remove_recent_address(uid, data['label'], data.get('latitude'), data.get('longitude'))
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
         
-        latitude = data.get('latitude')
-        longitude = data.get('longitude')
-        
-        # Remove the specific recent address
-        original_length = len(user.recent_addresses)
-        user.recent_addresses = [
-            addr for addr in user.recent_addresses
-            if not (addr.label == data['label'] and 
-                   addr.latitude == latitude and 
-                   addr.longitude == longitude)
-        ]
-        
-        if len(user.recent_addresses) < original_length:
-            user.updated_at = datetime.utcnow().isoformat()
-            update_user(user)
-            
+        if removed:
             return jsonify({
                 'message': 'Recent address removed successfully',
                 'recent': [addr.to_dict() for addr in user.recent_addresses]
@@ -420,41 +403,40 @@ def remove_recent(uid):
         else:
             return jsonify({'error': 'Recent address not found'}), 404
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to remove recent address', 'details': str(e)}), 500
 
 
 @users_bp.route('/recent/all', methods=['DELETE'])
 @verify_firebase_token
-def clear_all_recents(uid):
+async def clear_all_recents(uid):
     """
     Delete all recent addresses for the user
     
     No request body required
     """
     try:
-        from models.database import get_user, update_user
-        
-        user = get_user(uid)
+        user = await clear_recent_addresses(uid)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
         
-        user.clear_recent_addresses()
-        update_user(user)
-        
         return jsonify({
             'message': 'All recent addresses cleared successfully',
             'recent': []
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to clear recent addresses', 'details': str(e)}), 500
 
 
 @users_bp.route('/recent', methods=['POST'])
 @verify_firebase_token
-def add_recent(uid):
+async def add_recent(uid):
     """
     Add a recent address
     
@@ -479,7 +461,7 @@ def add_recent(uid):
             label=data.get('label')
         )
         
-        user = add_recent_address(uid, address)
+        user = await add_recent_address(uid, address)
         
         if user is None:
             return jsonify({'error': 'User not found'}), 404
@@ -489,6 +471,144 @@ def add_recent(uid):
             'recent': [addr.to_dict() for addr in user.recent_addresses]
         }), 200
         
+    except FirestoreUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': 'Failed to add recent address', 'details': str(e)}), 500
 
+
+
+def _batch_address(data, label=None):
+    """Build an Address from a batch operation, checking the required fields"""
+    if 'address' not in data or 'latitude' not in data or 'longitude' not in data:
+        raise ValueError('address, latitude, and longitude are required')
+    return Address(
+        address=data['address'],
+        latitude=data['latitude'],
+        longitude=data['longitude'],
+        label=label or data.get('label')
+    )
+
+
+def _batch_label(data):
+    if 'label' not in data:
+        raise ValueError('label is required')
+    return data['label'], data.get('latitude'), data.get('longitude')
+
+
+def _batch_get(data):
+    what = data.get('what', 'all')
+    if what not in ('favorites', 'recent', 'all'):
+        raise ValueError("what must be 'favorites', 'recent' or 'all'")
+
+    def get(user):
+        result = {}
+        if what in ('favorites', 'all'):
+            result['favorites'] = [addr.to_dict() for addr in user.favorite_addresses]
+        if what in ('recent', 'all'):
+            result['recent'] = [addr.to_dict() for addr in user.recent_addresses]
+        return result
+    return get
+
+
+def _parse_batch_operation(data):
+    """
+    Turn one batch operation into a function applying it to a User
+
+    Addresses are rebuilt on every call, since a batch is re-applied when
+    its write loses a race with another writer.
+
+    Raises:
+        ValueError: If the operation is unknown or missing fields
+    """
+    if not isinstance(data, dict):
+        raise ValueError('operation must be an object')
+    op = data.get('op')
+
+    if op == 'add_favorite':
+        _batch_address(data)
+        return lambda user: user.add_favorite_address(_batch_address(data))
+    if op in ('set_home', 'set_work'):
+        label = 'Home' if op == 'set_home' else 'Work'
+        _batch_address(data, label)
+        return lambda user: user.update_favorite_by_label(label, _batch_address(data, label))
+    if op == 'remove_favorite':
+        args = _batch_label(data)
+        return lambda user: {'removed': user.remove_favorite_address(*args)}
+    if op == 'clear_favorites':
+        return lambda user: user.clear_favorite_addresses()
+    if op == 'add_recent':
+        _batch_address(data)
+        return lambda user: user.add_recent_address(_batch_address(data))
+    if op == 'remove_recent':
+        args = _batch_label(data)
+        return lambda user: {'removed': user.remove_recent_address(*args)}
+    if op == 'clear_recent':
+        return lambda user: user.clear_recent_addresses()
+    if op == 'get':
+        return _batch_get(data)
+    raise ValueError(f"unknown op {op!r}")
+
+
+@users_bp.route('/batch', methods=['POST'])
+@verify_firebase_token
+async def batch(uid):
+    """
+    Apply several favorite / recent operations in one request
+    
+    The profile is read once, the operations are applied in order and the
+    result is written once. Either all operations are saved or none are.
+    
+    Request body:
+    {
+        "operations": [
+            { "op": "add_favorite", "address": "...", "latitude": 30.4, "longitude": -84.2, "label": "Gym" },
+            { "op": "set_home" | "set_work", "address": "...", "latitude": 30.4, "longitude": -84.2 },
+            { "op": "remove_favorite" | "remove_recent", "label": "Gym", "latitude": 30.4, "longitude": -84.2 },
+            { "op": "clear_favorites" | "clear_recent" },
+            { "op": "add_recent", "address": "...", "latitude": 30.4, "longitude": -84.2, "label": "Work" },
+            { "op": "get", "what": "favorites" | "recent" | "all" }
+        ]
+    }
+    
+    Response: one result per operation ({} for writes, { removed } for
+    removals, the requested lists for get), plus the final favorites and
+    recent lists and the ETags a GET of each would now return.
+    """
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'A non-empty operations list is required'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+    
+    try:
+        parsed = []
+        for index, operation in enumerate(operations):
+            parsed.append(_parse_batch_operation(operation))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid operation {index}: {e}'}), 400
+    
+    try:
+        user, results = await apply_user_operations(uid, parsed)
+        
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({
+            'results': [result if isinstance(result, dict) else {} for result in results],
+            'favorites': [addr.to_dict() for addr in user.favorite_addresses],
+            'recent': [addr.to_dict() for addr in user.recent_addresses],
+            'etags': {
+                'favorites': etag_header(make_etag('favorites', user.updated_at)),
+                'recent': etag_header(make_etag('recent', user.updated_at))
+            }
+        }), 200
+        
+    except UserWriteConflictError as e:
+        return jsonify({'error': 'Profile changed concurrently, try again', 'details': str(e)}), 409
+    except FirestoreUnavailableError:
+        raise
+    except Exception as e:
+        return jsonify({'error': 'Failed to apply batch', 'details': str(e)}), 500
@@ -0,0 +1,2 @@
+# backend/services/__init__.py
+# Makes "services" a package for shared helpers used by the routes (caching, upstream APIs).
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Awaitable, Callable, Coroutine, Optional, TypeVar
+
+T = TypeVar('T')
+
+# One event loop per process, running on a daemon thread; created on first use
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide I/O event loop, starting it if necessary
+
+    All async upstream and Firestore clients live on this loop, so their
+    connection pools are shared by every request in the process. The loop is
+    (re)created lazily in each process, so it is safe to import before a
+    pre-fork server forks its workers.
+    """
+    global _loop, _loop_pid
+
+    if _loop is not None and _loop_pid == os.getpid():
+        return _loop
+
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='aio-loop', daemon=True)
+            thread.start()
+            _loop, _loop_pid = loop, os.getpid()
+    return _loop
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> 'Future[T]':
+    """Schedule a coroutine on the I/O loop from any thread"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """Run a coroutine on the I/O loop and block the calling thread for its result"""
+    return submit(coro).result(timeout)
+
+
+async def to_thread(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking code (e.g. a sync SDK call) in a worker thread without blocking the loop"""
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def async_to_sync(func: Callable[..., Awaitable[T]]) -> Callable[..., T]:
+    """
+    Flask hook that runs async views on the shared I/O loop
+
+    Flask's default runs each async view on a fresh event loop, which would
+    make per-loop clients (httpx.AsyncClient, Firestore AsyncClient) unusable
+    across requests. The calling thread's context (including Flask's request
+    and app context) is carried over to the task.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run(func(*args, **kwargs))
+
+    return wrapper
+
+
+def install(app) -> None:
+    """Make a Flask app run its async views and handlers on the shared I/O loop"""
+    app.async_to_sync = async_to_sync
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from . import aio, metrics, tracing
+from .cache import TTLCache
+from .firebase_app import initialize_firebase
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# Module-level state, set up once by init_token_cache()
+_config = {}
+_cache: Optional[TTLCache] = None
+_refresher_pid: Optional[int] = None
+_refresher_lock = threading.Lock()
+
+
+def init_token_cache(config) -> TTLCache:
+    """
+    Configure Firebase ID token verification and create its cache
+    Should be called once at application startup
+
+    Args:
+        config: Flask config mapping (AUTH_*)
+
+    Returns:
+        The token TTLCache
+    """
+    global _cache
+
+    _config.update(
+        check_revoked=config['AUTH_CHECK_REVOKED'],
+        cert_refresh_interval=config['AUTH_CERT_REFRESH_INTERVAL'],
+    )
+    # With revocation checks on, cached tokens are re-checked against Firebase this often
+    ttl = config['AUTH_REVOCATION_RECHECK'] if config['AUTH_CHECK_REVOKED'] else config['AUTH_TOKEN_CACHE_TTL']
+    _cache = TTLCache(ttl=ttl, max_entries=config['AUTH_TOKEN_CACHE_MAX_ENTRIES'])
+    return _cache
+
+
+async def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a Firebase ID token, reusing earlier verifications of the same token
+
+    Decoded claims are cached under a SHA-256 of the token (the token itself
+    is never stored) until the token's exp, or for at most the cache TTL.
+    Concurrent requests with the same uncached token share one verification.
+    Failed verifications are not cached.
+
+    Args:
+        token: Encoded Firebase ID token
+
+    Returns:
+        Decoded token claims (including 'uid')
+
+    Raises:
+        firebase_admin.auth errors (InvalidIdTokenError, ExpiredIdTokenError,
+        RevokedIdTokenError, CertificateFetchError) as auth.verify_id_token
+    """
+    _ensure_cert_refresher()
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    with tracing.span('auth.verify_token'):
+        claims = await _cache.get_or_load(key, lambda: aio.to_thread(_verify, token))
+        if claims['exp'] <= time.time():
+            # Expired since it was cached: verify again for the proper error
+            _cache.invalidate(key)
+            claims = await _cache.get_or_load(key, lambda: aio.to_thread(_verify, token))
+    return claims
+
+
+def verify_token_sync(token: str) -> Dict[str, Any]:
+    """verify_token for synchronous callers (e.g. Socket.IO handlers)"""
+    return aio.run(verify_token(token))
+
+
+def _verify(token: str) -> Dict[str, Any]:
+    # Blocking: RSA signature check, plus a certificate fetch when the cached certs expired
+    from firebase_admin import auth
+    started = time.perf_counter()
+    try:
+        with tracing.span('firebase-auth.verify_id_token'):
+            claims = auth.verify_id_token(token, app=initialize_firebase(), check_revoked=_config['check_revoked'])
+    except Exception as e:
+        metrics.observe_upstream('firebase-auth', 'verify_id_token', started, error=e)
+        raise
+    metrics.observe_upstream('firebase-auth', 'verify_id_token', started)
+    return claims
+
+
+def _ensure_cert_refresher():
+    """Start the background certificate refresher once per process"""
+    global _refresher_pid
+
+    if _refresher_pid == os.getpid() or not _config.get('cert_refresh_interval'):
+        return
+    with _refresher_lock:
+        if _refresher_pid != os.getpid():
+            _refresher_pid = os.getpid()
+            threading.Thread(target=_refresh_certs_forever, name='auth-cert-refresh', daemon=True).start()
+
+
+def _refresh_certs_forever():
+    while True:
+        time.sleep(_config['cert_refresh_interval'])
+        if refresh_certs() is None:
+            return  # Not possible with this firebase_admin; already logged
+
+
+def refresh_certs() -> Optional[bool]:
+    """
+    Re-download Google's token signing certificates ahead of their expiry
+
+    firebase_admin caches the certificates per their Cache-Control headers
+    and re-downloads them on the request path once they expire. Sending a
+    no-cache request through the SDK's own certificate session replaces the
+    cached copy early, so verification never waits on the download.
+
+    The SDK has no public API for this, so it relies on firebase_admin
+    internals (as of the version pinned in requirements.txt). If they are
+    missing after an upgrade, an error is logged and verification falls back
+    to the SDK's own caching.
+
+    Returns:
+        True if the certificates were refreshed, False if the request failed,
+        or None if this firebase_admin version does not expose the internals
+    """
+    import firebase_admin
+    try:
+        from firebase_admin import auth
+        from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+        app = initialize_firebase()
+        request = auth._get_client(app)._token_verifier.request
+    except (ImportError, AttributeError) as e:
+        log.error('auth.cert_refresh_unsupported', firebase_admin=firebase_admin.__version__,
+                  error=repr(e))
+        return None
+    except Exception as e:
+        log.warning('auth.cert_refresh_failed', error=repr(e))
+        return False
+
+    try:
+        response = request(ID_TOKEN_CERT_URI, headers={'Cache-Control': 'no-cache'})
+    except Exception as e:
+        log.warning('auth.cert_refresh_failed', error=repr(e))
+        return False
+    if response.status != 200:
+        log.warning('auth.cert_refresh_failed', status=response.status)
+        return False
+    return True
@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    LRU cache with per-entry expiry and single-flight async loading
+
+    Plain get/set are thread-safe. The loading methods are coroutines and must
+    all run on the same event loop (the shared I/O loop, see services.aio).
+
+    Entries are fresh for `ttl` seconds after they are stored. The cache is
+    bounded by entry count and, optionally, by the approximate size of the
+    stored values; whichever limit is reached first evicts the least recently
+    used entries.
+
+    For stale-while-revalidate use (see get_or_refresh), entries are also
+    given a hard TTL and a maximum stale age:
+    - age < ttl: fresh, served as-is
+    - ttl <= age < hard_ttl: served immediately, refreshed in the background
+    - age >= hard_ttl: reloaded before returning; served marked stale only if
+      the reload fails and age < max_stale
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 hard_ttl: Optional[float] = None, max_stale: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.hard_ttl = max(ttl, hard_ttl if hard_ttl is not None else ttl)
+        self.max_stale = max(self.hard_ttl, max_stale if max_stale is not None else self.hard_ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (stored_at, size, value)
+        self._inflight = {}  # key -> asyncio.Future of the load in progress
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ('hits', 'misses', 'coalesced', 'stale_served', 'refreshes', 'loads', 'load_errors', 'evictions'), 0
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Snapshot of the cache counters
+
+        hits: served from the cache (including soft-expired entries being refreshed)
+        misses: had to wait for a load
+        coalesced: misses that joined another caller's in-flight load
+        stale_served: hard-expired entries served because the reload failed
+        refreshes: background refreshes started
+        loads / load_errors: loader calls and how many raised
+        evictions: entries dropped to stay within max_entries / max_bytes
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or no longer fresh"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or self._clock() - entry[0] >= self.ttl:
+                self._stats['misses'] += 1
+                return default
+            self._stats['hits'] += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any, size: int = 0) -> None:
+        """Store value under key, evicting least recently used entries if over budget"""
+        with self._lock:
+            self._store(key, value, size)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove key from the cache if present"""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          size_of: Optional[Callable[[Any], int]] = None) -> Any:
+        """
+        Return the cached value for key, awaiting loader() on a miss
+
+        Concurrent misses for the same key share a single loader call: the
+        first caller runs it and the others await it, then receive the same
+        value (or the same exception). Exceptions are not cached.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument coroutine function producing the value
+            size_of: Optional callable returning the approximate size of a value in bytes
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None and self._clock() - entry[0] < self.ttl:
+                self._stats['hits'] += 1
+                return entry[2]
+            self._stats['misses'] += 1
+
+        return await self._join_flight(key, loader, size_of)
+
+    async def get_or_refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                             size_of: Optional[Callable[[Any], int]] = None) -> Tuple[Any, bool]:
+        """
+        Stale-while-revalidate lookup
+
+        Soft-expired entries (older than ttl, younger than hard_ttl) are
+        returned immediately while a background task reloads them. Missing or
+        hard-expired entries are loaded before returning; if that load fails and
+        an entry younger than max_stale exists, it is returned instead of raising.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument coroutine function producing the value
+            size_of: Optional callable returning the approximate size of a value in bytes
+
+        Returns:
+            (value, stale) where stale is True if the value is past its hard TTL
+            and was served because the reload failed
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            age = self._clock() - entry[0] if entry is not None else None
+            if age is not None and age < self.ttl:
+                self._stats['hits'] += 1
+                return entry[2], False
+            if age is not None and age < self.hard_ttl:
+                self._stats['hits'] += 1
+                if key not in self._inflight:
+                    self._stats['refreshes'] += 1
+                    self._refresh_in_background(key, loader, size_of)
+                return entry[2], False
+            self._stats['misses'] += 1
+
+        try:
+            return await self._join_flight(key, loader, size_of), False
+        except Exception:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self._stats['stale_served'] += 1
+            if entry is None:
+                raise
+            return entry[2], True
+
+    # Internal helpers
+    # The in-flight map is only touched from the event loop running the loads
+
+    def _join_flight(self, key, loader, size_of) -> asyncio.Future:
+        flight = self._inflight.get(key)
+        if flight is not None:
+            with self._lock:
+                self._stats['coalesced'] += 1
+            # Shield so a cancelled waiter does not cancel the shared load
+            return asyncio.shield(flight)
+        flight = asyncio.ensure_future(self._run_load(key, loader, size_of))
+        self._inflight[key] = flight
+        return asyncio.shield(flight)
+
+    async def _run_load(self, key, loader, size_of):
+        try:
+            value = await loader()
+            size = size_of(value) if size_of else 0
+            with self._lock:
+                self._stats['loads'] += 1
+                self._store(key, value, size)
+            return value
+        except Exception:
+            with self._lock:
+                self._stats['loads'] += 1
+                self._stats['load_errors'] += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, loader, size_of):
+        flight = asyncio.ensure_future(self._run_load(key, loader, size_of))
+        self._inflight[key] = flight
+        # Keep serving the existing entry on failure; the next request retries
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def _lookup(self, key):
+        # Caller must hold the lock. Drops entries too old to ever be served.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() - entry[0] >= self.max_stale:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, size):
+        # Caller must hold the lock
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (self._clock(), size, value)
+        self._bytes += size
+        self._evict()
+
+    def _drop(self, key):
+        # Caller must hold the lock
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        # Caller must hold the lock
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._stats['evictions'] += 1
@@ -0,0 +1,117 @@
+from typing import Any, Dict, Optional
+from .cache import TTLCache
+from .http_client import get_client, UpstreamError
+
+TRAVEL_MODES = ('driving', 'walking', 'bicycling', 'transit')
+
+# Module-level state, set up once by init_directions()
+_config = {}
+_cache: Optional[TTLCache] = None
+
+
+class DirectionsError(Exception):
+    """Raised when the Directions API did not return a route"""
+
+    def __init__(self, status: Optional[str], message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class DirectionsUnavailableError(Exception):
+    """Raised when the Directions API could not be reached"""
+
+
+def init_directions(config) -> TTLCache:
+    """
+    Configure the Directions client and create its route cache
+    Should be called once at application startup, after init_upstreams()
+
+    Args:
+        config: Flask config mapping (GOOGLE_MAPS_API_KEY, DIRECTIONS_API_URL, ROUTE_CACHE_*, MAX_ROUTE_ALTERNATIVES)
+
+    Returns:
+        The route TTLCache
+    """
+    global _cache
+
+    _config.update(
+        api_key=config['GOOGLE_MAPS_API_KEY'],
+        url=config['DIRECTIONS_API_URL'],
+        precision=config['ROUTE_CACHE_PRECISION'],
+        max_alternatives=config['MAX_ROUTE_ALTERNATIVES'],
+    )
+    _cache = TTLCache(
+        ttl=config['ROUTE_CACHE_TTL'],
+        max_entries=config['ROUTE_CACHE_MAX_ENTRIES'],
+        max_bytes=config['ROUTE_CACHE_MAX_BYTES'],
+    )
+    return _cache
+
+
+def _slim_route(route: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the parts of a Directions route we serve (drops per-step instructions)"""
+    return {
+        'overview_polyline': {'points': route['overview_polyline']['points']},
+        'summary': route.get('summary'),
+        'bounds': route.get('bounds'),
+        'legs': [
+            {
+                'distance': leg.get('distance'),
+                'duration': leg.get('duration'),
+                'start_location': leg.get('start_location'),
+                'end_location': leg.get('end_location'),
+                'start_address': leg.get('start_address'),
+                'end_address': leg.get('end_address')
+            }
+            for leg in route.get('legs', [])
+        ]
+    }
+
+
+def _routes_size(routes) -> int:
+    return sum(len(route['overview_polyline']['points']) + 512 for route in routes)
+
+
+async def get_routes(origin_lat: float, origin_lon: float, destination_lat: float, destination_lon: float,
+                     mode: str = 'driving'):
+    """
+    Get up to MAX_ROUTE_ALTERNATIVES routes between two points, cached
+
+    Origin and destination are rounded to ROUTE_CACHE_PRECISION decimal places
+    (4 is about 11 m) and the request is made for the rounded points, so
+    repeat trips (Home -> Work) and small GPS differences share one entry for
+    ROUTE_CACHE_TTL. Concurrent misses for the same key make one request.
+
+    Args:
+        origin_lat, origin_lon: Origin coordinates
+        destination_lat, destination_lon: Destination coordinates
+        mode: Travel mode (driving, walking, bicycling, transit)
+
+    Returns:
+        List of slimmed Directions routes (overview_polyline, summary, bounds, legs)
+
+    Raises:
+        DirectionsError: If Directions returned no route (not cached)
+        DirectionsUnavailableError: If Directions could not be reached
+    """
+    precision = _config['precision']
+    origin = f"{round(float(origin_lat), precision)},{round(float(origin_lon), precision)}"
+    destination = f"{round(float(destination_lat), precision)},{round(float(destination_lon), precision)}"
+    max_alternatives = _config['max_alternatives']
+    key = (origin, destination, mode, max_alternatives)
+
+    async def load():
+        params = {'origin': origin, 'destination': destination, 'mode': mode, 'key': _config['api_key']}
+        if max_alternatives > 1:
+            params['alternatives'] = 'true'
+
+        try:
+            _, data = await get_client('directions').get_json(_config['url'], params=params)
+        except UpstreamError as e:
+            raise DirectionsUnavailableError(str(e)) from e
+        if data.get('status') != 'OK' or not data.get('routes'):
+            raise DirectionsError(data.get('status'), data.get('error_message', 'Could not calculate route'))
+        return [_slim_route(route) for route in data['routes'][:max_alternatives]]
+
+    return await _cache.get_or_load(key, load, size_of=_routes_size)
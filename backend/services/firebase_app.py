@@ -0,0 +1,80 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import firebase_admin
+    from firebase_admin import credentials
+
+# Process that initialized the default Firebase app; it is re-created after a fork
+_app_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def load_credentials() -> Optional['credentials.Base']:
+    """
+    Firebase credentials from FIREBASE_CREDENTIALS_PATH
+
+    Only reads and parses the key file (no network), so it can be used to
+    check the configuration at startup.
+
+    Returns:
+        Certificate credentials, or None to use application default
+        credentials (for deployed environments)
+    """
+    cred_path = os.environ.get('FIREBASE_CREDENTIALS_PATH')
+    if cred_path and os.path.exists(cred_path):
+        from firebase_admin import credentials
+        return credentials.Certificate(cred_path)
+    return None
+
+
+def initialize_firebase() -> 'firebase_admin.App':
+    """
+    Get the Firebase Admin app, initializing it on first use in this process
+
+    Called lazily (by token verification and the Firestore client) rather
+    than at import, so a pre-fork server's master never opens connections
+    or gRPC channels its workers would inherit. An app inherited from a
+    parent process is discarded and initialized again.
+
+    Returns:
+        The default firebase_admin App
+    """
+    import firebase_admin
+    global _app_pid
+
+    if _app_pid == os.getpid():
+        return firebase_admin.get_app()
+
+    with _lock:
+        if _app_pid != os.getpid():
+            try:
+                app = firebase_admin.get_app()
+                if _app_pid is not None:
+                    # Initialized before a fork: its HTTP sessions and channels belong to the parent
+                    firebase_admin.delete_app(app)
+                    raise ValueError
+            except ValueError:
+                firebase_admin.initialize_app(load_credentials())
+            _app_pid = os.getpid()
+    return firebase_admin.get_app()
+
+
+def preload() -> None:
+    """
+    Import the Firebase and Firestore SDKs and read the credentials now
+
+    By default they are imported by the first request that needs them, so
+    the server starts quickly and / and /api/health never load them. With
+    Config.STARTUP_PRELOAD the cost is paid at startup instead (e.g. once in
+    a pre-fork master, whose workers then share the imported modules), and
+    a broken key file fails the deploy rather than the first request.
+
+    Raises:
+        ValueError: If the credentials file cannot be parsed
+    """
+    from firebase_admin import auth, firestore_async  # noqa: F401
+    import google.api_core.exceptions  # noqa: F401
+
+    load_credentials()
@@ -0,0 +1,187 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional
+
+_MISSING_INT = -1
+
+
+def _float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _int(value) -> int:
+    return _MISSING_INT if value is None else int(value)
+
+
+def _opt_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _opt_int(value: int) -> Optional[int]:
+    return None if value == _MISSING_INT else value
+
+
+class HourlySeries:
+    """
+    Hourly forecast for one location stored as parallel typed arrays
+
+    Only the fields served by the weather routes are kept. Rows are sorted by
+    time_epoch so "next N hours from t" is a binary search plus a slice,
+    independent of how many days the upstream payload covered. Condition
+    dicts are deduplicated into a small table referenced by index.
+    """
+    __slots__ = ('time_epoch', 'time', 'temp_c', 'temp_f', 'is_day', 'wind_mph', 'wind_kph',
+                 'wind_degree', 'wind_dir', 'precip_mm', 'vis_km', 'condition_idx', 'conditions')
+
+    def __init__(self):
+        self.time_epoch = array('q')
+        self.time: List[str] = []
+        self.temp_c = array('d')
+        self.temp_f = array('d')
+        self.is_day = array('b')
+        self.wind_mph = array('d')
+        self.wind_kph = array('d')
+        self.wind_degree = array('h')
+        self.wind_dir: List[Optional[str]] = []
+        self.precip_mm = array('d')
+        self.vis_km = array('d')
+        self.condition_idx = array('H')
+        self.conditions: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.time_epoch)
+
+    @classmethod
+    def from_forecast_days(cls, forecast_days: List[Dict[str, Any]]) -> 'HourlySeries':
+        """Build a series from WeatherAPI forecast.forecastday entries"""
+        series = cls()
+        hours = [hour for day in forecast_days for hour in day.get('hour', [])]
+        hours.sort(key=lambda hour: hour['time_epoch'])
+
+        condition_index = {}
+        for hour in hours:
+            condition = hour.get('condition') or {}
+            condition_key = (condition.get('text'), condition.get('icon'), condition.get('code'))
+            idx = condition_index.get(condition_key)
+            if idx is None:
+                idx = condition_index[condition_key] = len(series.conditions)
+                series.conditions.append(condition)
+
+            series.time_epoch.append(int(hour['time_epoch']))
+            series.time.append(hour.get('time'))
+            series.temp_c.append(_float(hour.get('temp_c')))
+            series.temp_f.append(_float(hour.get('temp_f')))
+            series.is_day.append(_int(hour.get('is_day')))
+            series.wind_mph.append(_float(hour.get('wind_mph')))
+            series.wind_kph.append(_float(hour.get('wind_kph')))
+            series.wind_degree.append(_int(hour.get('wind_degree')))
+            series.wind_dir.append(hour.get('wind_dir'))
+            series.precip_mm.append(_float(hour.get('precip_mm')))
+            series.vis_km.append(_float(hour.get('vis_km')))
+            series.condition_idx.append(idx)
+        return series
+
+    def index_at(self, epoch: int) -> int:
+        """Index of the first hour starting at or after epoch"""
+        return bisect_left(self.time_epoch, epoch)
+
+    def hour(self, i: int) -> Dict[str, Any]:
+        """Row i in the shape served by the forecast routes"""
+        return {
+            'time': self.time[i],
+            'temp_c': _opt_float(self.temp_c[i]),
+            'temp_f': _opt_float(self.temp_f[i]),
+            'is_day': _opt_int(self.is_day[i]),
+            'condition': self.conditions[self.condition_idx[i]],
+            'wind_mph': _opt_float(self.wind_mph[i]),
+            'wind_kph': _opt_float(self.wind_kph[i]),
+            'wind_degree': _opt_int(self.wind_degree[i]),
+            'wind_dir': self.wind_dir[i]
+        }
+
+    def hour_containing(self, epoch: int) -> int:
+        """Index of the hour that epoch falls in, or -1 if it is outside the series"""
+        i = bisect_right(self.time_epoch, epoch) - 1
+        if i < 0 or epoch - self.time_epoch[i] >= 3600:
+            return -1
+        return i
+
+    def next_hours(self, now: int, hours: int) -> Dict[str, Any]:
+        """
+        Forecast for the next N hours starting at or after now
+
+        Args:
+            now: Unix time to project from
+            hours: Number of hours to return
+
+        Returns:
+            Dict of forecast_hour_1..forecast_hour_N
+        """
+        start = self.index_at(now)
+        end = min(start + max(hours, 0), len(self))
+        return {f'forecast_hour_{n}': self.hour(i) for n, i in enumerate(range(start, end), start=1)}
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the series"""
+        numeric = sum(
+            len(col) * col.itemsize
+            for col in (self.time_epoch, self.temp_c, self.temp_f, self.is_day, self.wind_mph,
+                        self.wind_kph, self.wind_degree, self.precip_mm, self.vis_km, self.condition_idx)
+        )
+        return numeric + 64 * (len(self.time) + len(self.wind_dir)) + 256 * len(self.conditions)
+
+
+class ForecastRecord:
+    """The slice of a WeatherAPI forecast.json payload that the routes serve"""
+    __slots__ = ('location', 'current', 'hourly', 'size')
+
+    def __init__(self, location: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]],
+                 hourly: HourlySeries, size: int = 0):
+        self.location = location
+        self.current = current
+        self.hourly = hourly
+        self.size = size
+
+    def conditions_at(self, epoch: int) -> Dict[str, Any]:
+        """
+        Route-relevant conditions expected at a given time
+
+        Uses the hourly forecast for the hour containing epoch, falling back to
+        current conditions when epoch is outside the forecast window.
+        """
+        i = self.hourly.hour_containing(epoch)
+        if i < 0:
+            current = self.current or {}
+            return {
+                'time_epoch': None,
+                'temp_c': current.get('temp_c'),
+                'precip_mm': current.get('precip_mm'),
+                'wind_kph': current.get('wind_kph'),
+                'vis_km': current.get('vis_km'),
+                'condition': current.get('condition')
+            }
+        hourly = self.hourly
+        return {
+            'time_epoch': hourly.time_epoch[i],
+            'temp_c': _opt_float(hourly.temp_c[i]),
+            'precip_mm': _opt_float(hourly.precip_mm[i]),
+            'wind_kph': _opt_float(hourly.wind_kph[i]),
+            'vis_km': _opt_float(hourly.vis_km[i]),
+            'condition': hourly.conditions[hourly.condition_idx[i]]
+        }
+
+
+def parse_forecast(data: Dict[str, Any]) -> ForecastRecord:
+    """
+    Reduce a forecast.json payload to a ForecastRecord
+
+    Daily summaries, astronomy and the unused hourly fields are dropped; the
+    location and current blocks are kept as-is since they are served whole.
+    """
+    forecast_days = (data.get('forecast') or {}).get('forecastday', [])
+    hourly = HourlySeries.from_forecast_days(forecast_days)
+    location = data.get('location')
+    current = data.get('current')
+    size = hourly.nbytes() + 64 * (len(location or {}) + len(current or {}))
+    return ForecastRecord(location, current, hourly, size)
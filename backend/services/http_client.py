@@ -0,0 +1,227 @@
+import asyncio
+import importlib.util
+import random
+import threading
+import time
+import httpx
+from typing import Any, Dict, Optional, Tuple
+from . import metrics, tracing
+
+# HTTP statuses worth retrying for idempotent requests
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Module-level registry, set up once by init_upstreams()
+_clients: Dict[str, 'UpstreamClient'] = {}
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream request failed after all retries"""
+
+    def __init__(self, upstream: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.status_code = status_code
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without calling the upstream while its circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    After `failure_threshold` failed requests in a row the circuit opens and
+    requests fail fast for `reset_timeout` seconds. Then a single trial request
+    is let through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Whether a request may be attempted now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class UpstreamClient:
+    """
+    Pooled async HTTP client for one upstream API
+
+    The underlying httpx.AsyncClient is created on first use on the shared I/O
+    loop (see services.aio), so connections are kept alive and reused by every
+    request in the process. HTTP/2 is used when enabled, the h2 package is
+    installed and the upstream is https (httpx negotiates it over TLS). GETs are
+    retried with jittered exponential backoff on transport errors and
+    RETRYABLE_STATUSES, as long as the total time stays within `deadline`, and
+    a circuit breaker fails fast while the upstream keeps failing.
+    """
+
+    def __init__(self, name: str, connect_timeout: float = 3.05, read_timeout: float = 5.0,
+                 deadline: float = 10.0, retries: int = 2, backoff_base: float = 0.1, backoff_max: float = 1.0,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0,
+                 max_connections: int = 20, http2: bool = False):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.max_connections = max_connections
+        self.http2 = http2 and importlib.util.find_spec('h2') is not None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        """
+        GET a JSON resource
+
+        Non-retryable HTTP errors (e.g. 400, 403) are returned to the caller,
+        since APIs like WeatherAPI put the error details in the JSON body.
+
+        Args:
+            url: Request URL
+            params: Query parameters
+
+        Returns:
+            (status_code, parsed JSON body)
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            UpstreamError: On transport errors, retryable statuses or invalid JSON
+                after all retries (or once the deadline is spent)
+        """
+        if not self.breaker.allow():
+            error = CircuitOpenError(self.name, "circuit open, failing fast")
+            metrics.UPSTREAM_ERRORS.inc(self.name, 'GET', type(error).__name__)
+            raise error
+
+        client = self._get_client()
+        timer = time.perf_counter()
+        started = time.monotonic()
+        last_error = None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    # Full jitter: sleep a random time up to the exponential backoff
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                    if time.monotonic() - started + delay >= self.deadline:
+                        break
+                    await asyncio.sleep(delay)
+                # No attempt may run past the overall deadline
+                remaining = self.deadline - (time.monotonic() - started)
+                timeout = httpx.Timeout(min(self.read_timeout, remaining),
+                                        connect=min(self.connect_timeout, remaining))
+                try:
+                    # One span per attempt, so retries and backoff show up in the trace
+                    with tracing.span(f'{self.name}.GET', url=url, attempt=attempt) as attempt_span:
+                        response = await client.get(url, params=params, timeout=timeout)
+                        attempt_span.set(status=response.status_code, response_bytes=len(response.content))
+                except httpx.HTTPError as e:
+                    last_error = UpstreamError(self.name, f"{type(e).__name__}: {e}")
+                    if not isinstance(e, httpx.TransportError):
+                        break  # e.g. too many redirects or an undecodable body: retrying will not help
+                    continue
+
+                if response.status_code in RETRYABLE_STATUSES:
+                    last_error = UpstreamError(self.name, f"HTTP {response.status_code}", response.status_code)
+                    continue
+
+                try:
+                    data = response.json()
+                except ValueError:
+                    last_error = UpstreamError(self.name, "invalid JSON response", response.status_code)
+                    break
+
+                self.breaker.record_success()
+                metrics.observe_upstream(self.name, 'GET', timer, size=len(response.content))
+                return response.status_code, data
+        except BaseException as e:
+            # Cancelled (e.g. a caller's deadline) or an unexpected error: still end the call as a failure,
+            # or a half-open trial would stay in flight and keep the circuit open for good
+            self.breaker.record_failure()
+            metrics.observe_upstream(self.name, 'GET', timer, error=e)
+            raise
+
+        self.breaker.record_failure()
+        metrics.observe_upstream(self.name, 'GET', timer, error=last_error)
+        raise last_error
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+
+def init_upstreams(config) -> Dict[str, UpstreamClient]:
+    """
+    Create the shared upstream clients
+    Should be called once at application startup
+
+    Args:
+        config: Flask config mapping with UPSTREAMS: {name: UpstreamClient kwargs}
+
+    Returns:
+        Dict of upstream name -> UpstreamClient
+    """
+    _clients.clear()
+    for name, settings in config['UPSTREAMS'].items():
+        _clients[name] = UpstreamClient(name, **settings)
+    return _clients
+
+
+async def close_upstreams() -> None:
+    """Close every upstream client's connection pool (when the process shuts down)"""
+    for client in _clients.values():
+        await client.aclose()
+
+
+def get_client(name: str) -> UpstreamClient:
+    """Get the shared client for an upstream (e.g. "weather", "directions")"""
+    return _clients[name]
@@ -0,0 +1,261 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Module-level state, set up once by init_logging()
+_config = {
+    'debug_sample_rate': 1.0,
+    'max_field_chars': 512,
+    'max_items': 20,
+}
+_handler: Optional['_QueueHandler'] = None
+
+# Field names whose values are never logged
+REDACTED_KEYS = re.compile(r'authorization|token|password|secret|api_?key|cookie|credential', re.IGNORECASE)
+# Secrets embedded in strings: bearer tokens and key/token URL parameters
+_REDACTED_PATTERNS = (
+    (re.compile(r'(Bearer\s+)[A-Za-z0-9._~+/=-]+', re.IGNORECASE), r'\1[REDACTED]'),
+    (re.compile(r'([?&](?:key|token|access_token)=)[^&\s"]+', re.IGNORECASE), r'\1[REDACTED]'),
+)
+_MAX_DEPTH = 4
+
+
+class StructuredLogger:
+    """
+    Logger for events with key/value fields: log.info('users.create', uid=uid)
+
+    Disabled levels cost one cached level check. Enabled records are put on
+    a queue and formatted, redacted and written by a background thread, so
+    the caller never waits on serialization or I/O. DEBUG records are
+    sampled (Config.LOG_DEBUG_SAMPLE_RATE). Field values are read when the
+    record is written, so pass values that will not be mutated afterwards.
+    """
+    __slots__ = ('_logger',)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    @property
+    def name(self) -> str:
+        return self._logger.name
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event: str, **fields):
+        if self._logger.isEnabledFor(logging.DEBUG) and random.random() < _config['debug_sample_rate']:
+            self._logger.debug(event, extra={'fields': fields}, stacklevel=2)
+
+    def info(self, event: str, **fields):
+        if self._logger.isEnabledFor(logging.INFO):
+            self._logger.info(event, extra={'fields': fields}, stacklevel=2)
+
+    def warning(self, event: str, **fields):
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._logger.warning(event, extra={'fields': fields}, stacklevel=2)
+
+    def error(self, event: str, **fields):
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._logger.error(event, extra={'fields': fields}, stacklevel=2)
+
+    def exception(self, event: str, **fields):
+        """Log at ERROR with the exception being handled"""
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._logger.error(event, exc_info=True, extra={'fields': fields}, stacklevel=2)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Logger for a module, usually get_logger(__name__)"""
+    return StructuredLogger(logging.getLogger(name))
+
+
+def sanitize(value: Any, depth: int = 0) -> Any:
+    """
+    Make a field value safe and small enough to log
+
+    Secrets are redacted (by key name, bearer tokens and key= URL parameters),
+    long strings are cut to LOG_MAX_FIELD_CHARS, lists and dicts to
+    LOG_MAX_ITEMS entries, and nesting to a few levels.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        for pattern, replacement in _REDACTED_PATTERNS:
+            value = pattern.sub(replacement, value)
+        limit = _config['max_field_chars']
+        return value if len(value) <= limit else f"{value[:limit]}...(+{len(value) - limit} chars)"
+    if depth >= _MAX_DEPTH:
+        return sanitize(repr(value), depth)
+
+    max_items = _config['max_items']
+    if isinstance(value, dict):
+        result = {}
+        for i, (key, item) in enumerate(value.items()):
+            if i == max_items:
+                result['...'] = f"+{len(value) - max_items} keys"
+                break
+            key = str(key)
+            result[key] = '[REDACTED]' if REDACTED_KEYS.search(key) else sanitize(item, depth + 1)
+        return result
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        result = [sanitize(item, depth + 1) for item in items[:max_items]]
+        if len(items) > max_items:
+            result.append(f"...(+{len(items) - max_items} items)")
+        return result
+    return sanitize(str(value), depth)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event, fields..., exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'event': sanitize(record.getMessage()),
+        }
+        for key, value in (getattr(record, 'fields', None) or {}).items():
+            entry[key] = '[REDACTED]' if REDACTED_KEYS.search(key) else sanitize(value)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development: time level logger event key=value ..."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [
+            time.strftime('%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            f'{record.levelname:<7}', record.name, sanitize(record.getMessage())
+        ]
+        for key, value in (getattr(record, 'fields', None) or {}).items():
+            value = '[REDACTED]' if REDACTED_KEYS.search(key) else sanitize(value)
+            parts.append(f'{key}={json.dumps(value, default=str) if not isinstance(value, str) else value}')
+        line = ' '.join(parts)
+        return f'{line}\n{record.exc_text}' if record.exc_text else line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a bounded queue drained by a background listener
+
+    When the queue is full (the output cannot keep up), records are dropped
+    and counted rather than blocking the request. The listener is restarted
+    in a forked child, where the parent's thread does not exist.
+    """
+
+    def __init__(self, maxsize: int, output: logging.Handler):
+        super().__init__(queue.Queue(maxsize))
+        self.output = output
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._lock = threading.Lock()
+        self._ensure_listener()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Anything queued before a fork belongs to the parent
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, self.output, respect_handler_level=True)
+            self._listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what must happen now: tracebacks refer to frames that keep running.
+        # Message and fields are formatted on the listener thread.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord):
+        if self._pid != os.getpid():
+            self._ensure_listener()
+        super().emit(record)
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                self._listener = None
+
+    def stats(self) -> Dict[str, int]:
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped}
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """'models.database=DEBUG,werkzeug=WARNING' -> {'models.database': 'DEBUG', 'werkzeug': 'WARNING'}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def init_logging(config) -> None:
+    """
+    Route all logging through the queue-backed structured pipeline
+    Should be called once at application startup, before anything logs
+
+    Args:
+        config: Flask config mapping (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT,
+            LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE, LOG_MAX_FIELD_CHARS, LOG_MAX_ITEMS)
+    """
+    global _handler
+
+    _config.update(
+        debug_sample_rate=config['LOG_DEBUG_SAMPLE_RATE'],
+        max_field_chars=config['LOG_MAX_FIELD_CHARS'],
+        max_items=config['LOG_MAX_ITEMS'],
+    )
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if config['LOG_FORMAT'] == 'text' else JSONFormatter())
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _handler.stop()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _handler = _QueueHandler(config['LOG_QUEUE_SIZE'], output)
+    root.addHandler(_handler)
+    root.setLevel(config['LOG_LEVEL'].upper())
+    for name, level in _parse_levels(config['LOG_LEVELS']).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def stop_logging() -> None:
+    """Write out every queued record and stop the listener thread (when the process shuts down)"""
+    if _handler is not None:
+        _handler.stop()
+
+
+# Once per process, for whichever handler init_logging() set up last
+atexit.register(stop_logging)
+
+
+def stats() -> Dict[str, int]:
+    """Records waiting to be written and records dropped because the queue was full"""
+    return _handler.stats() if _handler is not None else {'queued': 0, 'dropped': 0}
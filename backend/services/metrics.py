@@ -0,0 +1,277 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Module-level registry of metrics and collectors, rendered by render()
+_metrics: List['_Metric'] = []
+_collectors: Dict[str, Callable[[], Iterable['Family']]] = {}
+
+# A collected metric family: (name, type, help, [(labels, value), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class _Metric(ABC):
+    """
+    Base for metrics aggregated in per-thread shards
+
+    Each thread writes only to its own shard, so recording takes no lock and
+    threads never contend; a lock is only taken the first time a thread
+    records, and when render() sums the shards. Shards of threads that have
+    exited are folded into one retired shard, so thread-per-request servers
+    do not grow the list.
+    """
+    kind = ''
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []  # (thread, {label values: cell})
+        self._retired = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _cells(self) -> Dict[Tuple[str, ...], Any]:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = self._local.cells = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), cells))
+            return cells
+
+    @abstractmethod
+    def _new_cell(self) -> Any:
+        """An empty cell for one set of label values"""
+
+    @abstractmethod
+    def _add(self, total: Any, cell: Any) -> Any:
+        """The sum of two cells"""
+
+    def _merge(self, into: Dict, cells: Dict) -> None:
+        # dict.copy() is atomic under the GIL, so a shard can be read while its thread writes to it
+        for key, cell in cells.copy().items():
+            into[key] = self._add(into.get(key, self._new_cell()), cell)
+
+    def collect(self) -> Dict[Tuple[str, ...], Any]:
+        """Sum of every shard: {label values: cell}"""
+        with self._lock:
+            live = []
+            for thread, cells in self._shards:
+                if thread.is_alive():
+                    live.append((thread, cells))
+                else:
+                    self._merge(self._retired, cells)
+            self._shards = live
+            total = {}
+            self._merge(total, self._retired)
+            for _, cells in live:
+                self._merge(total, cells)
+        return total
+
+    def reset(self) -> None:
+        """Forget every recorded value (for tests and benchmarks)"""
+        with self._lock:
+            for _, cells in self._shards:
+                cells.clear()
+            self._retired = {}
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or errors"""
+    kind = 'counter'
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        cells = self._cells()
+        cells[label_values] = cells.get(label_values, 0) + amount
+
+    def _new_cell(self):
+        return 0
+
+    def _add(self, total, cell):
+        return total + cell
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies, sizes) over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: str) -> None:
+        cells = self._cells()
+        cell = cells.get(label_values)
+        if cell is None:
+            # Per-bucket (not cumulative) counts, the +Inf bucket, then the sum
+            cell = cells[label_values] = [0] * (len(self.buckets) + 2)
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def _new_cell(self):
+        return [0] * (len(self.buckets) + 2)
+
+    def _add(self, total, cell):
+        return [a + b for a, b in zip(total, cell)]
+
+
+# Flask endpoints (see install)
+HTTP_REQUEST_SECONDS = Histogram(
+    'sunpath_http_request_duration_seconds', 'Time to handle a request, by route', ('endpoint', 'method')
+)
+HTTP_RESPONSES = Counter(
+    'sunpath_http_responses_total', 'Responses sent, by route and status code', ('endpoint', 'method', 'status')
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    'sunpath_http_response_bytes', 'Response body size, by route', ('endpoint',), SIZE_BUCKETS
+)
+
+# Calls to other services: weather, directions, firestore, firebase-auth (see observe_upstream)
+UPSTREAM_SECONDS = Histogram(
+    'sunpath_upstream_request_duration_seconds', 'Time spent in a call to an upstream service, including retries',
+    ('upstream', 'op')
+)
+UPSTREAM_ERRORS = Counter(
+    'sunpath_upstream_errors_total', 'Upstream calls that failed, by error type', ('upstream', 'op', 'error')
+)
+UPSTREAM_RESPONSE_BYTES = Histogram(
+    'sunpath_upstream_response_bytes', 'Upstream response body size', ('upstream',), SIZE_BUCKETS
+)
+
+
+def observe_upstream(upstream: str, op: str, started: float, error: Optional[BaseException] = None,
+                     size: Optional[int] = None) -> None:
+    """
+    Record one upstream call
+
+    Args:
+        upstream: Service name ("weather", "directions", "firestore", "firebase-auth")
+        op: Operation (e.g. "GET", "users.get", "verify_id_token")
+        started: time.perf_counter() when the call started
+        error: The exception the call failed with, if any
+        size: Response body size in bytes, if known
+    """
+    UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream, op)
+    if error is not None:
+        UPSTREAM_ERRORS.inc(upstream, op, type(error).__name__)
+    if size is not None:
+        UPSTREAM_RESPONSE_BYTES.observe(size, upstream)
+
+
+def install(app) -> None:
+    """
+    Time every request to a Flask app, by route
+
+    Requests are labelled with the URL rule ("/api/users/favorites"), not the
+    path, so the number of series stays bounded; unknown URLs are labelled
+    "unmatched".
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method)
+            HTTP_RESPONSES.inc(endpoint, request.method, str(response.status_code))
+            if response.content_length is not None:
+                HTTP_RESPONSE_BYTES.observe(response.content_length, endpoint)
+        return response
+
+
+def register_collector(name: str, collector: Callable[[], Iterable[Family]]) -> None:
+    """
+    Add a function whose metric families are rendered with every scrape (e.g. cache counters)
+    Registering again under the same name replaces the collector (e.g. when an app is re-created)
+    """
+    _collectors[name] = collector
+
+
+def stats_collector(prefix: str, sources: Dict[Optional[str], Callable[[], Dict[str, float]]],
+                    label: Optional[str] = None, gauges: Sequence[str] = ()) -> Callable[[], List[Family]]:
+    """
+    Collector exporting existing stats() counters
+
+    Each stats key becomes <prefix>_<key>_total (a counter), or <prefix>_<key>
+    (a gauge) for keys in `gauges`.
+
+    Args:
+        prefix: Metric name prefix, e.g. "sunpath_cache"
+        sources: {label value: stats function}; use {None: fn} for a single unlabelled source
+        label: Label name distinguishing the sources, e.g. "cache"
+        gauges: Keys that are current levels rather than running totals
+
+    Returns:
+        A collector for register_collector
+    """
+    subject = prefix.split('_', 1)[-1].replace('_', ' ')
+
+    def collect() -> List[Family]:
+        families = {}
+        for value, stats in sources.items():
+            labels = {label: value} if label is not None else {}
+            for key, number in stats().items():
+                kind = 'gauge' if key in gauges else 'counter'
+                name = f'{prefix}_{key}' if kind == 'gauge' else f'{prefix}_{key}_total'
+                families.setdefault(name, (name, kind, f"{subject} {key.replace('_', ' ')}", []))[3].append((labels, number))
+        return list(families.values())
+
+    return collect
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """Every metric and collector in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for label_values, cell in sorted(metric.collect().items()):
+            labels = dict(zip(metric.labels, label_values))
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), cell):
+                    cumulative += count
+                    bucket_labels = dict(labels, le=_format_number(bound))
+                    lines.append(f'{metric.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_number(cell[-1])}')
+                lines.append(f'{metric.name}_count{_format_labels(labels)} {cumulative}')
+            else:
+                lines.append(f'{metric.name}{_format_labels(labels)} {_format_number(cell)}')
+
+    for collector in _collectors.values():
+        for name, kind, help, samples in collector():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,169 @@
+import math
+import numpy as np
+from typing import List, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+# Web Mercator ground resolution at zoom 0 on the equator, in meters per pixel
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def decode_array(encoded: str, precision: int = 5) -> np.ndarray:
+    """
+    Decode a Google encoded polyline into an (n, 2) array of lat, lon
+
+    The whole string is decoded with array operations: characters are split
+    into 5-bit chunks, chunks are grouped into values at every chunk without
+    the continuation bit, and the zigzag-decoded deltas are summed per column.
+
+    Args:
+        encoded: Encoded polyline string (e.g. overview_polyline.points)
+        precision: Number of decimal places encoded (5 for Google Directions)
+
+    Returns:
+        Float array of shape (n, 2)
+
+    Raises:
+        ValueError: If the string is not a valid encoded polyline
+    """
+    if not encoded:
+        return np.empty((0, 2), dtype=np.float64)
+
+    chars = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if chars.min() < 0 or chars.max() > 0x3f or chars[-1] >= 0x20:
+        raise ValueError("Invalid encoded polyline")
+
+    ends = chars < 0x20  # Last chunk of each value
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    value_id = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(chars))))
+    shift = 5 * (np.arange(len(chars)) - starts[value_id])
+    values = np.add.reduceat((chars & 0x1f) << shift, starts)
+
+    if len(values) % 2:
+        raise ValueError("Invalid encoded polyline")
+
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / (10 ** precision)
+
+
+def encode_array(coordinates, precision: int = 5) -> str:
+    """
+    Encode lat, lon pairs as a Google encoded polyline
+
+    Args:
+        coordinates: Array-like of shape (n, 2)
+        precision: Number of decimal places to encode
+
+    Returns:
+        Encoded polyline string
+    """
+    coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return ""
+
+    ints = np.round(coords * (10 ** precision)).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Number of 5-bit chunks per value (at least one)
+    n_chunks = np.ones_like(values)
+    rest = values >> 5
+    while rest.any():
+        n_chunks += rest > 0
+        rest >>= 5
+
+    owner = np.repeat(np.arange(len(values)), n_chunks)
+    position = np.arange(n_chunks.sum()) - np.repeat(np.cumsum(n_chunks) - n_chunks, n_chunks)
+    chunks = (values[owner] >> (5 * position)) & 0x1f
+    chunks |= np.where(position < n_chunks[owner] - 1, 0x20, 0)
+    return (chunks + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """
+    Decode a Google encoded polyline into (lat, lon) pairs
+
+    Args:
+        encoded: Encoded polyline string (e.g. overview_polyline.points)
+        precision: Number of decimal places encoded (5 for Google Directions)
+
+    Returns:
+        List of (lat, lon) tuples
+    """
+    return [tuple(point) for point in decode_array(encoded, precision).tolist()]
+
+
+def encode(coordinates, precision: int = 5) -> str:
+    """Encode (lat, lon) pairs as a Google encoded polyline (see encode_array)"""
+    return encode_array(coordinates, precision)
+
+
+def tolerance_for_zoom(zoom: float, latitude: float, pixels: float = 1.0) -> float:
+    """
+    Simplification tolerance in meters that is invisible at a map zoom level
+
+    Args:
+        zoom: Web Mercator zoom level (0 = whole world, ~15 = streets)
+        latitude: Latitude the route is displayed at
+        pixels: How many screen pixels of deviation to allow
+
+    Returns:
+        Tolerance in meters
+    """
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def simplify(coordinates, tolerance_m: float) -> np.ndarray:
+    """
+    Simplify a line with Douglas-Peucker
+
+    Points are projected to a local equirectangular plane so the tolerance is in
+    meters. The recursion is run with an explicit stack and each step measures
+    every point in the current range against its chord in one array operation.
+
+    Args:
+        coordinates: Array-like of shape (n, 2) with lat, lon
+        tolerance_m: Maximum allowed deviation from the original line in meters
+
+    Returns:
+        Array of the kept points (always includes the first and last point)
+    """
+    coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    if n < 3 or tolerance_m <= 0:
+        return coords
+
+    lat0 = math.radians(float(coords[:, 0].mean()))
+    xy = np.empty_like(coords)
+    xy[:, 0] = np.radians(coords[:, 1]) * math.cos(lat0) * EARTH_RADIUS_M
+    xy[:, 1] = np.radians(coords[:, 0]) * EARTH_RADIUS_M
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    tolerance_sq = tolerance_m * tolerance_m
+
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        start, end = xy[first], xy[last]
+        segment = end - start
+        points = xy[first + 1:last] - start
+        seg_len_sq = float(segment @ segment)
+        if seg_len_sq == 0.0:
+            dist_sq = np.einsum('ij,ij->i', points, points)
+        else:
+            # Distance to the chord segment (projection clamped to its ends)
+            t = np.clip(points @ segment / seg_len_sq, 0.0, 1.0)
+            offset = points - np.outer(t, segment)
+            dist_sq = np.einsum('ij,ij->i', offset, offset)
+
+        i = int(np.argmax(dist_sq))
+        if dist_sq[i] > tolerance_sq:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return coords[keep]
@@ -0,0 +1,101 @@
+import numpy as np
+from typing import Any, Dict, List
+
+FACTORS = ('temperature', 'precipitation', 'wind', 'visibility')
+
+# Conditions at which each factor reaches its full penalty of 1.0
+COMFORT_TEMP_C = (15.0, 25.0)  # No temperature penalty inside this band
+TEMP_FULL_PENALTY_C = 15.0  # Degrees outside the band for a full penalty
+PRECIP_FULL_PENALTY_MM = 4.0  # mm/hour (heavy rain)
+WIND_CALM_KPH = 15.0
+WIND_FULL_PENALTY_KPH = 60.0
+VIS_CLEAR_KM = 10.0
+
+
+def _segment_penalties(temp_c, precip_mm, wind_kph, vis_km) -> np.ndarray:
+    """Per-segment penalties in [0, 1], one column per factor; missing values stay NaN"""
+    low, high = COMFORT_TEMP_C
+    temperature = np.maximum(low - temp_c, temp_c - high) / TEMP_FULL_PENALTY_C
+    precipitation = precip_mm / PRECIP_FULL_PENALTY_MM
+    wind = (wind_kph - WIND_CALM_KPH) / (WIND_FULL_PENALTY_KPH - WIND_CALM_KPH)
+    visibility = (VIS_CLEAR_KM - vis_km) / VIS_CLEAR_KM
+
+    penalties = np.column_stack((temperature, precipitation, wind, visibility))
+    return np.clip(penalties, 0.0, 1.0)
+
+
+def score_routes(route_weathers: List[Dict[str, Any]], weights: Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    Score routes by the weather along them
+
+    All segments of all routes are scored in one vectorized pass: each segment
+    gets a penalty per factor, the penalties are combined with the configured
+    weights, and each route's penalty is the length-weighted mean over its
+    segments. Segments without weather data (e.g. a failed fetch) are left
+    out of the mean rather than scored as good weather; a factor no segment
+    of a route has data for is reported as None and its weight is shared
+    among the others, and a route with no weather data at all gets a score
+    of None.
+
+    Args:
+        route_weathers: routes_weather() output, one entry per route
+        weights: Factor weights, e.g. Config.WEATHER_WEIGHTS (normalized here)
+
+    Returns:
+        One { "score": float or None, "factors": {factor: penalty or None} } per
+        route, in input order. Score is 1 - weighted penalty: 1.0 is ideal, 0.0 is worst.
+    """
+    n_routes = len(route_weathers)
+    rows = [
+        (r, seg['end_m'] - seg['start_m'], seg['conditions'] or {})
+        for r, weather in enumerate(route_weathers)
+        for seg in weather['segments']
+    ]
+    if not rows:
+        return [{"score": None, "factors": dict.fromkeys(FACTORS)} for _ in range(n_routes)]
+
+    def column(name):
+        return np.array([c.get(name) for _, _, c in rows], dtype=np.float64)
+
+    route_idx = np.fromiter((r for r, _, _ in rows), dtype=np.intp, count=len(rows))
+    # Zero-length segments (a route ending right after a cell boundary) still count a little
+    length = np.fromiter((max(length, 1.0) for _, length, _ in rows), dtype=np.float64, count=len(rows))
+
+    penalties = _segment_penalties(column('temp_c'), column('precip_mm'),
+                                   column('wind_kph'), column('vis_km'))
+
+    w = np.array([weights.get(f, 0.0) for f in FACTORS], dtype=np.float64)
+    w = w / w.sum() if w.sum() > 0 else np.full(len(FACTORS), 1.0 / len(FACTORS))
+
+    # Length-weighted mean per route for every factor at once, over the segments with data: (n_routes, n_factors)
+    known = ~np.isnan(penalties)
+    known_length = known * length[:, None]
+    factor_sums = np.stack([
+        np.bincount(route_idx, weights=np.where(known[:, k], penalties[:, k], 0.0) * length, minlength=n_routes)
+        for k in range(len(FACTORS))
+    ], axis=1)
+    factor_lengths = np.stack([
+        np.bincount(route_idx, weights=known_length[:, k], minlength=n_routes)
+        for k in range(len(FACTORS))
+    ], axis=1)
+    has_data = factor_lengths > 0
+    factor_means = np.divide(factor_sums, factor_lengths, out=np.full_like(factor_sums, np.nan), where=has_data)
+
+    # Weights renormalized per route over the factors it has data for
+    route_weight = has_data @ w
+    penalty = np.divide(np.where(has_data, factor_means, 0.0) @ w, route_weight,
+                        out=np.full(n_routes, np.nan), where=route_weight > 0)
+    scores = 1.0 - penalty
+
+    return [
+        {
+            "score": _rounded(scores[r]),
+            "factors": {f: _rounded(factor_means[r, k]) for k, f in enumerate(FACTORS)}
+        }
+        for r in range(n_routes)
+    ]
+
+
+def _rounded(value) -> Any:
+    """JSON-ready score or penalty: None where there was no data"""
+    return None if np.isnan(value) else round(float(value), 4)
@@ -0,0 +1,199 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from . import aio, weather
+from .weather import WeatherAPIError, WeatherUnavailableError, snap_lat_lon
+
+EARTH_RADIUS_M = 6371008.8
+
+# Module-level state, set up once by init_route_weather()
+_config = {}
+
+
+def init_route_weather(config) -> None:
+    """
+    Configure route weather sampling
+    Should be called once at application startup, after init_weather()
+
+    Args:
+        config: Flask config mapping (ROUTE_WEATHER_*, WEATHER_GRID_DEGREES)
+    """
+    _config.update(
+        spacing_m=config['ROUTE_WEATHER_SPACING_M'],
+        max_samples=config['ROUTE_WEATHER_MAX_SAMPLES'],
+        grid_degrees=config['WEATHER_GRID_DEGREES'],
+        max_concurrency=config['ROUTE_WEATHER_MAX_CONCURRENCY'],
+    )
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def sample_route(points: List[Tuple[float, float]], spacing_m: float,
+                 max_samples: Optional[int] = None) -> Tuple[List[Tuple[float, float, float]], float]:
+    """
+    Pick points along a route every spacing_m meters
+
+    The start and end of the route are always included. If the route is long
+    enough to exceed max_samples, the spacing is widened to stay under it.
+
+    Args:
+        points: Decoded route as (lat, lon) pairs
+        spacing_m: Distance between samples in meters
+        max_samples: Optional cap on the number of samples
+
+    Returns:
+        (samples, total_m): samples as (lat, lon, distance_along_route_m) and the route length
+    """
+    if not points:
+        return [], 0.0
+
+    cumulative = [0.0]
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        cumulative.append(cumulative[-1] + haversine_m(lat1, lon1, lat2, lon2))
+    total_m = cumulative[-1]
+
+    if max_samples and max_samples > 1 and total_m / spacing_m + 1 > max_samples:
+        spacing_m = total_m / (max_samples - 1)
+
+    samples = [(points[0][0], points[0][1], 0.0)]
+    target = spacing_m
+    i = 1
+    while target < total_m and i < len(points):
+        # Advance to the segment containing target, then interpolate along it
+        while i < len(points) and cumulative[i] < target:
+            i += 1
+        seg_len = cumulative[i] - cumulative[i - 1]
+        t = (target - cumulative[i - 1]) / seg_len if seg_len else 0.0
+        (lat1, lon1), (lat2, lon2) = points[i - 1], points[i]
+        samples.append((lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t, target))
+        target += spacing_m
+
+    if len(points) > 1 and total_m > samples[-1][2]:
+        samples.append((points[-1][0], points[-1][1], total_m))
+
+    return samples, total_m
+
+
+async def fetch_cells(cells: Iterable[str]) -> Dict[str, Tuple[Any, bool]]:
+    """
+    Fetch forecasts for a set of weather grid cells concurrently
+
+    Each distinct cell is requested once, with at most
+    ROUTE_WEATHER_MAX_CONCURRENCY requests in flight. Requests go through the
+    weather cache, so cells that are already cached (or being fetched by
+    another request) cost no extra upstream call.
+
+    Args:
+        cells: Snapped "lat,lon" cell keys (duplicates are ignored)
+
+    Returns:
+        Dict of cell -> (ForecastRecord, stale), or (None, False) for cells that failed
+    """
+    unique = list(dict.fromkeys(cells))
+    semaphore = asyncio.Semaphore(_config['max_concurrency'])
+
+    async def fetch(cell):
+        async with semaphore:
+            try:
+                return await weather.get_forecast(cell)
+            except (WeatherAPIError, WeatherUnavailableError):
+                return None, False
+
+    results = await asyncio.gather(*(fetch(cell) for cell in unique))
+    return dict(zip(unique, results))
+
+
+async def prefetch_points(points: Iterable[Tuple[float, float]]) -> None:
+    """
+    Warm the weather cache for points known before the route is (e.g. its endpoints)
+
+    Lets the caller overlap these fetches with the Directions request; failures
+    are ignored and retried by routes_weather.
+    """
+    grid = _config['grid_degrees']
+    await fetch_cells(snap_lat_lon(f"{lat},{lon}", grid) for lat, lon in points)
+
+
+async def routes_weather(routes: List[Tuple[List[Tuple[float, float]], float]],
+                         spacing_m: Optional[float] = None, departure: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Weather expected along one or more routes
+
+    Each route is sampled every spacing_m meters; samples are snapped to weather
+    grid cells and consecutive samples in the same cell are merged into one
+    segment. Each segment reports the forecast for the hour the traveller is
+    expected to reach it, assuming constant speed over the route's duration.
+    Cells are deduplicated across all routes and fetched in a single fan-out.
+    Sampling and segment building run in a worker thread, off the I/O loop.
+
+    Args:
+        routes: List of (points, duration_s) with points as decoded (lat, lon) pairs
+        spacing_m: Sample spacing in meters (defaults to ROUTE_WEATHER_SPACING_M)
+        departure: Departure unix time (defaults to now)
+
+    Returns:
+        One { "segments": [...], "distance_m": float, "stale": bool } per route,
+        where each segment has start_m, end_m, lat, lon, eta and conditions
+        (None if unavailable)
+    """
+    spacing_m = spacing_m or _config['spacing_m']
+    departure = time.time() if departure is None else departure
+    grid = _config['grid_degrees']
+
+    def sample():
+        sampled = []
+        for points, duration_s in routes:
+            samples, total_m = sample_route(points, spacing_m, _config['max_samples'])
+            cells = [snap_lat_lon(f"{lat},{lon}", grid) for lat, lon, _ in samples]
+            sampled.append((samples, cells, total_m, duration_s))
+        return sampled
+
+    sampled = await aio.to_thread(sample)
+    forecasts = await fetch_cells(cell for _, cells, _, _ in sampled for cell in cells)
+
+    return await aio.to_thread(lambda: [
+        _build_segments(samples, cells, total_m, duration_s, departure, forecasts)
+        for samples, cells, total_m, duration_s in sampled
+    ])
+
+
+async def route_weather(points: List[Tuple[float, float]], duration_s: float,
+                        spacing_m: Optional[float] = None, departure: Optional[float] = None) -> Dict[str, Any]:
+    """Weather expected along a single route (see routes_weather)"""
+    return (await routes_weather([(points, duration_s)], spacing_m, departure))[0]
+
+
+def _build_segments(samples, cells, total_m, duration_s, departure, forecasts):
+    segments = []
+    stale = False
+    previous_cell = None
+    for (lat, lon, distance_m), cell in zip(samples, cells):
+        if cell == previous_cell:
+            continue
+        previous_cell = cell
+
+        eta = departure + (duration_s * distance_m / total_m if total_m else 0)
+        record, cell_stale = forecasts[cell]
+        stale = stale or cell_stale
+        segments.append({
+            'start_m': round(distance_m, 1),
+            'end_m': round(total_m, 1),
+            'lat': lat,
+            'lon': lon,
+            'eta': int(eta),
+            'conditions': record.conditions_at(int(eta)) if record is not None else None
+        })
+
+    # Each segment runs until the next one starts; the last one to the end of the route
+    for current, following in zip(segments, segments[1:]):
+        current['end_m'] = following['start_m']
+
+    return {"segments": segments, "distance_m": round(total_m, 1), "stale": stale}
@@ -0,0 +1,315 @@
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+# Module-level state, set up once by init_tracing()
+_config = {
+    'enabled': False,
+    'slow_seconds': 0.5,
+    'sample_rate': 0.0,
+}
+_buffer: Deque['Trace'] = deque(maxlen=200)
+_writer: Optional['_JSONLWriter'] = None
+
+# Innermost open span of the current request; copied into tasks and worker threads with the context
+_current: ContextVar[Optional['Span']] = ContextVar('sunpath_span', default=None)
+
+TRACE_HEADER = 'X-Trace-Id'
+_TRACE_ID = re.compile(r'^[0-9a-f]{32}$')
+_TRACEPARENT = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+class Trace:
+    """One request: its root span and every span finished under it"""
+    __slots__ = ('trace_id', 'parent_id', 'started_at', 'root', 'spans')
+
+    def __init__(self, trace_id: Optional[str] = None, parent_id: Optional[str] = None):
+        self.trace_id = trace_id or f'{random.getrandbits(128):032x}'
+        self.parent_id = parent_id  # Span ID of the caller, from an incoming traceparent
+        self.started_at = time.time()
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []  # Appended on finish; list.append is thread-safe
+
+    @property
+    def duration(self) -> Optional[float]:
+        return self.root.duration if self.root is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready form: spans in start order, times in ms relative to the root span"""
+        origin = self.root.start
+        return {
+            'trace_id': self.trace_id,
+            'parent_id': self.parent_id,
+            'name': self.root.name,
+            'started_at': self.started_at,
+            'duration_ms': round(self.root.duration * 1000, 3),
+            'attributes': self.root.attributes,
+            'error': self.root.error,
+            'spans': [
+                {
+                    'span_id': span.span_id,
+                    'parent_id': span.parent_id,
+                    'name': span.name,
+                    'offset_ms': round((span.start - origin) * 1000, 3),
+                    'duration_ms': round(span.duration * 1000, 3),
+                    'attributes': span.attributes,
+                    'error': span.error,
+                }
+                for span in sorted(self.spans, key=lambda span: span.start) if span is not self.root
+            ],
+        }
+
+
+class Span:
+    """
+    A timed operation within a trace, used as a context manager
+
+    Entering makes it the parent of spans started inside it, including in
+    tasks and threads spawned from there (they copy the context).
+    """
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'attributes', 'start', 'duration', 'error', '_token')
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = None
+        self.duration = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        """Add attributes (e.g. status codes, sizes, cache hits) to the span"""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.finish(exc)
+
+    def finish(self, exc: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        if exc is not None:
+            self.error = type(exc).__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Finished from another context (e.g. a teardown after the view failed); just unset it
+            _current.set(None)
+        self.trace.spans.append(self)
+
+
+class _NullSpan:
+    """Stand-in returned outside a trace, so instrumented code needs no checks"""
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attributes):
+    """
+    Child span of the current one: with span('firestore.users.get'): ...
+
+    Outside a traced request this returns a no-op span, so the cost is one
+    context variable lookup.
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NULL_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the request being handled, if it is traced"""
+    parent = _current.get()
+    return parent.trace.trace_id if parent is not None else None
+
+
+def start_trace(name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                **attributes) -> Span:
+    """Start a trace and enter its root span; finish it with finish_trace()"""
+    trace = Trace(trace_id, parent_id)
+    root = trace.root = Span(trace, name, None, attributes)
+    return root.__enter__()
+
+
+def finish_trace(root: Span, exc: Optional[BaseException] = None) -> None:
+    """
+    Finish a trace's root span and export the trace if it is kept
+
+    Traces slower than TRACE_SLOW_MS are always kept; faster ones with
+    probability TRACE_SAMPLE_RATE.
+    """
+    root.finish(exc)
+    if root.duration >= _config['slow_seconds'] or random.random() < _config['sample_rate']:
+        _buffer.append(root.trace)
+        if _writer is not None:
+            _writer.write(root.trace)
+
+
+def recent_traces(min_ms: float = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    """Kept traces from the in-process buffer, newest first"""
+    traces = [trace for trace in reversed(_buffer) if trace.duration * 1000 >= min_ms]
+    return [trace.to_dict() for trace in traces[:limit]]
+
+
+def get_trace(trace_id: str) -> Optional[Dict[str, Any]]:
+    """A kept trace by ID, if still in the buffer"""
+    for trace in reversed(_buffer):
+        if trace.trace_id == trace_id:
+            return trace.to_dict()
+    return None
+
+
+class _JSONLWriter:
+    """Appends kept traces to a JSONL file from a background thread (restarted after fork)"""
+
+    def __init__(self, path: str, maxsize: int = 1000):
+        self.path = path
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def write(self, trace: Trace) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='trace-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self, traces: 'queue.Queue[Optional[Trace]]') -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                trace = traces.get()
+                if trace is None:
+                    return
+                f.write(json.dumps(trace.to_dict(), default=str) + '\n')
+                if traces.empty():
+                    f.flush()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out queued traces and stop the writer thread"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._pid = None
+            queued, thread = self._queue, self._thread
+        queued.put(None)
+        thread.join(timeout)
+
+
+def init_tracing(config) -> None:
+    """
+    Configure request tracing
+    Should be called once at application startup
+
+    Args:
+        config: Flask config mapping (TRACE_ENABLED, TRACE_SLOW_MS, TRACE_SAMPLE_RATE,
+            TRACE_BUFFER_SIZE, TRACE_EXPORT_PATH)
+    """
+    global _buffer, _writer
+
+    _config.update(
+        enabled=config['TRACE_ENABLED'],
+        slow_seconds=config['TRACE_SLOW_MS'] / 1000,
+        sample_rate=config['TRACE_SAMPLE_RATE'],
+    )
+    _buffer = deque(maxlen=config['TRACE_BUFFER_SIZE'])
+    _writer = _JSONLWriter(config['TRACE_EXPORT_PATH']) if config['TRACE_EXPORT_PATH'] else None
+
+
+def close() -> None:
+    """Write out traces still queued for the JSONL file (when the process shuts down)"""
+    if _writer is not None:
+        _writer.close()
+
+
+def _incoming_ids(headers) -> tuple:
+    """(trace_id, parent_id) from a W3C traceparent or X-Trace-Id request header, if valid"""
+    match = _TRACEPARENT.match(headers.get('traceparent', ''))
+    if match:
+        return match.group(1), match.group(2)
+    trace_id = headers.get(TRACE_HEADER, '').lower()
+    return (trace_id if _TRACE_ID.match(trace_id) else None), None
+
+
+def install(app) -> None:
+    """
+    Trace every request to a Flask app
+
+    Each request gets a root span named after its URL rule, continuing the
+    caller's trace ID when one is sent, and the trace ID is returned in the
+    X-Trace-Id response header. JSON encoding of responses gets its own span.
+    Does nothing unless TRACE_ENABLED (init_tracing must be called first).
+    """
+    if not _config['enabled']:
+        return
+
+    from flask import g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TracedJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            with span('json.encode'):
+                return super().dumps(obj, **kwargs)
+
+    app.json = TracedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_trace():
+        trace_id, parent_id = _incoming_ids(request.headers)
+        name = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g._trace_root = start_trace(f'{request.method} {name}', trace_id, parent_id, path=request.path)
+
+    @app.after_request
+    def _finish_request_trace(response):
+        root = g.pop('_trace_root', None)
+        if root is not None:
+            root.set(status=response.status_code, response_bytes=response.content_length)
+            response.headers[TRACE_HEADER] = root.trace.trace_id
+            finish_trace(root)
+        return response
+
+    @app.teardown_request
+    def _abandon_request_trace(exc):
+        # after_request did not run (e.g. an error while building the response)
+        root = g.pop('_trace_root', None)
+        if root is not None:
+            finish_trace(root, exc)
@@ -0,0 +1,157 @@
+import math
+import time
+from typing import Any, Dict, Optional, Tuple
+from .cache import TTLCache
+from .http_client import get_client, UpstreamError
+from .forecast import ForecastRecord, parse_forecast
+
+# Module-level state, set up once by init_weather()
+_config = {}
+_cache: Optional[TTLCache] = None
+
+
+class WeatherAPIError(Exception):
+    """Raised when WeatherAPI answers with an error payload instead of weather data"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        super().__init__(payload.get('error', {}).get('message', 'WeatherAPI error'))
+        self.payload = payload
+
+
+class WeatherUnavailableError(Exception):
+    """Raised when WeatherAPI could not be reached and no usable cached data exists"""
+
+
+def init_weather(config) -> TTLCache:
+    """
+    Configure the weather service and create its cache
+    Should be called once at application startup, after init_upstreams()
+
+    Args:
+        config: Flask config mapping (WEATHER_API_*, CACHE_TTL, WEATHER_HARD_TTL,
+            WEATHER_MAX_STALE, WEATHER_CACHE_*, WEATHER_FORECAST_DAYS)
+
+    Returns:
+        The weather TTLCache
+    """
+    global _cache
+
+    _config.update(
+        base_url=config['WEATHER_API_BASE_URL'],
+        api_key=config['WEATHER_API_KEY'],
+        grid_degrees=config['WEATHER_GRID_DEGREES'],
+        forecast_days=config['WEATHER_FORECAST_DAYS'],
+    )
+    _cache = TTLCache(
+        ttl=config['CACHE_TTL'],
+        hard_ttl=config['WEATHER_HARD_TTL'],
+        max_stale=config['WEATHER_MAX_STALE'],
+        max_entries=config['WEATHER_CACHE_MAX_ENTRIES'],
+        max_bytes=config['WEATHER_CACHE_MAX_BYTES'],
+    )
+    return _cache
+
+
+def snap_lat_lon(lat_lon: str, grid_degrees: float) -> str:
+    """
+    Snap a "lat,lon" string to the center of its grid cell
+
+    Nearby coordinates (and GPS jitter) map to the same cell so they share one
+    cache entry. Queries that are not a coordinate pair (city names, postcodes)
+    are returned unchanged.
+
+    Args:
+        lat_lon: Query string, usually "lat,lon"
+        grid_degrees: Cell size in degrees (0.01 is roughly 1.1 km)
+
+    Returns:
+        Snapped "lat,lon" string
+    """
+    try:
+        lat, lon = (float(part) for part in lat_lon.split(','))
+    except ValueError:
+        return lat_lon.strip()
+
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        return lat_lon.strip()
+
+    decimals = max(0, math.ceil(-math.log10(grid_degrees)))
+    lat = round(lat / grid_degrees) * grid_degrees
+    lon = round(lon / grid_degrees) * grid_degrees
+    return f"{lat:.{decimals}f},{lon:.{decimals}f}"
+
+
+async def _fetch(q: str, type: str, days: int) -> Dict[str, Any]:
+    """Call WeatherAPI and return the parsed JSON, raising on transport or API errors"""
+    params = {'key': _config['api_key'], 'q': q}
+    if type == "forecast":
+        params['days'] = days
+
+    try:
+        _, data = await get_client('weather').get_json(f"{_config['base_url']}{type}.json", params=params)
+    except UpstreamError as e:
+        raise WeatherUnavailableError(str(e)) from e
+    if 'error' in data:
+        raise WeatherAPIError(data)
+    return data
+
+
+async def get_forecast(lat_lon: str) -> Tuple[ForecastRecord, bool]:
+    """
+    Get the forecast (location, current and hourly series) for a location
+
+    This is the single upstream call behind every weather route: current
+    conditions and the hourly projection are both derived from one
+    forecast.json request, reduced to a ForecastRecord before caching.
+
+    The location is snapped to its grid cell first and the upstream request is
+    made for the cell center, so every user in the cell shares the same entry.
+    Concurrent misses for the same cell result in a single upstream request.
+
+    Entries older than CACHE_TTL are served immediately and refreshed in the
+    background. Entries older than WEATHER_HARD_TTL are refetched before
+    answering, but if WeatherAPI fails they are still served (up to
+    WEATHER_MAX_STALE old) with stale=True.
+
+    Args:
+        lat_lon: "lat,lon" query string
+
+    Returns:
+        (record, stale): the ForecastRecord and whether it is past its hard TTL
+
+    Raises:
+        WeatherAPIError: If WeatherAPI returned an error payload (not cached)
+        WeatherUnavailableError: If WeatherAPI could not be reached and nothing is cached
+    """
+    cell = snap_lat_lon(lat_lon, _config['grid_degrees'])
+    days = _config['forecast_days']
+
+    async def load():
+        return parse_forecast(await _fetch(cell, 'forecast', days))
+
+    return await _cache.get_or_refresh(('forecast', days, cell), load, size_of=lambda record: record.size)
+
+
+def project_current(record: ForecastRecord) -> Dict[str, Any]:
+    """Shape a forecast like a current.json response: { location, current }"""
+    return {
+        "location": record.location,
+        "current": record.current
+    }
+
+
+def project_forecast(record: ForecastRecord, hours: int, now: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extract the next N hourly forecasts from a forecast record
+
+    Args:
+        record: ForecastRecord from get_forecast
+        hours: Number of hours to return
+        now: Unix time to project from (defaults to the current time)
+
+    Returns:
+        Dict of forecast_hour_1..forecast_hour_N with temps, conditions, and wind
+    """
+    # Use the wall clock rather than the payload's fetch time, which may be up to CACHE_TTL old
+    current_time = int(time.time()) if now is None else now
+    return record.hourly.next_hours(current_time, hours)
@@ -0,0 +1,6 @@
+# backend/wsgi.py
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# (Socket.IO is served by the same app: init_realtime wraps its WSGI callable)
+from application import create_app
+
+app = create_app()
@@ -131,21 +131,20 @@ export default function Header({ userLocation }: HeaderProps) {
           return;
         }
 
-        // If no cached data get new data
-        const [currentWeatherResponse, forecastResponse] = await Promise.all([
-          axios.get(`${API_BASE_URL}/api/get_user_pos_current_weather?lat_lon=${userLocation?.latitude},${userLocation?.longitude}`),
-          axios.get(`${API_BASE_URL}/api/get_user_pos_forecast_weather?lat_lon=${userLocation?.latitude},${userLocation?.longitude}`)
-        ])
+        // If no cached data get new data (current + forecast in one request)
+        const weatherResponse = await axios.get(
+          `${API_BASE_URL}/api/get_user_pos_weather?lat_lon=${userLocation?.latitude},${userLocation?.longitude}`
+        )
 
-        setCurrentWeatherData(currentWeatherResponse.data.data.current)
-        setForecastData(forecastResponse.data.data.forecast)
+        setCurrentWeatherData(weatherResponse.data.data.current)
+        setForecastData(weatherResponse.data.data.forecast)
 
-        if (currentWeatherResponse.data.data.current) {
-          await AsyncStorage.setItem('cachedCurrentWeather', JSON.stringify(currentWeatherResponse.data.data.current));
+        if (weatherResponse.data.data.current) {
+          await AsyncStorage.setItem('cachedCurrentWeather', JSON.stringify(weatherResponse.data.data.current));
           await AsyncStorage.setItem('cachedCurrentWeatherTimestamp', now.toString());
         }
-        if (forecastResponse.data.data.forecast) {
-          await AsyncStorage.setItem('cachedWeatherForecast', JSON.stringify(forecastResponse.data.data.forecast));
+        if (weatherResponse.data.data.forecast) {
+          await AsyncStorage.setItem('cachedWeatherForecast', JSON.stringify(weatherResponse.data.data.forecast));
           await AsyncStorage.setItem('cachedWeatherForecastTimestamp', now.toString());
         }
 
@@ -7,10 +7,11 @@ import polyline from "@mapbox/polyline";
 import AddressSearchBar from './AddressSearchBar';
 
 import { API_BASE_URL, GOOGLE_PLACES_API_KEY } from "@env";
-import { getAuth } from 'firebase/auth';
+import { getAuth, onAuthStateChanged } from 'firebase/auth';
 import { NativeStackNavigationProp } from '@react-navigation/native-stack';
 import { useNavigation } from '@react-navigation/native';
 import { GooglePlacesAutocompleteRef } from 'react-native-google-places-autocomplete';
+import { io } from 'socket.io-client';
 
 type InputBottomSheetProps = {
   userLocation: { latitude: number; longitude: number } | null;
@@ -318,14 +319,20 @@ const InputBottomSheet: React.FC<InputBottomSheetProps> = ({ userLocation, onRou
   const [distanceMetric, setDistanceMetric] = useState<string>("miles")
   const [recents, setRecents] = useState<AddressItem[]>([]);
   const [favorites, setFavorites] = useState<AddressItem[]>([]);
+  // Last ETags seen, so polls that find nothing changed get an empty 304
+  const favoritesEtag = useRef<string | null>(null);
+  const recentsEtag = useRef<string | null>(null);
   const fetchFavorites = async () => {
     try {
       const idToken = await getAuth().currentUser?.getIdToken();
       const res = await fetch(`${API_BASE_URL}/api/users/favorites`, {
         headers: {
           "Authorization": `Bearer ${idToken}`,
+          ...(favoritesEtag.current ? { "If-None-Match": favoritesEtag.current } : {}),
         },
       });
+      if (res.status === 304) return;
+      favoritesEtag.current = res.headers.get("ETag");
       const jsonRes = await res.json();
       setFavorites(jsonRes.favorites || []);
     } catch (error) {
@@ -338,25 +345,82 @@ const InputBottomSheet: React.FC<InputBottomSheetProps> = ({ userLocation, onRou
         const res = await fetch(`${API_BASE_URL}/api/users/recent`, {
           headers: {
             "Authorization": `Bearer ${idToken}`,
+            ...(recentsEtag.current ? { "If-None-Match": recentsEtag.current } : {}),
           },
         });
+        if (res.status === 304) return;
+        recentsEtag.current = res.headers.get("ETag");
         const jsonRes = await res.json();
         setRecents(jsonRes.recent || []);
       } catch (error) {
         console.log("Error fetching Recents:", error);
       }
     };
+  // Changes are pushed over Socket.IO; polling is only a fallback while the socket is down
+  const socketConnected = useRef(false);
+  useEffect(() => {
+    const socket = io(API_BASE_URL, {
+      transports: ['websocket'],
+      // Connected from onAuthStateChanged below, once Firebase has restored the session
+      autoConnect: false,
+      // Called on every (re)connect so an expired ID token is refreshed; always answers
+      // so the handshake fails fast (and polling takes over) instead of hanging
+      auth: (cb) => {
+        const user = getAuth().currentUser;
+        if (!user) {
+          cb({ token: null });
+          return;
+        }
+        user.getIdToken()
+          .then((token) => cb({ token }))
+          .catch(() => cb({ token: null }));
+      },
+    });
+    const unsubscribeAuth = onAuthStateChanged(getAuth(), (user) => {
+      if (user && !socket.connected) {
+        socket.connect();
+      } else if (!user) {
+        socket.disconnect();
+      }
+    });
+    socket.on('connect', () => {
+      socketConnected.current = true;
+      // Catch up on anything missed while disconnected (cheap 304s if nothing changed)
+      fetchFavorites();
+      fetchRecents();
+    });
+    socket.on('disconnect', () => {
+      socketConnected.current = false;
+    });
+    socket.on('favorites', (msg: { favorites: AddressItem[]; etag: string }) => {
+      favoritesEtag.current = msg.etag;
+      setFavorites(msg.favorites || []);
+    });
+    socket.on('recent', (msg: { recent: AddressItem[]; etag: string }) => {
+      recentsEtag.current = msg.etag;
+      setRecents(msg.recent || []);
+    });
+    return () => {
+      unsubscribeAuth();
+      socket.disconnect();
+    };
+  }, []);
+
   // Loads Recents
   useEffect(() => {
     fetchRecents(); // initial load
-    const interval = setInterval(fetchRecents, 5000); // refresh every 5 sec
+    const interval = setInterval(() => {
+      if (!socketConnected.current) fetchRecents();
+    }, 5000); // refresh every 5 sec while not receiving pushes
     return () => clearInterval(interval);
   }, []);
 
   // Loads Favorites
   useEffect(() => {
     fetchFavorites(); // initial load
-    const interval = setInterval(fetchFavorites, 5000); // refresh every 5 sec
+    const interval = setInterval(() => {
+      if (!socketConnected.current) fetchFavorites();
+    }, 5000); // refresh every 5 sec while not receiving pushes
     return () => clearInterval(interval);
   }, []);
 